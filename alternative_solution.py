@@ -1,205 +1,232 @@
 #This code is the alternative solution implemented using OR-Toolspyth
 import os
+import numpy as np
+import ortools
 from ortools.sat.python import cp_model
-import re
 import time 
+from budget import cp_sat_outcome, start_budget
+from cache import cached_solve, default_cache
+from heuristic import construct
+from instance import Instance, instance_files, read_file
+from instrumentation import cp_sat_statistics, profiled
+from presolve import infeasibility_reason, room_domains, room_symmetry_groups
+from results import ScheduleResult
+
+def solve_with_or_tools(instance, cache=None, parameters=None, smallest_room=False, profile=None, heuristic=True, symmetry_breaking=False, budget=None):
+    """
+    Solves the instance with CP-SAT, returning a ScheduleResult; cached results are reused.
+    parameters sets CpSolver parameters (e.g. num_search_workers, random_seed). With
+    smallest_room=True exams only use the smallest rooms that fit, as the Z3 encodings require.
+    With heuristic, a complete schedule from heuristic.construct is returned as is and a
+    partial one is added as solution hints. symmetry_breaking orders equal rooms (see
+    add_symmetry_breaking), on top of CP-SAT's own symmetry detection; it only adds
+    constraints with smallest_room=True, and without them changes nothing.
+    profile ("cprofile" or "tracemalloc") attaches an instrumentation.profiled report.
+    budget, a budget.Budget, sets max_time_in_seconds and max_memory_in_mb (by default from
+    the environment); when it runs out the result has status "timeout" or "memout".
+    """
+    encoding = "cp-sat-smallest-room" if smallest_room else "cp-sat"
+    budget = start_budget(budget)
+    with profiled(profile) as report:
+        result = cached_solve(cache, instance, "ortools", ortools.__version__, encoding, lambda: _solve_with_or_tools(instance, parameters, smallest_room, heuristic, symmetry_breaking, budget))
+    result.profile = report or None
+    return result
+
+def build_cp_model(instance, smallest_room=False, symmetry_breaking=False):
+    """
+    The CP-SAT model of constraints 1-8; returns (model, exam_room, exam_time, invigilator_assigned).
+    symmetry_breaking adds add_symmetry_breaking.
+    """
+    model = cp_model.CpModel()
+    exams = range(instance.number_of_exams)
+    pool = instance.invigilators
+    invigilators = range(pool.size)
+
+    # Constraint 1 and 3: Each exam gets one timeslot and one room with enough capacity
+    exam_time = [model.NewIntVar(0, instance.number_of_slots - 1, f'exam_time_{e}') for e in exams]
+    exam_room = []
+    for e in exams:
+        fitting = [r for r in range(instance.number_of_rooms) if instance.student_exam_capacity[e] <= instance.room_capacities[r]]
+        if smallest_room and fitting:
+            fitting = [r for r in fitting if instance.room_capacities[r] == min(instance.room_capacities[r] for r in fitting)]
+        exam_room.append(model.NewIntVarFromDomain(cp_model.Domain.FromValues(fitting or [0]), f'exam_room_{e}'))
+        if not fitting:
+            model.AddBoolOr([])  # No room is large enough
+    # Constraint 9 adds nothing beyond constraint 3 here: the room literals are mutually exclusive
+
+    # Constraint 2: No two exams share a room and timeslot, i.e. all room * slots + slot cells differ
+    cell = [model.NewIntVar(0, instance.number_of_rooms * instance.number_of_slots - 1, f'exam_cell_{e}') for e in exams]
+    for e in exams:
+        model.Add(cell[e] == exam_room[e] * instance.number_of_slots + exam_time[e])
+    model.AddAllDifferent(cell)
+
+    # Constraint 4: Exams sharing a student are at least two timeslots apart (|t1 - t2| > 1)
+    gap = cp_model.Domain.FromIntervals([[-instance.number_of_slots, -2], [2, instance.number_of_slots]])
+    for e1, e2 in instance.index.conflict_pairs:
+        if gap.is_empty():
+            model.AddBoolOr([])  # Fewer than three timeslots
+            break
+        diff = model.NewIntVarFromDomain(gap, f'diff_{e1}_{e2}')
+        model.Add(diff == exam_time[e1] - exam_time[e2])
+
+    # Constraint 5: Dynamic invigilator assignment based on student count, one Boolean per invigilator and exam
+    invigilator_assigned = [[model.NewBoolVar(f'invigilator_{i}_exam_{e}') for e in exams] for i in invigilators]
+    for e in exams:
+        students = instance.student_exam_capacity[e]
+        required_invigilators = 1 if students <= 10 else 2 if students <= 20 else 3
+        model.Add(sum(invigilator_assigned[i][e] for i in invigilators) == required_invigilators)
 
-class Instance:
-    def __init__(self):
-        self.number_of_students = 0
-        self.number_of_exams = 0
-        self.number_of_slots = 0
-        self.number_of_rooms = 0
-        self.room_capacities = []
-        self.exams_to_students = []
-        self.student_exam_capacity = []
-
-def read_file(filename):
-    instance = Instance()
-    with open(filename) as f:
-        def read_attribute(name):
-            line = f.readline()
-            match = re.match(f'{name}:\\s*(\\d+)$', line)
-            if match:
-                return int(match.group(1))
-            else:
-                raise ValueError(f"Could not parse line {line}; expected the {name} attribute")
-
-        instance.number_of_students = read_attribute("Number of students")
-        instance.number_of_exams = read_attribute("Number of exams")
-        instance.number_of_slots = read_attribute("Number of slots")
-        instance.number_of_rooms = read_attribute("Number of rooms")
-
-        for r in range(instance.number_of_rooms):
-            instance.room_capacities.append(read_attribute(f"Room {r} capacity"))
-
-        while True:
-            line = f.readline()
-            if line == "":
-                break
-            match = re.match('^\\s*(\\d+)\\s+(\\d+)\\s*$', line)
-            if match:
-                instance.exams_to_students.append((int(match.group(1)), int(match.group(2))))
-            else:
-                raise ValueError(f'Failed to parse this line: {line}')
-
-        instance.student_exam_capacity = [0] * instance.number_of_exams
-        for exam, student in instance.exams_to_students:
-            instance.student_exam_capacity[exam] += 1
-
-    return instance
+    # Constraint 6 (at most one exam per invigilator and timeslot) follows from constraint 8
 
+    # Constraint 7: Each invigilator covers at most its own number of exams
+    for i in invigilators:
+        model.Add(sum(invigilator_assigned[i]) <= pool.max_exams_of(i))
 
-def solve_with_or_tools(instance):
-    model = cp_model.CpModel()
-
-    # Variables
-    exam_time = [model.NewIntVar(0, instance.number_of_slots - 1, f'exam_time_{e}') for e in range(instance.number_of_exams)]
-    exam_room = [model.NewIntVar(0, instance.number_of_rooms - 1, f'exam_room_{e}') for e in range(instance.number_of_exams)]
-    invigilator_assigned = [
-        [
-            [model.NewBoolVar(f'invigilator_{i}_exam_{e}_timeslot_{t}') for t in range(instance.number_of_slots)]
-            for e in range(instance.number_of_exams)
-        ]
-        for i in range(10)  # Assume 10 invigilators
-    ]
-
-    # Constraints
-
-    # Constraint 1: Each exam must be assigned to exactly one room and one timeslot
-    for e in range(instance.number_of_exams):
-        model.Add(exam_time[e] >= 0)
-        model.Add(exam_room[e] >= 0)
-
-    # Constraint 2: Strictly enforce no two exams can be scheduled in the same room at the same timeslot
-    for e1 in range(instance.number_of_exams):
-        for e2 in range(e1 + 1, instance.number_of_exams):  # Avoid duplicate pairs
-            # Boolean variable for whether exams `e1` and `e2` are in the same room
-            same_room = model.NewBoolVar(f'same_room_{e1}_{e2}')
-            model.Add(exam_room[e1] == exam_room[e2]).OnlyEnforceIf(same_room)
-            model.Add(exam_room[e1] != exam_room[e2]).OnlyEnforceIf(same_room.Not())
-
-            # Boolean variable for whether exams `e1` and `e2` are in the same timeslot
-            same_time = model.NewBoolVar(f'same_time_{e1}_{e2}')
-            model.Add(exam_time[e1] == exam_time[e2]).OnlyEnforceIf(same_time)
-            model.Add(exam_time[e1] != exam_time[e2]).OnlyEnforceIf(same_time.Not())
-
-            # Ensure that if exams are in the same room, they must not be in the same timeslot
-            model.AddBoolOr([same_room.Not(), same_time.Not()])
-
-    # Constraint 3: Room Capacity
-    for e in range(instance.number_of_exams):
-        room_cap_constraint = [
-            model.NewBoolVar(f'exam_{e}_in_room_{r}')
-            for r in range(instance.number_of_rooms)
+    # Constraint 8: No same or consecutive invigilations. Each covered exam occupies its
+    # timeslot and the next one, and an invigilator's exams may not overlap
+    for i in invigilators:
+        intervals = [
+            model.NewOptionalFixedSizeIntervalVar(exam_time[e], 2, invigilator_assigned[i][e], f'duty_{i}_{e}')
+            for e in exams
         ]
-        for r in range(instance.number_of_rooms):
-            model.Add(exam_room[e] == r).OnlyEnforceIf(room_cap_constraint[r])
-            model.Add(instance.student_exam_capacity[e] <= instance.room_capacities[r]).OnlyEnforceIf(room_cap_constraint[r])
-        model.AddBoolOr(room_cap_constraint)
-
-    # Constraint 4: Non-overlapping exams for students
-    for s in range(instance.number_of_students):
-        exams_for_student = [e for e, stud in instance.exams_to_students if stud == s]
-        for e1 in exams_for_student:
-            for e2 in exams_for_student:
-                if e1 != e2:
-                    diff = model.NewIntVar(-instance.number_of_slots, instance.number_of_slots, f'diff_{e1}_{e2}')
-                    abs_diff = model.NewIntVar(0, instance.number_of_slots, f'abs_diff_{e1}_{e2}')
-                    model.Add(diff == exam_time[e1] - exam_time[e2])
-                    model.AddAbsEquality(abs_diff, diff)
-                    model.Add(abs_diff > 1)
-
-
-    # Constraint 5: Dynamic invigilator assignment based on student count
-    for e in range(instance.number_of_exams):
-        students = instance.student_exam_capacity[e]
-        required_invigilators = 1 if students <= 10 else 2 if students <= 20 else 3
-        for t in range(instance.number_of_slots):
-            # Create a Boolean variable for exam_time[e] == t
-            exam_at_time_t = model.NewBoolVar(f'exam_{e}_at_time_{t}')
-            model.Add(exam_time[e] == t).OnlyEnforceIf(exam_at_time_t)
-            model.Add(exam_time[e] != t).OnlyEnforceIf(exam_at_time_t.Not())
-
-            # Enforce invigilator constraint
-            model.Add(sum(invigilator_assigned[i][e][t] for i in range(10)) == required_invigilators).OnlyEnforceIf(exam_at_time_t)
-
-
-    # Constraint 6: Maximum invigilators per timeslot
-    for t in range(instance.number_of_slots):
-        model.Add(sum(invigilator_assigned[i][e][t] for i in range(10) for e in range(instance.number_of_exams)) <= 10)
-
-    # Constraint 7: Each invigilator can only invigilate at most 2 exams
-    for i in range(10):
-        model.Add(sum(invigilator_assigned[i][e][t] for e in range(instance.number_of_exams) for t in range(instance.number_of_slots)) <= 2)
-
-    # Constraint 8: No consecutive invigilations for invigilators
-    for i in range(10):
-        for t in range(instance.number_of_slots - 1):
-            for e1 in range(instance.number_of_exams):
-                for e2 in range(instance.number_of_exams):
-                    if e1 != e2:
-                        model.Add(invigilator_assigned[i][e1][t] + invigilator_assigned[i][e2][t + 1] <= 1)
-
-    # Constraint 9: Optimal Room Allocation with Prioritization of Smallest Fit
-    for e in range(instance.number_of_exams):
-        # Create a list of boolean variables representing whether exam `e` is assigned to room `r`
-        is_exam_in_room = [model.NewBoolVar(f'is_exam_{e}_in_room_{r}') for r in range(instance.number_of_rooms)]
-
-        # Link `exam_room` variable to the boolean variables
-        for r in range(instance.number_of_rooms):
-            model.Add(exam_room[e] == r).OnlyEnforceIf(is_exam_in_room[r])
-            model.Add(exam_room[e] != r).OnlyEnforceIf(is_exam_in_room[r].Not())
-
-        # Ensure the room has enough capacity to accommodate the exam
-        for r in range(instance.number_of_rooms):
-            model.Add(instance.student_exam_capacity[e] <= instance.room_capacities[r]).OnlyEnforceIf(is_exam_in_room[r])
-
-        # Add constraint to prioritize the smallest room that can accommodate the exam
-        for r1 in range(instance.number_of_rooms):
-            for r2 in range(instance.number_of_rooms):
-                if r1 != r2 and instance.room_capacities[r1] < instance.room_capacities[r2]:
-                    # If room r1 can accommodate the exam and room r2 can also accommodate the exam,
-                    # then r2 cannot be selected if r1 is available
-                    model.Add(is_exam_in_room[r2] == 0).OnlyEnforceIf([
-                        is_exam_in_room[r1],  # r1 is selected
-                        instance.student_exam_capacity[e] <= instance.room_capacities[r1],
-                        instance.student_exam_capacity[e] <= instance.room_capacities[r2]
-                    ])
+        model.AddNoOverlap(intervals)
+
+    # Availability: an invigilator only covers exams in timeslots it can work
+    for i in invigilators:
+        unavailable = pool.unavailable_slots(i)
+        if not unavailable:
+            continue
+        allowed = cp_model.Domain.FromValues([t for t in range(instance.number_of_slots) if t not in unavailable])
+        for e in exams:
+            if allowed.is_empty():
+                model.Add(invigilator_assigned[i][e] == 0)
+            else:
+                model.AddLinearExpressionInDomain(exam_time[e], allowed).OnlyEnforceIf(invigilator_assigned[i][e])
+
+    if symmetry_breaking:
+        add_symmetry_breaking(model, instance, exam_room, exam_time, invigilator_assigned, smallest_room)
+
+    return model, exam_room, exam_time, invigilator_assigned
+
+def add_symmetry_breaking(model, instance, exam_room, exam_time, invigilator_assigned, smallest_room=False):
+    """
+    With smallest_room, exams that share a slot and a domain of equal rooms take those rooms
+    in exam order, as in solver.add_symmetry_breaking. Interchangeable invigilators are not
+    ordered here: lexicographic constraints on their cover rows slowed CP-SAT's UNSAT proofs
+    down, so they are left to CP-SAT's symmetry detection. Returns whether any constraint
+    was added.
+    """
+    if not smallest_room:
+        return False
+    added = False
+    conflicts = set(instance.index.conflict_pairs)
+    for group in room_symmetry_groups(room_domains(instance)):
+        for k, e1 in enumerate(group):
+            for e2 in group[k + 1:]:
+                if (e1, e2) in conflicts:  # Conflicting exams never share a slot
+                    continue
+                same_slot = model.NewBoolVar(f'same_slot_{e1}_{e2}')
+                model.Add(exam_time[e1] == exam_time[e2]).OnlyEnforceIf(same_slot)
+                model.Add(exam_time[e1] != exam_time[e2]).OnlyEnforceIf(same_slot.Not())
+                model.Add(exam_room[e1] < exam_room[e2]).OnlyEnforceIf(same_slot)
+                added = True
+    return added
+
+def add_hints(model, exam_room, exam_time, invigilator_assigned, construction):
+    """Hints the exams a heuristic.Construction placed, with their rooms and invigilators."""
+    for e in construction.placed().tolist():
+        model.AddHint(exam_room[e], int(construction.exam_room[e]))
+        model.AddHint(exam_time[e], int(construction.exam_slot[e]))
+        for i, row in enumerate(invigilator_assigned):
+            model.AddHint(row[e], i in construction.exam_invigilators[e])
+
+def extract_assignment(instance, value, exam_room, exam_time, invigilator_assigned):
+    """Fills a SAT ScheduleResult from value(), a CpSolver's or a solution callback's Value."""
+    result = ScheduleResult(instance, "sat", {})
+    result.exam_slot = np.array([value(slot) for slot in exam_time], dtype=np.int32)
+    result.exam_room = np.array([value(room) for room in exam_room], dtype=np.int32)
+    result.number_of_invigilators = len(invigilator_assigned)
+    result.exam_invigilators = [[i for i, row in enumerate(invigilator_assigned) if value(row[e])] for e in range(instance.number_of_exams)]
+    return result
+
+def _solve_with_or_tools(instance, parameters=None, smallest_room=False, heuristic=True, symmetry_breaking=False, budget=None):
+    budget = start_budget(budget)
+    start_presolve = time.time()
+    domains = room_domains(instance)
+    reason = infeasibility_reason(instance, domains)
+    start_build = time.time()
+    if reason is not None:
+        result = ScheduleResult(instance, "unsat", {"presolve": (start_build - start_presolve) * 1000})
+        result.reason = reason
+        return result
+
+    timings = {"presolve": (start_build - start_presolve) * 1000}
+    construction = None
+    if heuristic:
+        # The smallest rooms that fit are valid with or without smallest_room
+        construction = construct(instance, domains)
+        timings["heuristic"] = (time.time() - start_build) * 1000
+        if construction.complete:
+            return construction.to_result(instance, timings)
+        start_build = time.time()
+
+    model, exam_room, exam_time, invigilator_assigned = build_cp_model(instance, smallest_room)
+    if symmetry_breaking:
+        add_symmetry_breaking(model, instance, exam_room, exam_time, invigilator_assigned, smallest_room)
+    if construction is not None:
+        add_hints(model, exam_room, exam_time, invigilator_assigned, construction)
 
     # Solver
     solver = cp_model.CpSolver()
+    parameters = budget.cp_sat_parameters(parameters)
+    for name, value in parameters.items():
+        setattr(solver.parameters, name, value)
     start_time = time.time()  # Start timing
     status = solver.Solve(model)
     end_time = time.time()  # End timing
-    elapsed_time_ms = (end_time - start_time) * 1000  # Calculate time in milliseconds
 
+    statuses = {cp_model.OPTIMAL: "sat", cp_model.FEASIBLE: "sat", cp_model.INFEASIBLE: "unsat"}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        result = extract_assignment(instance, solver.Value, exam_room, exam_time, invigilator_assigned)
+    elif status == cp_model.UNKNOWN:
+        result = ScheduleResult(instance, "unknown", {})
+        result.status, result.reason = cp_sat_outcome(budget, parameters)
+    else:
+        result = ScheduleResult(instance, statuses.get(status, "unknown"), {})
+    result.statistics = cp_sat_statistics(solver)
+    result.timings = {
+        **timings,
+        "build": (start_time - start_build) * 1000,
+        "check": (end_time - start_time) * 1000,
+        "extract": (time.time() - end_time) * 1000,
+    }
+    return result
+
+def print_result(result):
     # Output results
-    if status == cp_model.FEASIBLE or status == cp_model.OPTIMAL:
-        print(f"Time taken to solve: {elapsed_time_ms:.2f} ms")
+    print(f"Time taken to solve: {result.timings.get('check', result.total_time_ms):.2f} ms")
+    if result.satisfied:
         print("Solution found:")
-        for e in range(instance.number_of_exams):
-            print(f'Exam {e}: Time = {solver.Value(exam_time[e])}, Room = {solver.Value(exam_room[e])}')
-        for i in range(10):
-            for e in range(instance.number_of_exams):
-                for t in range(instance.number_of_slots):
-                    if solver.Value(invigilator_assigned[i][e][t]) == 1:
-                        print(f'Invigilator {i} is assigned to Exam {e} at Timeslot {t}')
+        for e in range(result.number_of_exams):
+            print(f'Exam {e}: Time = {result.exam_slot[e]}, Room = {result.exam_room[e]}')
+        for i, exams in enumerate(result.invigilator_exams()):
+            for e in exams:
+                print(f'Invigilator {i} is assigned to Exam {e} at Timeslot {result.exam_slot[e]}')
     else:
-        print(f"Time taken to solve: {elapsed_time_ms:.2f} ms")
         print("No feasible solution found.")
+        if result.reason:
+            print(f"Reason: {result.reason}")
 
-def process_and_solve_all_instances(directory):
-    files = sorted([f for f in os.listdir(directory) if f.endswith(".txt")])
-    for filename in files:
-        filepath = os.path.join(directory, filename)
+def process_and_solve_all_instances(directory, cache=None):
+    for filepath in instance_files(directory):
+        filename = os.path.basename(filepath)
         try:
             print(f"\nProcessing file: {filename}")
             instance = read_file(filepath)
-            solve_with_or_tools(instance)
+            print_result(solve_with_or_tools(instance, cache))
         except Exception as e:
             print(f"Error processing {filename}: {e}")
 
-
-test_instances_folder = "./test instances"
-process_and_solve_all_instances(test_instances_folder)
+if __name__ == "__main__":
+    test_instances_folder = "./test instances"
+    process_and_solve_all_instances(test_instances_folder, default_cache())
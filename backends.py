@@ -0,0 +1,36 @@
+"""
+Solver backends by name, imported on first use.
+
+Importing OR-Tools takes about 300 ms and Z3 about 50 ms, which short-lived workers pay on
+every start. Entry points (cli.py, the GUI's batch workers in batch_worker.py, portfolio.py)
+therefore look their solve function up here rather than importing solver.py or
+alternative_solution.py at the top, so a process only loads the stack it runs. instance.py,
+presolve.py, heuristic.py, results.py and cache.py import neither, so parsing, presolve and
+the heuristic stay cheap on their own.
+
+    solve = load_backend("ortools")
+    result = solve(read_file(path))
+
+python benchmark.py --startup checks the cold-start time of these modules, and which stacks
+they load, against benchmark.STARTUP_BUDGETS.
+"""
+import importlib
+
+# name -> (module, function); every function takes the instance first and returns a ScheduleResult
+BACKENDS = {
+    "z3": ("solver", "solve"),
+    "ortools": ("alternative_solution", "solve_with_or_tools"),
+    "portfolio": ("portfolio", "solve_portfolio"),
+    "optimize": ("optimize", "optimize"),
+    "lns": ("lns", "lns"),
+}
+
+# The Z3 encodings (solver.ENCODINGS), named here so that listing them does not import Z3
+ENCODINGS = ("ground", "quantified")
+
+def load_backend(name):
+    """The solve function of a backend, importing its module (and solver stack) the first time."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}; expected one of {', '.join(BACKENDS)}")
+    module, function = BACKENDS[name]
+    return getattr(importlib.import_module(module), function)
@@ -0,0 +1,73 @@
+"""
+Worker side of the GUI's batch runs (main.BatchRun).
+
+BatchRun spawns its workers, and a spawned worker re-runs the top-level imports of main.py
+before importing this module. Neither imports a solver stack, so a worker only loads the
+backend its files are solved with (see backends.py), the first time it needs it.
+
+Each file is solved under a budget (see budget.py). A worker that outgrows the budget's
+memory ceiling sends ("memout", file, message) and exits; the pool replaces it.
+"""
+from functools import partial
+
+from backends import load_backend
+from budget import MemoryWatchdog, memout_message, start_budget
+from instance import read_file
+from instrumentation import phase
+
+# Queue the batch worker processes use to announce which file they started on
+_worker_events = None
+
+# The worker's MemoryWatchdog and the file it is solving
+_watchdog = None
+_current_file = None
+
+def init_batch_worker(events):
+    global _worker_events, _watchdog
+    _worker_events = events
+    _watchdog = MemoryWatchdog(on_exceeded=_report_memout)
+
+def _report_memout(limit_mb):
+    if _worker_events is not None and _current_file is not None:
+        _worker_events.put(("memout", _current_file, memout_message(limit_mb)))
+        # The queue's feeder thread must flush the event before the process exits
+        _worker_events.close()
+        _worker_events.join_thread()
+
+def _report_progress(file, result):
+    if _worker_events is not None:
+        _worker_events.put(("progress", file, result))
+
+def solve_file(file, encoding="ground", cache=None, profile=None, budget=None, diagnose=False):
+    """
+    Reads and solves one instance file under budget (see budget.py). Runs inside a BatchRun
+    worker process. With encoding "optimize" the schedule is optimized until the budget's
+    time limit and every improving schedule is sent as a ("progress", file, result) event.
+    With diagnose, other UNSAT results carry an unsat core (see diagnose.py).
+    """
+    global _current_file
+    budget = start_budget(budget)
+    _current_file = file
+    if _watchdog is not None:
+        _watchdog.limit_mb = budget.memory_mb
+    if _worker_events is not None:
+        _worker_events.put(("started", file))
+    try:
+        timings = {}
+        with phase(timings, "parse"):
+            instance = read_file(file)
+        if encoding == "optimize":
+            result = load_backend("optimize")(instance, on_solution=partial(_report_progress, file), budget=budget)
+        else:
+            result = load_backend("z3")(instance, encoding, cache, profile=profile, budget=budget)
+            if diagnose:
+                from diagnose import explain
+                explain(instance, result)
+        result.timings = {**timings, **result.timings}
+        return file, True, result
+    except Exception as e:
+        return file, False, f"Error processing {file}: {e}"
+    finally:
+        if _watchdog is not None:
+            _watchdog.limit_mb = None
+        _current_file = None
@@ -0,0 +1,285 @@
+"""
+Benchmark harness: generates seeded instances over a size sweep, solves each one with
+every backend in a fresh process and records the time of each phase (parse, presolve,
+heuristic, component solves and merge, build, check, extract) plus the worker's peak
+memory. The -cold backends skip the constructive heuristic (see heuristic.py) and the
+-symmetry backends add symmetry breaking (CP-SAT with smallest rooms only, as its
+room ordering needs them), e.g. to time UNSAT proofs with and without it:
+
+    python benchmark.py --exams 8,10,12,16 --modes pigeonhole --backends z3,z3-symmetry,ortools-smallest-room,ortools-symmetry
+
+    python benchmark.py --exams 4,8,12,16 --modes sat,unsat --output baseline.json
+    python benchmark.py --exams 4,8,12,16 --modes sat,unsat --compare baseline.json
+
+Results are saved as JSON. --compare matches cases by name and backend against a saved
+baseline, flags any case whose total time grew by more than --threshold or whose status
+changed, and exits with 1 if there is a regression.
+
+--startup instead times fresh interpreters importing the modules CLI and worker processes
+start from, and checks them against STARTUP_BUDGETS: the solver stacks and GUI toolkit
+each may load (see backends.py), and a time budget relative to a baseline interpreter
+importing NumPy and those stacks, so that it holds on slower machines too. It exits with 1
+if any is over budget.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.connection import wait
+from timeit import default_timer as timer
+
+import ortools
+import z3
+
+from alternative_solution import solve_with_or_tools
+from generator import GENERATOR_MODES, generate
+from instance import read_file, write_file
+from solver import solve
+
+BACKENDS = {
+    "z3": lambda instance: solve(instance),
+    "ortools": lambda instance: solve_with_or_tools(instance),
+    "z3-cold": lambda instance: solve(instance, heuristic=False),
+    "ortools-cold": lambda instance: solve_with_or_tools(instance, heuristic=False),
+    "z3-symmetry": lambda instance: solve(instance, symmetry_breaking=True),
+    "ortools-smallest-room": lambda instance: solve_with_or_tools(instance, smallest_room=True),
+    "ortools-symmetry": lambda instance: solve_with_or_tools(instance, smallest_room=True, symmetry_breaking=True),
+}
+
+PHASES = ["parse", "presolve", "heuristic", "components", "merge", "build", "check", "extract"]
+
+# Heavy imports a process start is checked for
+STACKS = ("z3", "ortools", "tkinter")
+
+# Modules that stand for each stack in the baseline of a startup budget
+STACK_MODULES = {"z3": "z3", "ortools": "ortools.sat.python.cp_model", "tkinter": "tkinter"}
+
+# module -> (milliseconds it may add to the baseline, STACKS it may load). The baseline is a
+# fresh interpreter importing NumPy and the allowed stacks (about 100 ms, plus 50 ms for Z3
+# and 350 ms for OR-Tools on one core); the modules themselves measured up to 35 ms there,
+# so 100 ms leaves about three times that, and STARTUP_TOLERANCE absorbs the baseline's
+# own noise, which grows with the stacks
+STARTUP_BUDGETS = {
+    "instance": (100, ()),
+    "heuristic": (100, ()),
+    "cli": (100, ()),
+    "portfolio": (100, ()),
+    "optimize": (100, ()),
+    "lns": (100, ()),
+    "verify": (100, ()),
+    "batch_worker": (100, ()),
+    "solver": (100, ("z3",)),
+    "alternative_solution": (100, ("ortools",)),
+}
+
+STARTUP_TOLERANCE = 1.25
+
+def sweep(exams_list, modes, seeds, students_per_exam=2.0, slots_per_exam=1.5, rooms=3, density=0.2, tightness=0.8):
+    """Case dicts: name, expected status and generator arguments, for every size, mode and seed."""
+    cases = []
+    for exams in exams_list:
+        for mode in modes:
+            for seed in range(seeds):
+                if mode == "pigeonhole":
+                    # Fixed shape: 3 slots and one room fewer than a schedule needs (see generator.py)
+                    cases.append({"name": f"{mode}-e{exams}", "expected": "unsat", "params": {
+                        "students": exams, "exams": exams, "slots": 3, "rooms": exams // 2 - 1, "mode": mode,
+                    }})
+                    break
+                params = {
+                    "students": max(1, round(students_per_exam * exams)),
+                    "exams": exams,
+                    "slots": max(3, round(slots_per_exam * exams)),
+                    "rooms": rooms,
+                    "density": density,
+                    "tightness": tightness,
+                    "mode": mode,
+                    "seed": seed,
+                }
+                expected = None if mode == "random" else mode
+                cases.append({"name": f"{mode}-e{exams}-s{seed}", "expected": expected, "params": params})
+    return cases
+
+def _worker(path, backend, connection):
+    start_parse = timer()
+    instance = read_file(path)
+    parse_ms = (timer() - start_parse) * 1000
+    result = BACKENDS[backend](instance)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_kib = peak // 1024 if sys.platform == "darwin" else peak
+    connection.send({"status": result.status, "timings": {"parse": parse_ms, **result.timings}, "peak_rss_kib": peak_kib})
+    connection.close()
+
+def run_case(path, backend, timeout=None):
+    """Solves one instance file in a fresh process; returns status, per-phase ms and peak RSS."""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_worker, args=(path, backend, sender), daemon=True)
+    started = time.monotonic()
+    process.start()
+    sender.close()
+    if wait([receiver], timeout=timeout):
+        try:
+            measured = receiver.recv()
+        except EOFError:
+            measured = {"status": "error", "error": f"Worker exited with code {process.exitcode}"}
+    else:
+        process.terminate()
+        measured = {"status": "timeout"}
+    process.join()
+    receiver.close()
+    measured["wall_ms"] = (time.monotonic() - started) * 1000
+    return measured
+
+def run_benchmark(cases, backends, timeout=None, directory=None, log=None):
+    """Generates every case into directory, runs it on every backend and returns the records."""
+    directory = directory or tempfile.mkdtemp(prefix="exam_benchmark_")
+    records = []
+    for case in cases:
+        path = os.path.join(directory, f"{case['name']}.txt")
+        try:
+            instance = generate(**case["params"])
+        except ValueError as e:
+            records.append({"name": case["name"], "backend": None, "status": "skipped", "error": str(e), **case["params"]})
+            if log:
+                log(records[-1])
+            continue
+        write_file(instance, path)
+        for backend in backends:
+            measured = run_case(path, backend, timeout)
+            timings = measured.pop("timings", {})
+            record = {"name": case["name"], "backend": backend, "expected": case["expected"], **case["params"], **measured}
+            for phase in PHASES:
+                record[f"{phase}_ms"] = timings.get(phase, 0.0)
+            record["total_ms"] = sum(timings.values())
+            records.append(record)
+            if log:
+                log(record)
+    return records
+
+def measure_startup(module, runs=5):
+    """Median wall time in ms of a fresh interpreter importing module, and the STACKS it loaded."""
+    code = f"import json, sys; import {module}; print(json.dumps([name for name in {STACKS!r} if name in sys.modules]))"
+    times = []
+    for _ in range(runs):
+        started = timer()
+        completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        times.append((timer() - started) * 1000)
+    return sorted(times)[len(times) // 2], json.loads(completed.stdout)
+
+def check_startup(budgets=None, runs=5, log=None):
+    """Measures every module of budgets (default STARTUP_BUDGETS); returns the records and the budget violations."""
+    records, violations = [], []
+    baselines = {}
+    for module, (own_ms, allowed) in (budgets or STARTUP_BUDGETS).items():
+        if allowed not in baselines:
+            baselines[allowed] = measure_startup(", ".join(["numpy"] + [STACK_MODULES[stack] for stack in allowed]), runs)[0]
+        budget_ms = STARTUP_TOLERANCE * baselines[allowed] + own_ms
+        startup_ms, loaded = measure_startup(module, runs)
+        record = {"module": module, "startup_ms": startup_ms, "baseline_ms": baselines[allowed], "budget_ms": budget_ms, "loaded": loaded}
+        records.append(record)
+        if startup_ms > budget_ms:
+            violations.append(f"{module}: {startup_ms:.0f} ms, budget {budget_ms:.0f} ms")
+        unexpected = [name for name in loaded if name not in allowed]
+        if unexpected:
+            violations.append(f"{module}: imports {', '.join(unexpected)}")
+        if log:
+            log(record)
+    return records, violations
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "z3": z3.get_full_version(),
+        "ortools": ortools.__version__,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(baseline, records, threshold=1.5, floor_ms=50.0):
+    """Regressions against a baseline: status changes and totals above threshold x the old total."""
+    old = {(record["name"], record["backend"]): record for record in baseline["records"]}
+    regressions = []
+    for record in records:
+        before = old.get((record["name"], record["backend"]))
+        if before is None or record["backend"] is None:
+            continue
+        if record["status"] != before["status"]:
+            regressions.append(f"{record['name']} [{record['backend']}]: status {before['status']} -> {record['status']}")
+        # Ignore noise on cases that are fast either way
+        elif record["total_ms"] > max(threshold * before["total_ms"], floor_ms):
+            regressions.append(f"{record['name']} [{record['backend']}]: {before['total_ms']:.1f} ms -> {record['total_ms']:.1f} ms")
+    return regressions
+
+def _format(record):
+    if record["backend"] is None:
+        return f"{record['name']:<20} skipped: {record['error']}"
+    flag = "" if record["expected"] in (None, record["status"]) else f" (expected {record['expected']})"
+    phases = " ".join(f"{phase}={record[f'{phase}_ms']:.1f}" for phase in PHASES)
+    return f"{record['name']:<20} {record['backend']:<8} {record['status']:<8} {phases} peak={record.get('peak_rss_kib', 0) // 1024}MiB{flag}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Z3 and OR-Tools solvers over generated instances.")
+    parser.add_argument("--exams", default="4,8,12,16", help="comma-separated exam counts to sweep")
+    parser.add_argument("--modes", default="sat,unsat", help=f"comma-separated generator modes ({', '.join(GENERATOR_MODES)})")
+    parser.add_argument("--seeds", type=int, default=1, help="instances per size and mode")
+    parser.add_argument("--backends", default="z3,ortools", help=f"comma-separated backends ({', '.join(BACKENDS)})")
+    parser.add_argument("--students-per-exam", type=float, default=2.0)
+    parser.add_argument("--slots-per-exam", type=float, default=1.5)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--tightness", type=float, default=0.8)
+    parser.add_argument("-t", "--timeout", type=float, default=300, help="per-run time limit in seconds")
+    parser.add_argument("--instances-dir", default=None, help="keep the generated instances here")
+    parser.add_argument("-o", "--output", default=None, help="write the results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown factor against the baseline")
+    parser.add_argument("--startup", action="store_true", help="check module cold-start times against STARTUP_BUDGETS instead")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        log = lambda record: print(f"{record['module']:<22} {record['startup_ms']:6.0f} ms (baseline {record['baseline_ms']:.0f}, budget {record['budget_ms']:.0f}) loads {', '.join(record['loaded']) or 'no solver'}", flush=True)
+        records, violations = check_startup(log=log)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"environment": environment(), "startup": records}, f, indent=2)
+        for violation in violations:
+            print(f"OVER BUDGET {violation}")
+        return 1 if violations else 0
+
+    modes = args.modes.split(",")
+    backends = args.backends.split(",")
+    for name, chosen, allowed in (("mode", modes, GENERATOR_MODES), ("backend", backends, BACKENDS)):
+        unknown = [value for value in chosen if value not in allowed]
+        if unknown:
+            parser.error(f"Unknown {name} {', '.join(unknown)}")
+    if args.instances_dir:
+        os.makedirs(args.instances_dir, exist_ok=True)
+
+    cases = sweep(
+        [int(exams) for exams in args.exams.split(",")], modes, args.seeds,
+        args.students_per_exam, args.slots_per_exam, args.rooms, args.density, args.tightness,
+    )
+    records = run_benchmark(cases, backends, args.timeout, args.instances_dir, log=lambda record: print(_format(record), flush=True))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "records": records}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), records, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
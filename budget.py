@@ -0,0 +1,184 @@
+"""
+Per-instance resource budgets: wall time, Z3's rlimit and a memory ceiling.
+
+    budget = Budget(time_limit=60, rlimit=50_000_000, memory_mb=2048)
+    result = solve(instance, budget=budget)
+    result.status  # "timeout" or "memout" when the budget ran out before an answer
+
+time_limit is the wall time of one instance, presolve and heuristic included: Z3 gets what
+is left of it as its timeout and CP-SAT as max_time_in_seconds. rlimit is Z3's
+deterministic resource limit, which stops at the same point on every machine. memory_mb
+caps the resident memory of a process: Z3 gets it as memory_max_size and CP-SAT as
+max_memory_in_mb, and worker processes (cli.py, the GUI's batch workers, service.py,
+portfolio.py) run a MemoryWatchdog that exits with MEMOUT_EXIT_CODE once the process
+outgrows it, which their parents report as status "memout".
+
+Limits a caller leaves unset come from the environment, so that a shared node can cap
+every entry point at once: EXAM_SCHEDULER_TIME_LIMIT (seconds), EXAM_SCHEDULER_RLIMIT and
+EXAM_SCHEDULER_MEMORY_MB. Without either nothing is limited.
+"""
+import os
+import resource
+import sys
+import threading
+import time
+
+ENVIRONMENT = {
+    "time_limit": ("EXAM_SCHEDULER_TIME_LIMIT", float),
+    "rlimit": ("EXAM_SCHEDULER_RLIMIT", int),
+    "memory_mb": ("EXAM_SCHEDULER_MEMORY_MB", int),
+}
+
+# Exit code of a worker process stopped by its MemoryWatchdog
+MEMOUT_EXIT_CODE = 75
+
+# Seconds between two memory samples of a MemoryWatchdog
+WATCH_INTERVAL = 0.05
+
+# Share of memory_mb a process must have peaked at for a CP-SAT UNKNOWN to count as "memout"
+MEMOUT_FRACTION = 0.9
+
+class Budget:
+    """
+    Limits of one solve; None means unlimited. The clock starts with start_budget, and
+    deadline (a time.monotonic() value, comparable across processes on one machine) is
+    shared by everything solved under the started budget, such as the components of an
+    instance.
+    """
+    def __init__(self, time_limit=None, rlimit=None, memory_mb=None):
+        self.time_limit = time_limit
+        self.rlimit = rlimit
+        self.memory_mb = memory_mb
+        self.deadline = None
+
+    def __repr__(self):
+        return f"Budget(time_limit={self.time_limit}, rlimit={self.rlimit}, memory_mb={self.memory_mb})"
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative), or None without a time limit."""
+        if self.time_limit is None:
+            return None
+        if self.deadline is None:
+            return self.time_limit
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.remaining() == 0
+
+    def z3_params(self, params=None):
+        """
+        params with their timeout and rlimit capped by what is left of the budget; the
+        timeout is at least 1 ms since 0 means none in Z3.
+        """
+        limits = {}
+        if self.time_limit is not None:
+            limits["timeout"] = max(1, int(self.remaining() * 1000))
+        if self.rlimit is not None:
+            limits["rlimit"] = self.rlimit
+        return _capped(params, limits)
+
+    def cp_sat_parameters(self, parameters=None):
+        """CpSolver parameters with max_time_in_seconds and max_memory_in_mb capped by the budget."""
+        limits = {}
+        if self.time_limit is not None:
+            limits["max_time_in_seconds"] = self.remaining()
+        if self.memory_mb is not None:
+            limits["max_memory_in_mb"] = self.memory_mb
+        return _capped(parameters, limits)
+
+    def to_dict(self):
+        return {"time_limit": self.time_limit, "rlimit": self.rlimit, "memory_mb": self.memory_mb}
+
+def _capped(parameters, limits):
+    capped = dict(parameters or {})
+    for name, limit in limits.items():
+        capped[name] = min(capped.get(name, limit), limit)
+    return capped
+
+def default_budget():
+    """The limits configured by the environment."""
+    limits = {}
+    for field, (variable, convert) in ENVIRONMENT.items():
+        value = os.environ.get(variable)
+        if value:
+            limits[field] = convert(value)
+    return Budget(**limits)
+
+def start_budget(budget=None):
+    """
+    A copy of budget with its clock started now and unset limits taken from the environment.
+    An already started budget is returned as is, so nested solves share its deadline.
+    """
+    if budget is not None and budget.deadline is not None:
+        return budget
+    defaults = default_budget()
+    started = Budget(**{field: getattr(defaults, field) if budget is None or getattr(budget, field) is None else getattr(budget, field) for field in ENVIRONMENT})
+    if started.time_limit is not None:
+        started.deadline = time.monotonic() + started.time_limit
+    return started
+
+def z3_outcome(budget, reason_unknown):
+    """(status, reason) of a Z3 "unknown" answer, naming the budget that ran out, if any."""
+    if "memory" in reason_unknown:
+        return "memout", f"Memory limit of {budget.memory_mb} MB reached" if budget.memory_mb else "Z3 ran out of memory"
+    if reason_unknown == "timeout" or (budget.time_limit is not None and budget.expired()):
+        return "timeout", f"Time limit of {budget.time_limit:g} s reached" if budget.time_limit is not None else "Z3 timeout reached"
+    if budget.rlimit is not None and reason_unknown in ("canceled", "max. resource limit exceeded"):
+        return "timeout", f"Resource limit of {budget.rlimit} reached"
+    return "unknown", f"Z3 gave up: {reason_unknown}"
+
+def cp_sat_outcome(budget, parameters=None):
+    """
+    (status, reason) of a CP-SAT UNKNOWN answer under budget and the solver's parameters.
+    CP-SAT does not say which limit stopped it, so "memout" needs the process to have
+    peaked near the memory ceiling; otherwise a time limit, the budget's or the caller's
+    own max_time_in_seconds, is taken to have run out.
+    """
+    if budget.time_limit is not None and budget.expired():
+        return "timeout", f"Time limit of {budget.time_limit:g} s reached"
+    if budget.memory_mb is not None and peak_mb() >= MEMOUT_FRACTION * budget.memory_mb:
+        return "memout", f"Memory limit of {budget.memory_mb} MB reached"
+    time_limit = (parameters or {}).get("max_time_in_seconds")
+    if time_limit is not None:
+        return "timeout", f"Time limit of {time_limit:g} s reached"
+    return "unknown", "CP-SAT stopped without an answer"
+
+def resident_mb():
+    """This process's resident memory in MB; its peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return peak_mb()
+
+def peak_mb():
+    """The peak resident memory of this process in MB."""
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+class MemoryWatchdog:
+    """
+    Samples the resident memory of a worker process every WATCH_INTERVAL seconds and ends
+    the process with MEMOUT_EXIT_CODE once it exceeds limit_mb (None pauses the watch).
+    on_exceeded, when given, runs first, to tell the parent which task was lost. The
+    limit can be changed between tasks of a long-lived worker.
+    """
+    def __init__(self, limit_mb=None, on_exceeded=None):
+        self.limit_mb = limit_mb
+        self.on_exceeded = on_exceeded
+        self.thread = threading.Thread(target=self._watch, name="memory-watchdog", daemon=True)
+        self.thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            limit = self.limit_mb
+            if limit is not None and resident_mb() > limit:
+                if self.on_exceeded is not None:
+                    self.on_exceeded(limit)
+                sys.stdout.flush()
+                os._exit(MEMOUT_EXIT_CODE)
+
+def memout_message(limit_mb):
+    return f"Exceeded the memory limit of {limit_mb} MB"
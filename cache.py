@@ -0,0 +1,142 @@
+"""
+On-disk cache of solved instances, keyed by the content of the parsed Instance.
+
+Identical instances (same header, room capacities, invigilator pool and enrolment rows
+in any order) map to the same key for a given backend, its version, the encoding and the
+constraint configuration, so resubmitted files skip the solver entirely. Entries are small JSON
+files; the least recently used ones are evicted once the cache outgrows max_bytes.
+
+Set EXAM_SCHEDULER_NO_CACHE=1 (or pass --no-cache to cli.py) to opt out, and
+EXAM_SCHEDULER_CACHE_DIR to move the cache.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from timeit import default_timer as timer
+
+import numpy as np
+
+from results import ScheduleResult
+
+# Bump when an encoding changes in a way that invalidates stored results
+CACHE_FORMAT = 2
+
+# The fixed rules the encodings are built from; part of every key. The invigilator pool
+# belongs to the instance and is hashed by instance_digest.
+CONSTRAINT_CONFIG = {"slot_gap": 1}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "exam_scheduler")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def instance_digest(instance):
+    """SHA-256 of the instance with its enrolment rows sorted, so row order does not matter."""
+    order = np.lexsort((instance.student_ids, instance.exam_ids))
+    digest = hashlib.sha256()
+    digest.update(np.array([instance.number_of_students, instance.number_of_exams, instance.number_of_slots, instance.number_of_rooms], dtype=np.int64).tobytes())
+    digest.update(np.asarray(instance.room_capacities, dtype=np.int64).tobytes())
+    digest.update(instance.exam_ids[order].astype(np.int64).tobytes())
+    digest.update(instance.student_ids[order].astype(np.int64).tobytes())
+    digest.update(json.dumps(instance.invigilators.to_dict(), sort_keys=True).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Size-bounded LRU cache of sat/unsat results in one directory (an entry's mtime is its last use)."""
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, instance, backend, backend_version, encoding):
+        config = json.dumps([CACHE_FORMAT, backend, backend_version, encoding, CONSTRAINT_CONFIG], sort_keys=True)
+        return hashlib.sha256((config + instance_digest(instance)).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, instance):
+        """The stored result rebuilt against instance, or None on a miss or unreadable entry."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            return None
+
+        result = ScheduleResult(instance, entry["status"], {})
+        result.exam_room = np.array(entry["exam_room"], dtype=np.int32)
+        result.exam_slot = np.array(entry["exam_slot"], dtype=np.int32)
+        result.exam_invigilators = entry["exam_invigilators"]
+        result.number_of_invigilators = entry["number_of_invigilators"]
+        result.reason = entry.get("reason")
+        result.cached = True
+        return result
+
+    def put(self, key, result):
+        """Stores a decided (sat/unsat) result, then evicts the least recently used entries."""
+        if result.status not in ("sat", "unsat"):
+            return
+        entry = {
+            "status": result.status,
+            "exam_room": result.exam_room.tolist(),
+            "exam_slot": result.exam_slot.tolist(),
+            "exam_invigilators": result.exam_invigilators,
+            "number_of_invigilators": result.number_of_invigilators,
+            "reason": result.reason,
+            "solve_timings": result.timings,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never read half an entry
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temporary, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue  # Evicted by another worker
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+def default_cache():
+    """The cache configured by the environment, or None when caching is turned off."""
+    if os.environ.get("EXAM_SCHEDULER_NO_CACHE"):
+        return None
+    return ResultCache(os.environ.get("EXAM_SCHEDULER_CACHE_DIR", DEFAULT_CACHE_DIR))
+
+def cached_solve(cache, instance, backend, backend_version, encoding, solve_function):
+    """
+    Returns the cached result for instance or calls solve_function() and stores its result.
+    A hit carries a single "lookup" timing instead of the original solve phases.
+    """
+    if cache is None:
+        return solve_function()
+    start_lookup = timer()
+    key = cache.key(instance, backend, backend_version, encoding)
+    result = cache.get(key, instance)
+    if result is not None:
+        result.timings = {"lookup": (timer() - start_lookup) * 1000}
+        return result
+    result = solve_function()
+    cache.put(key, result)
+    return result
@@ -0,0 +1,244 @@
+"""
+Headless batch runner for the Z3 exam scheduler; it never imports Tkinter.
+
+    python cli.py "test instances" --workers 4 --timeout 60
+    python cli.py "test instances/sat*.txt" --format csv --output results.csv
+
+Each instance is solved in its own worker process under a budget (see budget.py): --timeout
+seconds of wall time, --rlimit Z3 resource units and a --memory-mb ceiling on the worker's
+resident memory, each defaulting to the environment's limits. An instance that runs out
+gets status "timeout" or "memout" rather than an answer, and a worker still running
+GRACE_SECONDS past its time limit is terminated. Results are written in completion order
+as JSON lines or CSV rows.
+Solved instances are cached on disk (see cache.py); pass --no-cache to always solve.
+--encoding portfolio races Z3 and CP-SAT configurations on one instance at a time
+(see portfolio.py), using the timeout as the portfolio's time limit. --encoding optimize
+minimizes room slack, exam spread and invigilator load (see optimize.py) and reports the
+best schedule found within the timeout. --encoding lns improves a schedule of one instance at
+a time by large-neighbourhood search (see lns.py), with --workers processes re-solving
+neighbourhoods in parallel; it is meant for instances too large for optimize. --explain
+attaches an unsat core to every UNSAT result presolve has no reason for: the specific
+exams, students and invigilator limits in conflict (see diagnose.py).
+--symmetry-breaking orders interchangeable invigilators and equal rooms in the Z3 encodings.
+--invigilators replaces each instance's invigilator pool with one read from JSON:
+
+    {"invigilators": 60, "max_exams": 2, "limits": {"3": 1}, "unavailable": {"5": [0, 1]}}
+"""
+import argparse
+import csv
+import glob
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+
+from backends import ENCODINGS, load_backend
+from budget import MEMOUT_EXIT_CODE, Budget, MemoryWatchdog, memout_message, start_budget
+from cache import ResultCache, default_cache
+from instance import InvigilatorPool, instance_files, read_file
+from instrumentation import PROFILERS, phase
+from results import result_to_dict
+
+CSV_FIELDS = ["file", "status", "cached", "solved_by", "parse_time_ms", "lookup_time_ms", "presolve_time_ms", "heuristic_time_ms", "components_time_ms", "merge_time_ms", "build_time_ms", "check_time_ms", "extract_time_ms", "core_time_ms", "render_time_ms", "conflicts", "decisions", "objective", "optimal", "exam", "room", "slot", "students", "invigilators", "reason", "core", "error"]
+
+# Extra seconds a worker gets past its time limit to stop by itself and report
+GRACE_SECONDS = 10
+
+def collect_files(paths):
+    """
+    Expands files, directories (their instance files, see instance.instance_files) and glob
+    patterns, keeping the first occurrence of each file.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(instance_files(path))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"No instance files match {path}")
+            files.extend(matches)
+    return list(dict.fromkeys(files))
+
+def solve_instance_file(file, encoding="ground", cache=None, budget=None, profile=None, pool=None, diagnose=False, symmetry_breaking=False, workers=None):
+    """
+    Reads, solves and renders one file into a result dict that also carries the file and
+    every phase time. budget, a budget.Budget, limits the file from parsing on. pool, an
+    InvigilatorPool, overrides the one in the file. With diagnose, UNSAT results carry an
+    unsat core. symmetry_breaking is passed on to solve, workers to lns.
+    """
+    try:
+        budget = start_budget(budget)
+        timings = {}
+        with phase(timings, "parse"):
+            instance = read_file(file)
+        if pool is not None:
+            instance.invigilators = pool
+        if encoding in ("portfolio", "optimize"):
+            run = load_backend(encoding)
+            solved = run(instance, cache=cache, budget=budget) if encoding == "portfolio" else run(instance, budget=budget)
+        elif encoding == "lns":
+            solved = load_backend("lns")(instance, workers=workers, budget=budget)
+        else:
+            solved = load_backend("z3")(instance, encoding, cache, profile=profile, symmetry_breaking=symmetry_breaking, budget=budget)
+        # Optimize and LNS relax constraint 9, so the core of the ground model does not apply.
+        # Imported here, diagnose.py loads Z3 only when a core is wanted
+        if diagnose and encoding not in ("optimize", "lns"):
+            from diagnose import explain
+            explain(instance, solved)
+        solved.timings = {**timings, **solved.timings}
+        with phase(solved.timings, "render"):
+            result = result_to_dict(solved)
+        result["render_time_ms"] = solved.timings["render"]
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+    result["file"] = file
+    return result
+
+def _worker(file, encoding, cache, budget, profile, pool, diagnose, symmetry_breaking, connection):
+    budget = start_budget(budget)
+    MemoryWatchdog(budget.memory_mb)
+    connection.send(solve_instance_file(file, encoding, cache, budget, profile, pool, diagnose, symmetry_breaking))
+    connection.close()
+
+def _preload(encoding, diagnose):
+    """Imports the backend once in this process, so that forked workers inherit it rather than each importing it."""
+    if multiprocessing.get_start_method() == "fork":
+        load_backend(encoding if encoding in ("portfolio", "optimize") else "z3")
+        if diagnose:
+            importlib.import_module("diagnose")
+
+def run_batch(files, workers=None, budget=None, encoding="ground", cache=None, profile=None, pool=None, diagnose=False, symmetry_breaking=False):
+    """
+    Solves the files in up to `workers` processes at a time and yields one result dict per
+    file as it completes. Each file gets its own copy of budget (see budget.py); the
+    workers stop at its time limit themselves, and one still running GRACE_SECONDS later
+    is terminated and reported with status "timeout". A worker that outgrows the memory
+    ceiling is reported with status "memout".
+    """
+    workers = workers or os.cpu_count() or 1
+    _preload(encoding, diagnose)
+    limits = start_budget(budget)  # Only read here; every worker starts its own clock
+    limit = None if limits.time_limit is None else limits.time_limit + GRACE_SECONDS
+    waiting = list(reversed(files))
+    running = {}  # result connection -> (process, file, start time)
+
+    while waiting or running:
+        while waiting and len(running) < workers:
+            file = waiting.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_worker, args=(file, encoding, cache, budget, profile, pool, diagnose, symmetry_breaking, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (process, file, time.monotonic())
+
+        ready = wait(list(running), timeout=0.1)
+        for receiver in list(running):
+            process, file, started = running[receiver]
+            if receiver in ready:
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    if process.exitcode == MEMOUT_EXIT_CODE:
+                        result = {"file": file, "status": "memout", "reason": memout_message(limits.memory_mb)}
+                    else:
+                        result = {"file": file, "status": "error", "error": f"Worker exited with code {process.exitcode}"}
+            elif limit is not None and time.monotonic() - started > limit:
+                process.terminate()
+                result = {"file": file, "status": "timeout", "error": f"Exceeded the {limits.time_limit:g}s time limit by {GRACE_SECONDS}s"}
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[receiver]
+            yield result
+
+def run_portfolio(files, budget=None, cache=None, pool=None, diagnose=False):
+    """Solves the files one after another, each with a whole portfolio of solver processes."""
+    for file in files:
+        yield solve_instance_file(file, "portfolio", cache, budget, pool=pool, diagnose=diagnose)
+
+def run_lns(files, workers=None, budget=None, pool=None):
+    """Improves the files one after another, each by a large-neighbourhood search on workers processes."""
+    for file in files:
+        yield solve_instance_file(file, "lns", budget=budget, pool=pool, workers=workers)
+
+def write_jsonl(results, out):
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        yield result
+
+def write_csv(results, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for result in results:
+        # One row per exam; instances without an assignment still get a row
+        for exam in result.get("exams") or [{}]:
+            row = dict(result, **exam)
+            row.update({key: result.get("statistics", {}).get(key) for key in ("conflicts", "decisions")})
+            row["objective"] = (result.get("objective") or {}).get("total")
+            row["core"] = "; ".join(item["description"] for item in result.get("core", []))
+            if "invigilators" in exam:
+                row["invigilators"] = " ".join(str(i) for i in exam["invigilators"])
+            writer.writerow(row)
+        out.flush()
+        yield result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve exam timetabling instances without the GUI.")
+    parser.add_argument("paths", nargs="+", help="instance files (text or binary), directories of them, or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="parallel worker processes (default: CPU count)")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="per-instance time limit in seconds (default: $EXAM_SCHEDULER_TIME_LIMIT)")
+    parser.add_argument("--rlimit", type=int, default=None, help="per-instance Z3 resource limit (default: $EXAM_SCHEDULER_RLIMIT)")
+    parser.add_argument("--memory-mb", type=int, default=None, help="resident memory ceiling of each worker in MB (default: $EXAM_SCHEDULER_MEMORY_MB)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    parser.add_argument("--encoding", choices=list(ENCODINGS) + ["portfolio", "optimize", "lns"], default="ground")
+    parser.add_argument("--no-cache", action="store_true", help="solve every instance even if a cached result exists")
+    parser.add_argument("--profile", choices=PROFILERS, default=None, help="attach a cProfile or tracemalloc report to each result")
+    parser.add_argument("--cache-dir", default=None, help="result cache directory (default: ~/.cache/exam_scheduler)")
+    parser.add_argument("--invigilators", default=None, help="JSON invigilator pool that replaces the one in each instance")
+    parser.add_argument("--explain", action="store_true", help="attach an unsat core to UNSAT results that presolve did not explain")
+    parser.add_argument("--symmetry-breaking", action="store_true", help="break invigilator and room symmetries in the Z3 encodings")
+    args = parser.parse_args(argv)
+
+    budget = Budget(args.timeout, args.rlimit, args.memory_mb)
+    cache = None if args.no_cache else ResultCache(args.cache_dir) if args.cache_dir else default_cache()
+
+    try:
+        files = collect_files(args.paths)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+    pool = None
+    if args.invigilators:
+        try:
+            with open(args.invigilators, encoding="utf-8") as f:
+                pool = InvigilatorPool.from_dict(json.load(f))
+        except (OSError, ValueError) as e:
+            parser.error(f"Could not read the invigilator pool: {e}")
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        write = write_csv if args.format == "csv" else write_jsonl
+        if args.encoding == "portfolio":
+            results = run_portfolio(files, budget, cache, pool, args.explain)
+        elif args.encoding == "lns":
+            results = run_lns(files, args.workers, budget, pool)
+        else:
+            results = run_batch(files, args.workers, budget, args.encoding, cache, args.profile, pool, args.explain, args.symmetry_breaking)
+        statuses = [result["status"] for result in write(results, out)]
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if "error" in statuses else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Unsat-core diagnostics: which constraints of an infeasible instance are in conflict.
+
+The ground encoding is rebuilt with every constraint family behind its own assumption
+literal: the room/slot uniqueness rule, each exam's room rule, each student's spacing,
+each exam's invigilator count and each invigilator's limits. Z3's unsat core under all
+literals names families that cannot hold together; the core is then shrunk by deletion
+(drop one family, re-check) until none can be dropped or CORE_TIME_LIMIT runs out.
+
+    result = solve(instance)
+    explain(instance, result)
+    for item in result.core:
+        print(item["description"])
+"""
+from timeit import default_timer as timer
+
+from z3 import And, Bool, Distinct, Implies, Int, Or, Solver, unknown, unsat
+
+from presolve import invigilators_needed, room_domains
+from solver import add_invigilator_constraints
+
+# Seconds spent on finding and minimizing a core
+CORE_TIME_LIMIT = 10.0
+
+# Order in which the families of a core are listed
+CORE_FAMILIES = ("cells", "room", "student", "invigilators", "invigilator")
+
+def _describe(instance, family, id):
+    if family == "cells":
+        return f"At most one exam per room and slot ({instance.number_of_rooms} rooms x {instance.number_of_slots} slots)"
+    if family == "room":
+        rooms = ", ".join(map(str, room_domains(instance)[id])) or "none fits"
+        return f"Exam {id} has {instance.student_exam_capacity[id]} students and must use its smallest fitting room ({rooms})"
+    if family == "student":
+        exams = sorted(set(instance.index.exams_of(id).tolist()))
+        return f"Student {id} takes exams {', '.join(map(str, exams))}, which must be at least two slots apart"
+    if family == "invigilators":
+        return f"Exam {id} needs {invigilators_needed(instance.student_exam_capacity[id])} invigilators"
+    pool = instance.invigilators
+    text = f"Invigilator {id} covers at most {pool.max_exams_of(id)} exams, none in the same or adjacent slots"
+    if pool.unavailable_slots(id):
+        text += f", and is unavailable in slots {', '.join(map(str, pool.unavailable_slots(id)))}"
+    return text
+
+def _apart(t1, t2):
+    return Or(t1 - t2 > 1, t2 - t1 > 1)
+
+def build_tracked_model(instance):
+    """
+    The ground model (constraints 1-9) with each constraint family guarded by a literal.
+    Returns the solver and a dict literal -> (family, id); id is the exam, student or
+    invigilator the family belongs to, None for "cells".
+    """
+    s = Solver()
+    families = {}
+
+    def track(family, id, constraints):
+        literal = Bool(f"track_{family}" if id is None else f"track_{family}_{id}")
+        families[literal] = (family, id)
+        s.add(Implies(literal, And(constraints)))
+
+    exams = range(instance.number_of_exams)
+    exam_room = [Int(f"room_{e}") for e in exams]
+    exam_time = [Int(f"slot_{e}") for e in exams]
+    for e in exams:
+        s.add(exam_room[e] >= 0, exam_room[e] < instance.number_of_rooms)
+        s.add(exam_time[e] >= 0, exam_time[e] < instance.number_of_slots)
+
+    # Constraint 1 and 2
+    if instance.number_of_exams > 1:
+        track("cells", None, [Distinct([exam_room[e] * instance.number_of_slots + exam_time[e] for e in exams])])
+
+    # Constraint 3 and 9
+    for e, domain in enumerate(room_domains(instance)):
+        track("room", e, [Or([exam_room[e] == rm for rm in domain]) if domain else False])
+
+    # Constraint 4, per student; students share most of their exam pairs, so each pair's
+    # term is built once
+    apart = {(e1, e2): _apart(exam_time[e1], exam_time[e2]) for e1, e2 in instance.index.conflict_pairs}
+    for student in range(instance.number_of_students):
+        taken = sorted(set(instance.index.exams_of(student).tolist()))
+        if len(taken) > 1:
+            track("student", student, [apart[e1, e2] for k, e1 in enumerate(taken) for e2 in taken[k + 1:]])
+
+    # Constraints 5-8 on the solver's duty encoding: an exam's invigilator count is a term
+    # pinned under its literal, and an invigilator's covers are tied to its duties (which
+    # carry its limit, spacing and availability) under its own
+    needed = [Int(f"needed_{e}") for e in exams]
+    for e in exams:
+        track("invigilators", e, [needed[e] == invigilators_needed(instance.student_exam_capacity[e])])
+    guards = []
+    for i in range(instance.invigilators.size):
+        guards.append(Bool(f"track_invigilator_{i}"))
+        families[guards[-1]] = ("invigilator", i)
+    add_invigilator_constraints(s, instance, exam_time, needed, guards)
+    return s, families
+
+def unsat_core(instance, time_limit=CORE_TIME_LIMIT):
+    """
+    Returns (core, minimal). core lists the conflicting constraint families as dicts with
+    "constraint" (see CORE_FAMILIES), "id" and "description"; it is empty when the
+    instance could not be shown UNSAT within time_limit seconds. minimal is True when
+    every family in the core was shown to be needed. Building the model counts against
+    time_limit.
+    """
+    deadline = timer() + time_limit
+    s, families = build_tracked_model(instance)
+    s.set("core.minimize", True)
+
+    def check(literals):
+        remaining = deadline - timer()
+        if remaining <= 0:
+            return unknown
+        s.set("timeout", max(1, int(remaining * 1000)))
+        return s.check(literals)
+
+    if check(list(families)) != unsat:
+        return [], False
+    core = list(s.unsat_core())
+
+    # Deletion-based minimization; a family whose removal times out is kept
+    minimal = True
+    k = 0
+    while k < len(core):
+        status = check(core[:k] + core[k + 1:])
+        if status == unsat:
+            smaller = {literal.get_id() for literal in s.unsat_core()}
+            core = [literal for literal in core[:k] + core[k + 1:] if literal.get_id() in smaller]
+        else:
+            minimal = minimal and status != unknown
+            k += 1
+
+    items = sorted((families[literal] for literal in core), key=lambda item: (CORE_FAMILIES.index(item[0]), item[1] or 0))
+    return [{"constraint": family, "id": id, "description": _describe(instance, family, id)} for family, id in items], minimal
+
+def explain(instance, result, time_limit=CORE_TIME_LIMIT):
+    """
+    Attaches an unsat core to an UNSAT result (see ScheduleResult.core); other results, and
+    UNSAT results presolve already gave a reason for, are left alone.
+    """
+    if result.status == "unsat" and not result.core and result.reason is None:
+        start = timer()
+        result.core, result.core_minimal = unsat_core(instance, time_limit)
+        result.timings["core"] = (timer() - start) * 1000
+    return result
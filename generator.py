@@ -0,0 +1,139 @@
+"""
+Seeded generator of exam timetabling instances for benchmarks.
+
+    python generator.py out.txt --students 60 --exams 12 --slots 24 --rooms 3 --mode sat --seed 1
+
+An output ending in .bin is written in the binary format (see instance.write_binary).
+
+density is the chance that a student takes any one exam (every student takes at least
+one) and tightness is the largest exam's size divided by the room capacity, so 1.0 leaves
+no slack. Modes:
+
+  random  enrolments and capacities drawn at random; the status is not known up front
+  sat     a timetable is planted first and students only take exams it keeps two slots
+          apart, with equal room capacities, so the instance is satisfiable by construction
+  unsat   the sat instance plus a clique of (slots + 1) // 2 + 1 exams that pairwise share
+          a student; they would need more non-adjacent slots than exist. Each student
+          still takes two exams, so the presolve student check does not catch it.
+  pigeonhole  exams of one student each in 3 slots of equal rooms, with (exams + 1) // 2
+          invigilators of 2 exams each (the pool argument is ignored). Presolve's counting
+          checks pass, but an invigilator with two exams needs slots 0 and 2, so at most
+          rooms + invigilators exams can be covered; rooms must be below exams // 2.
+          Invigilators and rooms are all interchangeable, which makes the UNSAT proof a
+          benchmark for symmetry breaking.
+"""
+import argparse
+import math
+
+import numpy as np
+
+from instance import Instance, InvigilatorPool, write_file
+from presolve import assign_invigilators
+
+GENERATOR_MODES = ("random", "sat", "unsat", "pigeonhole")
+
+def _planted_slots(number_of_exams, number_of_slots, number_of_rooms):
+    """Exam -> slot, filling even slots before odd ones and at most number_of_rooms exams per slot."""
+    if number_of_exams > number_of_rooms * number_of_slots:
+        raise ValueError(f"{number_of_exams} exams cannot be planted in {number_of_rooms} rooms x {number_of_slots} slots")
+    order = list(range(0, number_of_slots, 2)) + list(range(1, number_of_slots, 2))
+    return np.array([order[e % number_of_slots] for e in range(number_of_exams)], dtype=np.int32)
+
+def _build(students, exams, slots, rooms, exam_ids, student_ids, capacities):
+    instance = Instance()
+    instance.number_of_students = students
+    instance.number_of_exams = exams
+    instance.number_of_slots = slots
+    instance.number_of_rooms = rooms
+    instance.room_capacities = [int(capacity) for capacity in capacities]
+    instance.exam_ids = np.asarray(exam_ids, dtype=np.int32)
+    instance.student_ids = np.asarray(student_ids, dtype=np.int32)
+    instance.student_exam_capacity = np.bincount(instance.exam_ids, minlength=exams).tolist()
+    return instance
+
+def _pigeonhole(exams, slots, rooms):
+    if slots != 3 or not exams // 2 > rooms >= exams / 3:
+        raise ValueError("A pigeonhole instance needs 3 slots and exams / 3 <= rooms < exams // 2")
+    instance = _build(exams, exams, slots, rooms, range(exams), range(exams), [1] * rooms)
+    instance.invigilators = InvigilatorPool((exams + 1) // 2, 2)
+    return instance
+
+def generate(students, exams, slots, rooms, density=0.2, tightness=0.8, mode="random", seed=0, pool=None):
+    """
+    Returns a generated Instance with the given InvigilatorPool (10 invigilators by default);
+    raises ValueError when a sat/unsat instance cannot be planted.
+    """
+    if mode not in GENERATOR_MODES:
+        raise ValueError(f"Unknown mode {mode}; expected one of {', '.join(GENERATOR_MODES)}")
+    if not 0 < tightness <= 1:
+        raise ValueError("tightness must be in (0, 1]")
+    if mode == "pigeonhole":
+        return _pigeonhole(exams, slots, rooms)
+    rng = np.random.default_rng(seed)
+    planted = _planted_slots(exams, slots, rooms) if mode != "random" else None
+
+    exam_ids, student_ids = [], []
+    for student in range(students):
+        wanted = max(1, rng.binomial(exams, density))
+        if planted is None:
+            chosen = rng.choice(exams, size=min(wanted, exams), replace=False).tolist()
+        else:
+            # Only exams whose planted slots are pairwise at least two apart
+            chosen, taken = [], []
+            for exam in rng.permutation(exams).tolist():
+                if all(abs(int(planted[exam]) - slot) > 1 for slot in taken):
+                    chosen.append(exam)
+                    taken.append(int(planted[exam]))
+                    if len(chosen) == wanted:
+                        break
+        exam_ids.extend(chosen)
+        student_ids.extend([student] * len(chosen))
+
+    if mode == "unsat":
+        clique = (slots + 1) // 2 + 1
+        if clique > exams:
+            raise ValueError(f"An unsat instance with {slots} slots needs at least {clique} exams")
+        # One extra student per pair of clique exams
+        for e1 in range(clique):
+            for e2 in range(e1 + 1, clique):
+                exam_ids.extend([e1, e2])
+                student_ids.extend([students, students])
+                students += 1
+
+    largest = max(np.bincount(np.asarray(exam_ids, dtype=np.int64), minlength=exams).max(initial=0), 1)
+    top = max(1, math.ceil(largest / tightness))
+    if planted is None:
+        capacities = rng.integers(largest if tightness == 1 else max(1, math.floor(largest * tightness)), top + 1, size=rooms)
+    else:
+        capacities = np.full(rooms, top)
+    instance = _build(students, exams, slots, rooms, exam_ids, student_ids, capacities)
+    if pool is not None:
+        instance.invigilators = pool
+
+    if mode == "sat" and assign_invigilators(instance, planted) is None:
+        raise ValueError("The planted timetable needs more invigilators than available; lower exams or density")
+    return instance
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate an exam timetabling instance.")
+    parser.add_argument("output", help="instance file to write")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--exams", type=int, default=10)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.2, help="chance a student takes any one exam")
+    parser.add_argument("--tightness", type=float, default=0.8, help="largest exam size / room capacity, in (0, 1]")
+    parser.add_argument("--mode", choices=GENERATOR_MODES, default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--invigilators", type=int, default=10)
+    parser.add_argument("--max-exams", type=int, default=2, help="exams each invigilator may cover")
+    args = parser.parse_args(argv)
+    try:
+        pool = InvigilatorPool(args.invigilators, args.max_exams)
+        instance = generate(args.students, args.exams, args.slots, args.rooms, args.density, args.tightness, args.mode, args.seed, pool)
+    except ValueError as e:
+        parser.error(str(e))
+    write_file(instance, args.output)
+
+if __name__ == "__main__":
+    main()
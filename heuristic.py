@@ -0,0 +1,123 @@
+"""
+Constructive heuristic: DSatur colouring of the exam conflict graph with timeslots as
+colours, packing rooms and invigilators greedily as each exam is placed.
+
+The exam with the most blocked slots goes next (ties: the most conflicting exams). A
+scheduled exam blocks its own slot and both neighbours for the exams it conflicts with
+(constraint 4). The exam takes the lowest slot with a free smallest fitting room (constraints
+2, 3 and 9) and enough free invigilators. Those are invigilators under their limit, available
+in that slot, and without a duty in the same or an adjacent slot (constraints 5-8); the least
+loaded ones are chosen.
+
+    construction = construct(instance)
+    if construction.complete:
+        ...  # a schedule satisfying every constraint
+    else:
+        print(construction.reason)  # where it got stuck; the placed exams are still usable as hints
+
+Exams that cannot be placed are left at -1 and the rest are still placed, so solvers can
+use a partial construction as a warm start.
+"""
+import numpy as np
+
+from presolve import invigilators_needed, room_domains
+from results import ScheduleResult
+
+class Construction:
+    """
+    exam_room and exam_slot are int32 arrays with -1 for exams the heuristic could not
+    place; exam_invigilators lists each exam's invigilators. stuck holds (exam, why) pairs.
+    """
+    def __init__(self, number_of_exams):
+        self.exam_room = np.full(number_of_exams, -1, dtype=np.int32)
+        self.exam_slot = np.full(number_of_exams, -1, dtype=np.int32)
+        self.exam_invigilators = [[] for _ in range(number_of_exams)]
+        self.stuck = []
+
+    @property
+    def complete(self):
+        return not self.stuck
+
+    @property
+    def reason(self):
+        """Where the heuristic got stuck, or None for a complete construction."""
+        if not self.stuck:
+            return None
+        exam, why = self.stuck[0]
+        more = f" ({len(self.stuck) - 1} more exams unplaced)" if len(self.stuck) > 1 else ""
+        return f"Exam {exam}: {why}{more}"
+
+    def placed(self):
+        return np.flatnonzero(self.exam_slot >= 0)
+
+    def to_result(self, instance, timings):
+        """The SAT ScheduleResult of a complete construction."""
+        result = ScheduleResult(instance, "sat", timings)
+        result.exam_room = self.exam_room.copy()
+        result.exam_slot = self.exam_slot.copy()
+        result.exam_invigilators = [list(invigilators) for invigilators in self.exam_invigilators]
+        result.number_of_invigilators = instance.invigilators.size
+        return result
+
+def construct(instance, domains=None):
+    """Runs the heuristic; domains are the exams' room domains (presolve.room_domains by default)."""
+    domains = room_domains(instance) if domains is None else domains
+    slots = instance.number_of_slots
+    exams = instance.number_of_exams
+    pool = instance.invigilators
+    construction = Construction(exams)
+
+    neighbours = [instance.index.neighbours_of(e) for e in range(exams)]
+    degree = np.array([len(n) for n in neighbours], dtype=np.int64)
+    blocked = np.zeros((exams, slots + 2), dtype=bool)  # Padded by one slot on either side
+    room_taken = np.zeros((slots, instance.number_of_rooms), dtype=bool)
+    duty_near = np.zeros((pool.size, slots + 2), dtype=bool)  # A duty in the slot or next to it
+    unavailable = np.zeros((pool.size, slots), dtype=bool)
+    for i in range(pool.size):
+        unavailable[i, pool.unavailable_slots(i)] = True
+    limit = np.array([pool.max_exams_of(i) for i in range(pool.size)], dtype=np.int64)
+    load = np.zeros(pool.size, dtype=np.int64)
+
+    # DSatur order: most blocked slots first, then the highest degree, then the lowest exam
+    # (argmax returns the first maximum); placed exams drop to -1
+    ties = int(degree.max(initial=0)) + 1
+    priority = degree.copy()
+    for _ in range(exams):
+        exam = int(np.argmax(priority))
+        priority[exam] = -1
+
+        needed = invigilators_needed(instance.student_exam_capacity[exam])
+        placed = False
+        why = "every slot is next to one of its conflicting exams" if domains[exam] else "no room is large enough"
+        for slot in np.flatnonzero(~blocked[exam, 1:-1]).tolist() if domains[exam] else []:
+            free_rooms = [rm for rm in domains[exam] if not room_taken[slot, rm]]
+            if not free_rooms:
+                why = "no free smallest fitting room in any slot left by its conflicting exams"
+                continue
+            free = np.flatnonzero(~duty_near[:, slot + 1] & ~unavailable[:, slot] & (load < limit))
+            if len(free) < needed:
+                why = f"not enough free invigilators ({needed} needed) in any slot with a free room"
+                continue
+            chosen = free[np.argsort(load[free], kind="stable")[:needed]]
+            room_taken[slot, free_rooms[0]] = True
+            load[chosen] += 1
+            duty_near[chosen, slot:slot + 3] = True
+            construction.exam_room[exam] = free_rooms[0]
+            construction.exam_slot[exam] = slot
+            construction.exam_invigilators[exam] = sorted(chosen.tolist())
+            waiting = neighbours[exam][priority[neighbours[exam]] >= 0]
+            blocked[waiting, slot:slot + 3] = True
+            priority[waiting] = blocked[waiting, 1:-1].sum(axis=1) * ties + degree[waiting]
+            placed = True
+            break
+        if not placed:
+            construction.stuck.append((exam, why))
+
+    # In each slot, exams sharing a room domain take its rooms in exam order, the canonical
+    # order of the symmetry-breaking constraints (see solver.add_symmetry_breaking)
+    shared = {}
+    for exam in construction.placed().tolist():
+        shared.setdefault((int(construction.exam_slot[exam]), tuple(domains[exam])), []).append(exam)
+    for exams_in_slot in shared.values():
+        construction.exam_room[exams_in_slot] = np.sort(construction.exam_room[exams_in_slot])
+    return construction
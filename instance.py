@@ -0,0 +1,417 @@
+import io
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+class Enrolments:
+    """Read-only sequence of (exam, student) pairs backed by the instance's int32 arrays."""
+    def __init__(self, exam_ids, student_ids):
+        self.exam_ids = exam_ids
+        self.student_ids = student_ids
+
+    def __len__(self):
+        return len(self.exam_ids)
+
+    def __getitem__(self, i):
+        return int(self.exam_ids[i]), int(self.student_ids[i])
+
+    def __iter__(self):
+        return zip(self.exam_ids.tolist(), self.student_ids.tolist())
+
+class InvigilatorPool:
+    """
+    The invigilators available to an instance: how many there are, how many exams each
+    may cover (max_exams, overridden per invigilator by limits) and the slots each one
+    cannot work (unavailable).
+    """
+    def __init__(self, size=10, max_exams=2, limits=None, unavailable=None):
+        self.size = size
+        self.max_exams = max_exams
+        self.limits = {int(i): int(limit) for i, limit in (limits or {}).items()}
+        self.unavailable = {int(i): sorted(set(map(int, slots))) for i, slots in (unavailable or {}).items() if slots}
+        for i in list(self.limits) + list(self.unavailable):
+            if not 0 <= i < size:
+                raise ValueError(f"Invigilator {i} is out of range; the pool has {size} invigilators")
+
+    def max_exams_of(self, i):
+        return self.limits.get(i, self.max_exams)
+
+    def unavailable_slots(self, i):
+        return self.unavailable.get(i, [])
+
+    def available(self, i, slot):
+        return slot not in self.unavailable.get(i, ())
+
+    def interchangeable(self):
+        """Groups of two or more invigilators with the same limit and unavailable slots, each in index order."""
+        groups = {}
+        for i in range(self.size):
+            groups.setdefault((self.max_exams_of(i), tuple(self.unavailable_slots(i))), []).append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def to_dict(self):
+        return {
+            "invigilators": self.size,
+            "max_exams": self.max_exams,
+            "limits": {str(i): limit for i, limit in sorted(self.limits.items())},
+            "unavailable": {str(i): slots for i, slots in sorted(self.unavailable.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """The inverse of to_dict; missing keys take the defaults."""
+        return cls(data.get("invigilators", 10), data.get("max_exams", 2), data.get("limits"), data.get("unavailable"))
+
+class Instance:
+    def __init__(self):
+        self.number_of_students = 0
+        self.number_of_exams = 0
+        self.number_of_slots = 0
+        self.number_of_rooms = 0
+        self.room_capacities = []
+        self.exam_ids = np.zeros(0, dtype=np.int32)
+        self.student_ids = np.zeros(0, dtype=np.int32)
+        self.student_exam_capacity = []
+        self.invigilators = InvigilatorPool()
+        self._index = None
+
+    @property
+    def exams_to_students(self):
+        return Enrolments(self.exam_ids, self.student_ids)
+
+    @exams_to_students.setter
+    def exams_to_students(self, pairs):
+        pairs = np.asarray(list(pairs), dtype=np.int32).reshape(-1, 2)
+        self.exam_ids = np.ascontiguousarray(pairs[:, 0])
+        self.student_ids = np.ascontiguousarray(pairs[:, 1])
+        self._index = None
+
+    def add_enrolment(self, exam, student):
+        """Appends an (exam, student) row; a new student id grows number_of_students."""
+        if not 0 <= exam < self.number_of_exams:
+            raise ValueError(f"Exam {exam} is out of range; the instance has {self.number_of_exams} exams")
+        if student < 0:
+            raise ValueError(f"Student {student} is out of range")
+        self.exam_ids = np.append(self.exam_ids, np.int32(exam))
+        self.student_ids = np.append(self.student_ids, np.int32(student))
+        self.number_of_students = max(self.number_of_students, student + 1)
+        # Copy rather than mutate, earlier results keep a reference to the old counts
+        self.student_exam_capacity = list(self.student_exam_capacity)
+        self.student_exam_capacity[exam] += 1
+        self._index = None
+
+    def remove_enrolment(self, exam, student):
+        """Removes the last (exam, student) row."""
+        rows = np.flatnonzero((self.exam_ids == exam) & (self.student_ids == student))
+        if not len(rows):
+            raise ValueError(f"Student {student} is not enrolled in exam {exam}")
+        self.exam_ids = np.delete(self.exam_ids, rows[-1])
+        self.student_ids = np.delete(self.student_ids, rows[-1])
+        self.student_exam_capacity = list(self.student_exam_capacity)
+        self.student_exam_capacity[exam] -= 1
+        self._index = None
+
+    @property
+    def index(self):
+        """The exam/student adjacency index, built on first use."""
+        if self._index is None:
+            self.build_index()
+        return self._index
+
+    def build_index(self):
+        """(Re)builds the index; call again after editing the enrolment arrays."""
+        self._index = InstanceIndex(self.number_of_exams, self.number_of_students, self.exam_ids, self.student_ids)
+        return self._index
+
+def _compressed_rows(number_of_rows, rows, columns):
+    """Stable-sort (row, column) pairs into CSR offsets and columns, keeping the input order within a row."""
+    offsets = np.zeros(number_of_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=number_of_rows), out=offsets[1:])
+    return offsets, columns[np.argsort(rows, kind="stable")]
+
+class InstanceIndex:
+    """
+    Compact exam<->student adjacency and exam conflict graph, all in CSR form.
+
+    students_of(e) and exams_of(s) return enrolment rows in file order (duplicates included),
+    matching a scan over exams_to_students. Two distinct exams conflict when they share at
+    least one student; the edge weight is the number of shared students.
+    """
+    def __init__(self, number_of_exams, number_of_students, exam_ids, student_ids):
+        self.exam_offsets, self.exam_students = _compressed_rows(number_of_exams, exam_ids, student_ids)
+        self.student_offsets, self.student_exams = _compressed_rows(number_of_students, student_ids, exam_ids)
+
+        # Distinct (student, exam) enrolments sorted by student, then exam
+        keys = np.sort(student_ids.astype(np.int64) * number_of_exams + exam_ids)
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+        students, exams = np.divmod(keys, max(number_of_exams, 1))
+
+        # Pair every enrolment with the ones d positions later for the same student, d = 1, 2, ...
+        codes = []
+        start = np.arange(len(keys))
+        for d in range(1, len(keys)):
+            # Only enrolments that still had a partner at distance d - 1 can have one at distance d
+            start = start[start + d < len(keys)]
+            start = start[students[start + d] == students[start]]
+            if not len(start):
+                break
+            codes.append(exams[start] * number_of_exams + exams[start + d])
+        codes, weights = np.unique(np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64), return_counts=True)
+        first, second = np.divmod(codes, max(number_of_exams, 1))
+
+        self.conflict_pairs = list(zip(first.tolist(), second.tolist()))
+        self.conflict_weights = weights
+        self.conflict_offsets, self.conflict_neighbours = _compressed_rows(
+            number_of_exams, np.concatenate([first, second]), np.concatenate([second, first]))
+
+    def students_of(self, exam):
+        return self.exam_students[self.exam_offsets[exam]:self.exam_offsets[exam + 1]]
+
+    def exams_of(self, student):
+        return self.student_exams[self.student_offsets[student]:self.student_offsets[student + 1]]
+
+    def neighbours_of(self, exam):
+        """Exams that share at least one student with the given exam."""
+        return self.conflict_neighbours[self.conflict_offsets[exam]:self.conflict_offsets[exam + 1]]
+
+    def degree(self, exam):
+        return self.conflict_offsets[exam + 1] - self.conflict_offsets[exam]
+
+# Bytes allowed in the enrolment body: digits and the whitespace matched by \s
+_BODY_BYTES = np.zeros(256, dtype=bool)
+_BODY_BYTES[list(b"0123456789 \t\n\r\f\v")] = True
+
+def _parse_enrolments(body):
+    """Parses the "exam student" lines of a file body into two int32 arrays without a per-line loop."""
+    if not body:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    buffer = np.frombuffer(body, dtype=np.uint8)
+    newline = buffer == ord("\n")
+    line_of_byte = np.cumsum(newline) - newline
+    number_of_lines = int(line_of_byte[-1]) + 1
+
+    digit = (buffer >= ord("0")) & (buffer <= ord("9"))
+    token_start = digit.copy()
+    token_start[1:] &= ~digit[:-1]
+
+    # Every line must hold exactly two numbers and nothing but whitespace around them
+    bad_lines = np.bincount(line_of_byte[token_start], minlength=number_of_lines) != 2
+    bad_lines[line_of_byte[~_BODY_BYTES[buffer]]] = True
+    if bad_lines.any():
+        bad = int(np.argmax(bad_lines))
+        start = 0 if bad == 0 else int(np.flatnonzero(newline)[bad - 1]) + 1
+        end = body.find(b"\n", start)
+        line = body[start:] if end == -1 else body[start:end + 1]
+        raise ValueError(f'Failed to parse this line: {line.decode()}')
+
+    values = np.array(body.split(), dtype=np.int64).reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+_INVIGILATOR_LINES = {
+    "invigilators": re.compile(r"Number of invigilators:\s*(\d+)$"),
+    "max_exams": re.compile(r"Max exams per invigilator:\s*(\d+)$"),
+    "limit": re.compile(r"Invigilator (\d+) max exams:\s*(\d+)$"),
+    "unavailable": re.compile(r"Invigilator (\d+) unavailable slots:((?:\s+\d+)*)$"),
+}
+
+def _read_invigilators(f, number_of_slots):
+    """
+    Reads the optional invigilator lines between the room capacities and the enrolments;
+    files without them get the default pool of 10 invigilators with at most 2 exams each.
+
+        Number of invigilators: 60
+        Max exams per invigilator: 2
+        Invigilator 3 max exams: 1
+        Invigilator 5 unavailable slots: 0 1 2
+    """
+    data = {"limits": {}, "unavailable": {}}
+    while True:
+        position = f.tell()
+        line = f.readline().decode().strip()
+        matches = {name: pattern.match(line) for name, pattern in _INVIGILATOR_LINES.items()}
+        if matches["invigilators"]:
+            data["invigilators"] = int(matches["invigilators"].group(1))
+        elif matches["max_exams"]:
+            data["max_exams"] = int(matches["max_exams"].group(1))
+        elif matches["limit"]:
+            data["limits"][int(matches["limit"].group(1))] = int(matches["limit"].group(2))
+        elif matches["unavailable"]:
+            slots = [int(slot) for slot in matches["unavailable"].group(2).split()]
+            if any(slot >= number_of_slots for slot in slots):
+                raise ValueError(f"Could not parse line {line}; the instance has {number_of_slots} slots")
+            data["unavailable"][int(matches["unavailable"].group(1))] = slots
+        else:
+            f.seek(position)
+            return InvigilatorPool.from_dict(data)
+
+# Binary instance format, all little-endian:
+#   header   BINARY_MAGIC, then int32 students, exams, slots, rooms, int64 enrolments and
+#            int32 length of the invigilator pool's JSON (InvigilatorPool.to_dict)
+#   pool     that many bytes of UTF-8 JSON, zero-padded to a multiple of 8 bytes
+#   arrays   int32 room capacities[rooms], exam sizes[exams], exam ids[enrolments] and
+#            student ids[enrolments]
+BINARY_MAGIC = b"EXAMBIN1"
+BINARY_EXTENSION = ".bin"
+_BINARY_HEADER = struct.Struct("<8s4iqi")
+
+def _padded(length):
+    return -length % 8
+
+def write_binary(instance, filename):
+    """Writes the instance in the binary format read_binary maps back."""
+    if len(instance.exam_ids) and (instance.exam_ids.min() < 0 or instance.exam_ids.max() >= instance.number_of_exams):
+        raise ValueError(f"Exam ids must lie in 0..{instance.number_of_exams - 1}")
+    if len(instance.student_ids) and (instance.student_ids.min() < 0 or instance.student_ids.max() >= instance.number_of_students):
+        raise ValueError(f"Student ids must lie in 0..{instance.number_of_students - 1}")
+    pool = json.dumps(instance.invigilators.to_dict()).encode()
+    with open(filename, "wb") as f:
+        f.write(_BINARY_HEADER.pack(BINARY_MAGIC, instance.number_of_students, instance.number_of_exams,
+                                    instance.number_of_slots, instance.number_of_rooms, len(instance.exam_ids), len(pool)))
+        f.write(pool + bytes(_padded(_BINARY_HEADER.size + len(pool))))
+        for values in (instance.room_capacities, instance.student_exam_capacity, instance.exam_ids, instance.student_ids):
+            f.write(np.asarray(values, dtype="<i4").tobytes())
+
+def read_binary(filename):
+    """
+    Maps a binary instance file. The enrolment arrays are read-only views of the mapping,
+    so nothing is copied or parsed per row; their ids are range-checked in one pass, and
+    the index is built on first use rather than here.
+    """
+    with open(filename, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _binary_instance(buffer, filename)
+
+def _binary_instance(buffer, filename):
+    """
+    The instance whose arrays are views of a binary-format buffer (an mmap or bytes). The
+    file may not come from write_binary, so its ids and exam sizes are checked.
+    """
+    if len(buffer) < _BINARY_HEADER.size or buffer[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f"{filename} is not a binary instance file")
+    _, students, exams, slots, rooms, enrolments, pool_length = _BINARY_HEADER.unpack_from(buffer)
+    offset = _BINARY_HEADER.size + pool_length + _padded(_BINARY_HEADER.size + pool_length)
+    expected = offset + 4 * (rooms + exams + 2 * enrolments)
+    if min(students, exams, slots, rooms, enrolments, pool_length) < 0 or len(buffer) != expected:
+        raise ValueError(f"{filename} is truncated or corrupt: {len(buffer)} bytes, expected {expected}")
+
+    def array(count):
+        nonlocal offset
+        values = np.frombuffer(buffer, dtype="<i4", count=count, offset=offset)
+        offset += 4 * count
+        return values
+
+    instance = Instance()
+    instance.number_of_students = students
+    instance.number_of_exams = exams
+    instance.number_of_slots = slots
+    instance.number_of_rooms = rooms
+    instance.invigilators = InvigilatorPool.from_dict(json.loads(buffer[_BINARY_HEADER.size:_BINARY_HEADER.size + pool_length]))
+    instance.room_capacities = array(rooms).tolist()
+    instance.student_exam_capacity = array(exams).tolist()
+    instance.exam_ids = array(enrolments)
+    instance.student_ids = array(enrolments)
+    for name, ids, count in (("Exam", instance.exam_ids, exams), ("Student", instance.student_ids, students)):
+        if len(ids) and (ids.min() < 0 or ids.max() >= count):
+            raise ValueError(f"{filename}: {name} ids must lie in 0..{count - 1}")
+    if instance.student_exam_capacity != np.bincount(instance.exam_ids, minlength=exams).tolist():
+        raise ValueError(f"{filename}: the exam sizes do not match the enrolments")
+    return instance
+
+def is_binary(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+def instance_files(directory):
+    """The .txt and binary instance files in a directory, sorted; a binary copy replaces the .txt of the same name."""
+    names = {}
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension == ".txt":
+            names.setdefault(stem, name)
+        elif extension == BINARY_EXTENSION:
+            names[stem] = name
+    return [os.path.join(directory, name) for _, name in sorted(names.items())]
+
+# read file function 
+def read_file(filename):
+    """Reads a text instance, or maps a binary one (see read_binary) when the file starts with BINARY_MAGIC."""
+    if os.path.splitext(filename)[1] == BINARY_EXTENSION or is_binary(filename):
+        return read_binary(filename)
+    with open(filename, "rb") as f:
+        return _read_text(f)
+
+def read_bytes(data):
+    """Parses an instance held in memory, such as a service payload, in either format."""
+    if not data.startswith(BINARY_MAGIC):
+        return _read_text(io.BytesIO(data))
+    return _binary_instance(data, "The payload")
+
+def _read_text(f):
+    """Parses the text format from a binary file object."""
+    instance = Instance()
+
+    def read_attribute(name):
+        line = f.readline().decode().replace("\r\n", "\n")
+        match = re.match(f'{name}:\\s*(\\d+)$', line)
+        if match:
+            return int(match.group(1))
+        else:
+            raise ValueError(f"Could not parse line {line}; expected the {name} attribute")
+
+    instance.number_of_students = read_attribute("Number of students")
+    instance.number_of_exams = read_attribute("Number of exams")
+    instance.number_of_slots = read_attribute("Number of slots")
+    instance.number_of_rooms = read_attribute("Number of rooms")
+
+    for r in range(instance.number_of_rooms):
+        instance.room_capacities.append(read_attribute(f"Room {r} capacity"))
+
+    instance.invigilators = _read_invigilators(f, instance.number_of_slots)
+    exams, students = _parse_enrolments(f.read())
+
+    if len(exams) and exams.max() >= instance.number_of_exams:
+        raise ValueError(f"Exam {exams.max()} is out of range; the instance has {instance.number_of_exams} exams")
+    if len(students) and students.max() >= instance.number_of_students:
+        raise ValueError(f"Student {students.max()} is out of range; the instance has {instance.number_of_students} students")
+
+    instance.exam_ids = exams.astype(np.int32)
+    instance.student_ids = students.astype(np.int32)
+    instance.student_exam_capacity = np.bincount(instance.exam_ids, minlength=instance.number_of_exams).tolist()
+
+    instance.build_index()
+    return instance
+
+def write_file(instance, filename):
+    """Writes the instance in the format read_file expects; binary for a BINARY_EXTENSION file name."""
+    if os.path.splitext(filename)[1] == BINARY_EXTENSION:
+        return write_binary(instance, filename)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(f"Number of students: {instance.number_of_students}\n")
+        f.write(f"Number of exams: {instance.number_of_exams}\n")
+        f.write(f"Number of slots: {instance.number_of_slots}\n")
+        f.write(f"Number of rooms: {instance.number_of_rooms}\n")
+        for r, capacity in enumerate(instance.room_capacities):
+            f.write(f"Room {r} capacity: {capacity}\n")
+        pool = instance.invigilators
+        if pool.to_dict() != InvigilatorPool().to_dict():
+            f.write(f"Number of invigilators: {pool.size}\n")
+            f.write(f"Max exams per invigilator: {pool.max_exams}\n")
+        for i, limit in sorted(pool.limits.items()):
+            f.write(f"Invigilator {i} max exams: {limit}\n")
+        for i, slots in sorted(pool.unavailable.items()):
+            f.write(f"Invigilator {i} unavailable slots: {' '.join(map(str, slots))}\n")
+        f.write("".join(f"{exam} {student}\n" for exam, student in instance.exams_to_students))
+
+
+if __name__ == "__main__":
+    # Converts between the formats, by the output's extension:
+    #     python instance.py "test instances/sat1.txt" sat1.bin
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python instance.py INPUT OUTPUT")
+    write_file(read_file(sys.argv[1]), sys.argv[2])
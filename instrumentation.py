@@ -0,0 +1,118 @@
+"""
+Instrumentation helpers: phase timers, solver statistics and optional per-run profiling.
+
+    with phase(result.timings, "render"):
+        text = render_text(result)
+
+    with profiled("cprofile") as report:
+        result = ...
+    result.profile = report
+
+PROFILERS lists the accepted profile modes; None turns profiling off.
+"""
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+PROFILERS = ("cprofile", "tracemalloc")
+
+# Solver statistic names mapped onto the common keys shown for both backends
+COMMON_STATISTICS = {
+    "conflicts": "conflicts",
+    "decisions": "decisions",
+    "num_conflicts": "conflicts",
+    "num_branches": "decisions",
+    "memory": "memory_mb",
+    "max memory": "peak_memory_mb",
+    "quant instantiations": "quantifier_instantiations",
+}
+
+@contextmanager
+def phase(timings, name):
+    """Adds the block's wall time in ms to timings[name]."""
+    start = timer()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (timer() - start) * 1000
+
+def common_statistics(raw):
+    """The raw solver statistics plus the shared keys (conflicts, decisions, memory, ...)."""
+    statistics = dict(raw)
+    for key, common in COMMON_STATISTICS.items():
+        if key in raw:
+            statistics[common] = raw[key]
+    return statistics
+
+def combine_statistics(all_statistics):
+    """Sums the statistics of several solver runs; memory figures take the maximum instead."""
+    combined = {}
+    for statistics in all_statistics:
+        for key, value in statistics.items():
+            if key in combined:
+                combined[key] = max(combined[key], value) if "memory" in key else combined[key] + value
+            else:
+                combined[key] = value
+    return combined
+
+def z3_statistics(s):
+    stats = s.statistics()
+    return common_statistics({key: stats.get_key_value(key) for key in stats.keys()})
+
+def cp_sat_statistics(solver):
+    response = solver.ResponseProto()
+    return common_statistics({
+        "num_conflicts": response.num_conflicts,
+        "num_branches": response.num_branches,
+        "num_binary_propagations": response.num_binary_propagations,
+        "num_integer_propagations": response.num_integer_propagations,
+        "num_restarts": response.num_restarts,
+        "deterministic_time": response.deterministic_time,
+        "wall_time": response.wall_time,
+        "user_time": response.user_time,
+    })
+
+@contextmanager
+def profiled(mode, limit=25):
+    """
+    Profiles the block with cProfile or tracemalloc (mode None does nothing) and fills the
+    yielded dict: "cprofile" holds the top functions by cumulative time as text;
+    "tracemalloc" holds the peak traced bytes and the top allocation sites.
+    """
+    report = {}
+    if mode is None:
+        yield report
+        return
+    if mode not in PROFILERS:
+        raise ValueError(f"Unknown profiler {mode}; expected one of {', '.join(PROFILERS)}")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+            report["cprofile"] = out.getvalue()
+        return
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield report
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if started:
+            tracemalloc.stop()
+        report["tracemalloc"] = {
+            "peak_bytes": peak,
+            "top": [str(stat) for stat in snapshot.statistics("lineno")[:limit]],
+        }
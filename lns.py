@@ -0,0 +1,414 @@
+"""
+Large-neighbourhood search (LNS) for instances too large for one model: CP-SAT re-solves a
+small part of a schedule at a time while every other exam stays where it is.
+
+    result = lns(read_file(path), time_limit=600, workers=8, on_solution=show_progress)
+    result.objective  # {"room_slack": ..., "spread": ..., "invigilator_load": ..., "total": ...}
+
+The search starts from a SAT result passed as initial, or else from the constructive
+heuristic (heuristic.py). While exams are unplaced, every neighbourhood contains one of
+them and has to place all its exams (repair). Once the schedule is complete, neighbourhoods
+are re-optimized for the objectives of optimize.py, with constraint 9 relaxed as there, and
+on_solution is called with every improving ScheduleResult. A neighbourhood is built by one
+of NEIGHBOURHOODS and holds at most neighbourhood_size exams:
+
+  slot-window       the exams in three consecutive slots
+  room              the exams in two rooms, which may trade cells
+  conflict-cluster  an exam and the exams it conflicts with, breadth first
+
+Its model only has the freed exams, the invigilators that may cover them and, as domains,
+the cells, slots and duties the fixed exams leave free, so it grows with neighbourhood_size
+rather than with the instance; the instance itself is never modelled whole. Up to workers
+processes (default: the CPU count) solve neighbourhoods in parallel, each against the
+schedule as it was when handed out; an answer is applied only if it still fits the current
+schedule and, after repair, improves it.
+
+The search stops when the budget (see budget.py) runs out or after patience neighbourhoods
+in a row brought no progress. It returns the best schedule with status "sat" (optimal is
+always False), or, when repair never completed the schedule, status "timeout" (or "unknown"
+once patience ran out) with the unplaced exams as the reason. Results are not cached.
+"""
+import multiprocessing
+import os
+import queue
+from timeit import default_timer as timer
+
+import numpy as np
+
+from budget import Budget, start_budget
+from heuristic import construct
+from optimize import OBJECTIVE_WEIGHTS, SPREAD_WINDOW, objective_values
+from presolve import fitting_rooms, infeasibility_reason, invigilators_needed
+from results import ScheduleResult
+
+NEIGHBOURHOOD_SIZE = 40
+
+# CP-SAT time limit of one neighbourhood, in seconds
+NEIGHBOURHOOD_TIME_LIMIT = 1.0
+
+# Invigilators besides their own that the exams of a neighbourhood may be given
+SPARE_INVIGILATORS = 8
+
+# Neighbourhoods in a row without progress after which the search stops
+PATIENCE = 500
+
+class _Schedule:
+    """
+    The current assignment (slot -1 for unplaced exams) with the exam in each (room, slot)
+    cell and the exams of each invigilator, so that an answer is checked against it in
+    time proportional to the exams it moves.
+    """
+    def __init__(self, instance, exam_room, exam_slot, exam_invigilators):
+        self.instance = instance
+        self.exam_room = np.array(exam_room, dtype=np.int32)
+        self.exam_slot = np.array(exam_slot, dtype=np.int32)
+        self.exam_invigilators = [list(invigilators) for invigilators in exam_invigilators]
+        self.occupant = np.full((instance.number_of_rooms, instance.number_of_slots), -1, dtype=np.int64)
+        self.duties = [set() for _ in range(instance.invigilators.size)]
+        for e in self.placed().tolist():
+            self._place(e)
+
+    def placed(self):
+        return np.flatnonzero(self.exam_slot >= 0)
+
+    def unplaced(self):
+        return np.flatnonzero(self.exam_slot < 0)
+
+    def _place(self, e):
+        self.occupant[self.exam_room[e], self.exam_slot[e]] = e
+        for i in self.exam_invigilators[e]:
+            self.duties[i].add(e)
+
+    def _remove(self, e):
+        if self.exam_slot[e] >= 0:
+            self.occupant[self.exam_room[e], self.exam_slot[e]] = -1
+        for i in self.exam_invigilators[e]:
+            self.duties[i].discard(e)
+
+    def fits(self, changes):
+        """Whether changes (exam -> (room, slot, invigilators)) keep constraints 2 and 4-8 with the exams left in place."""
+        pool = self.instance.invigilators
+        cells = set()
+        for e, (room, slot, _) in changes.items():
+            occupant = int(self.occupant[room, slot])
+            if (occupant >= 0 and occupant not in changes) or (room, slot) in cells:
+                return False
+            cells.add((room, slot))
+            for n in self.instance.index.neighbours_of(e).tolist():
+                other = changes[n][1] if n in changes else int(self.exam_slot[n])
+                if other >= 0 and abs(other - slot) <= 1:
+                    return False
+        for i in {i for _, _, invigilators in changes.values() for i in invigilators}:
+            slots = sorted([int(self.exam_slot[e]) for e in self.duties[i] if e not in changes] + [slot for _, slot, invigilators in changes.values() if i in invigilators])
+            if len(slots) > pool.max_exams_of(i) or any(b - a <= 1 for a, b in zip(slots, slots[1:])) or not all(pool.available(i, slot) for slot in slots):
+                return False
+        return True
+
+    def apply(self, changes):
+        for e in changes:
+            self._remove(e)
+        for e, (room, slot, invigilators) in changes.items():
+            self.exam_room[e], self.exam_slot[e], self.exam_invigilators[e] = room, slot, list(invigilators)
+            self._place(e)
+
+    def to_result(self, changes=None):
+        """The SAT ScheduleResult of the complete schedule with changes applied, leaving the schedule as it is."""
+        result = ScheduleResult(self.instance, "sat", {})
+        result.exam_room = self.exam_room.copy()
+        result.exam_slot = self.exam_slot.copy()
+        result.exam_invigilators = [list(invigilators) for invigilators in self.exam_invigilators]
+        result.number_of_invigilators = self.instance.invigilators.size
+        for e, (room, slot, invigilators) in (changes or {}).items():
+            result.exam_room[e], result.exam_slot[e], result.exam_invigilators[e] = room, slot, list(invigilators)
+        return result
+
+def _sample(exams, size, rng):
+    return exams if len(exams) <= size else rng.choice(exams, size, replace=False)
+
+def _slot_window(instance, schedule, size, rng, exam):
+    width = min(3, instance.number_of_slots)
+    start = rng.integers(instance.number_of_slots - width + 1)
+    return _sample(np.flatnonzero((schedule.exam_slot >= start) & (schedule.exam_slot < start + width)), size, rng)
+
+def _room(instance, schedule, size, rng, exam):
+    rooms = rng.choice(instance.number_of_rooms, min(2, instance.number_of_rooms), replace=False)
+    return _sample(np.flatnonzero(np.isin(schedule.exam_room, rooms) & (schedule.exam_slot >= 0)), size, rng)
+
+def _conflict_cluster(instance, schedule, size, rng, exam):
+    start = int(rng.integers(instance.number_of_exams)) if exam is None else exam
+    cluster, seen = [start], {start}
+    for e in cluster:
+        if len(cluster) >= size:
+            break
+        neighbours = instance.index.neighbours_of(e).tolist()
+        rng.shuffle(neighbours)
+        for n in neighbours:
+            if n not in seen:
+                seen.add(n)
+                cluster.append(n)
+    return np.array(cluster[:size], dtype=np.int64)
+
+# name -> function(instance, schedule, size, rng, exam) returning the exams to free; exam is
+# the unplaced exam a repair neighbourhood is built around, or None
+NEIGHBOURHOODS = {
+    "slot-window": _slot_window,
+    "room": _room,
+    "conflict-cluster": _conflict_cluster,
+}
+
+# State of an LNS worker process: (instance, weights, sorted conflict pair codes, their shared students)
+_worker_state = None
+
+def _init_worker(instance, weights):
+    global _worker_state
+    pairs = np.array(instance.index.conflict_pairs, dtype=np.int64).reshape(-1, 2)
+    # conflict_pairs are (lower, higher) exam pairs in ascending order of this code
+    codes = pairs[:, 0] * instance.number_of_exams + pairs[:, 1]
+    _worker_state = (instance, weights, codes, instance.index.conflict_weights)
+
+def _solve_neighbourhood(task):
+    """
+    Re-solves the freed exams of one neighbourhood against the rest of the schedule; returns
+    their changes (exam -> (room, slot, invigilators)), or None when CP-SAT found none in time.
+    Repair neighbourhoods only need a feasible placement; the others minimize the objectives.
+    """
+    from ortools.sat.python import cp_model
+
+    freed, exam_room, exam_slot, exam_invigilators, repair, budget, seed = task
+    instance, weights, codes, shared = _worker_state
+    slots = instance.number_of_slots
+    pool = instance.invigilators
+    capacities = np.asarray(instance.room_capacities, dtype=np.int64)
+    is_freed = np.zeros(instance.number_of_exams, dtype=bool)
+    is_freed[freed] = True
+    fixed = (exam_slot >= 0) & ~is_freed
+
+    # What the fixed exams leave free: cells, and each invigilator's duties and the slots next to them
+    occupied = np.zeros((instance.number_of_rooms, slots), dtype=bool)
+    occupied[exam_room[fixed], exam_slot[fixed]] = True
+    load = np.zeros(pool.size, dtype=np.int64)
+    duty_near = np.zeros((pool.size, slots + 2), dtype=bool)  # Padded by one slot on either side
+    for e in np.flatnonzero(fixed).tolist():
+        for i in exam_invigilators[e]:
+            load[i] += 1
+            duty_near[i, exam_slot[e]:exam_slot[e] + 3] = True
+
+    model = cp_model.CpModel()
+    exam_time, room_of, cells = {}, {}, []
+
+    # Constraint 1-3: a free cell of a fitting room, in a slot the fixed conflicting exams leave
+    for e in freed:
+        neighbours = instance.index.neighbours_of(e)
+        blocked = np.zeros(slots + 2, dtype=bool)
+        blocked[(exam_slot[neighbours[fixed[neighbours]]][:, None] + np.arange(3)).ravel()] = True
+        rooms = np.flatnonzero(capacities >= instance.student_exam_capacity[e])
+        room_index, slot_index = np.nonzero(~occupied[rooms] & ~blocked[1:-1])
+        if not len(room_index):
+            return None
+        cell = model.NewIntVarFromDomain(cp_model.Domain.FromValues((rooms[room_index] * slots + slot_index).tolist()), f'exam_cell_{e}')
+        exam_time[e] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(np.unique(slot_index).tolist()), f'exam_time_{e}')
+        room_of[e] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(np.unique(rooms[room_index]).tolist()), f'exam_room_{e}')
+        model.Add(cell == room_of[e] * slots + exam_time[e])
+        cells.append(cell)
+    model.AddAllDifferent(cells)
+
+    # Constraint 4 between freed exams
+    gap = cp_model.Domain.FromIntervals([[-slots, -2], [2, slots]])
+    for e in freed:
+        for n in instance.index.neighbours_of(e)[is_freed[instance.index.neighbours_of(e)]].tolist():
+            if n > e:
+                if gap.is_empty():
+                    return None
+                diff = model.NewIntVarFromDomain(gap, f'diff_{e}_{n}')
+                model.Add(diff == exam_time[e] - exam_time[n])
+
+    # Constraint 5-8: a freed exam's own invigilators and a few of the least loaded others may cover it
+    needed = [invigilators_needed(instance.student_exam_capacity[e]) for e in freed]
+    limits = np.array([pool.max_exams_of(i) for i in range(pool.size)], dtype=np.int64)
+    own = {i for e in freed for i in exam_invigilators[e]}
+    eligible = np.flatnonzero(load < limits)
+    spare = [i for i in eligible[np.argsort(load[eligible], kind="stable")].tolist() if i not in own][:SPARE_INVIGILATORS]
+    assigned = {i: {} for i in sorted(own | set(spare))}
+    for e in freed:
+        for i in set(exam_invigilators[e]) | set(spare):
+            assigned[i][e] = model.NewBoolVar(f'invigilator_{i}_exam_{e}')
+    for i, covers in assigned.items():
+        free = ~duty_near[i, 1:-1]
+        free[[t for t in pool.unavailable_slots(i) if t < slots]] = False
+        allowed = cp_model.Domain.FromValues(np.flatnonzero(free).tolist())
+        for e, cover in covers.items():
+            if allowed.is_empty():
+                model.Add(cover == 0)
+            elif not free.all():
+                model.AddLinearExpressionInDomain(exam_time[e], allowed).OnlyEnforceIf(cover)
+        model.Add(sum(covers.values()) <= int(limits[i] - load[i]))
+        model.AddNoOverlap([model.NewOptionalFixedSizeIntervalVar(exam_time[e], 2, cover, f'duty_{i}_{e}') for e, cover in covers.items()])
+    for e, count in zip(freed, needed):
+        model.Add(sum(covers[e] for covers in assigned.values() if e in covers) == count)
+
+    # The current placement of the freed exams as the starting point
+    for e in freed:
+        if exam_slot[e] >= 0:
+            model.AddHint(room_of[e], int(exam_room[e]))
+            model.AddHint(exam_time[e], int(exam_slot[e]))
+            for i, covers in assigned.items():
+                if e in covers:
+                    model.AddHint(covers[e], i in exam_invigilators[e])
+
+    if not repair:
+        # The objectives of optimize.py, as far as the freed exams change them; the spread
+        # against fixed neighbours only depends on a freed exam's slot, so it is a table
+        slack, spread = [], []
+        for e in freed:
+            slack.append(model.NewIntVar(0, int(capacities.max()), f'room_slack_{e}'))
+            model.AddElement(room_of[e], (capacities - instance.student_exam_capacity[e]).clip(0).tolist(), slack[-1])
+            neighbours = instance.index.neighbours_of(e)
+            weight = shared[np.searchsorted(codes, np.minimum(neighbours, e) * instance.number_of_exams + np.maximum(neighbours, e))]
+            near = fixed[neighbours]
+            distance = np.abs(np.arange(slots)[:, None] - exam_slot[neighbours[near]][None, :])
+            table = (weight[near] * np.maximum(SPREAD_WINDOW - distance, 0)).sum(axis=1)
+            if table.any():
+                spread.append(model.NewIntVar(0, int(table.max()), f'spread_{e}'))
+                model.AddElement(exam_time[e], table.tolist(), spread[-1])
+            for n, students in zip(neighbours[is_freed[neighbours]].tolist(), weight[is_freed[neighbours]].tolist()):
+                if n < e:
+                    continue
+                distance = model.NewIntVar(0, slots, f'distance_{e}_{n}')
+                model.AddAbsEquality(distance, exam_time[e] - exam_time[n])
+                shortfall = model.NewIntVar(0, SPREAD_WINDOW, f'shortfall_{e}_{n}')
+                model.Add(shortfall >= SPREAD_WINDOW - distance)
+                spread.append(students * shortfall)
+        busiest = model.NewIntVar(int(load.max(initial=0)), int(limits.max(initial=0)), 'invigilator_load')
+        for i, covers in assigned.items():
+            model.Add(busiest >= int(load[i]) + sum(covers.values()))
+        terms = {"room_slack": sum(slack), "spread": sum(spread), "invigilator_load": busiest}
+        model.Minimize(sum(weights[name] * terms[name] for name in OBJECTIVE_WEIGHTS))
+
+    solver = cp_model.CpSolver()
+    for name, value in budget.cp_sat_parameters({"num_search_workers": 1, "random_seed": seed}).items():
+        setattr(solver.parameters, name, value)
+    if solver.Solve(model) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return {
+        e: (solver.Value(room_of[e]), solver.Value(exam_time[e]), [i for i, covers in assigned.items() if e in covers and solver.Value(covers[e])])
+        for e in freed
+    }
+
+def lns(instance, weights=None, time_limit=None, workers=None, neighbourhood_size=NEIGHBOURHOOD_SIZE, initial=None, on_solution=None, seed=0, patience=PATIENCE, budget=None):
+    """
+    Improves a schedule by large-neighbourhood search (see the module docstring) for at most
+    time_limit seconds, calling on_solution with each improving ScheduleResult, and returns
+    the best one. initial, a SAT ScheduleResult, replaces the heuristic's starting schedule.
+    budget (see budget.py) is used instead of time_limit when given; its memory ceiling
+    applies to each neighbourhood's CP-SAT model. seed makes the neighbourhoods repeatable.
+    """
+    weights = {**OBJECTIVE_WEIGHTS, **(weights or {})}
+    unknown = set(weights) - set(OBJECTIVE_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown objective {', '.join(sorted(unknown))}; expected one of {', '.join(OBJECTIVE_WEIGHTS)}")
+    budget = start_budget(budget or Budget(time_limit=time_limit))
+
+    start_presolve = timer()
+    reason = infeasibility_reason(instance, fitting_rooms(instance))
+    start_heuristic = timer()
+    if reason is not None:
+        result = ScheduleResult(instance, "unsat", {"presolve": (start_heuristic - start_presolve) * 1000})
+        result.reason = reason
+        return result
+    start = initial if initial is not None and initial.satisfied else construct(instance)
+    schedule = _Schedule(instance, start.exam_room, start.exam_slot, start.exam_invigilators)
+    start_search = timer()
+
+    statistics = {"neighbourhoods": 0, "repairs": 0, "improvements": 0, "rejected": 0}
+    best = None
+
+    def improved(result):
+        nonlocal best
+        if result.objective is None:
+            result.objective = objective_values(instance, result, weights)
+        result.timings = {"check": (timer() - start_search) * 1000}
+        best = result
+        if on_solution is not None:
+            on_solution(result)
+
+    if not len(schedule.unplaced()):
+        improved(schedule.to_result())
+
+    rng = np.random.default_rng(seed)
+    kinds = list(NEIGHBOURHOODS)
+
+    def next_task():
+        unplaced = schedule.unplaced()
+        exam = int(rng.choice(unplaced)) if len(unplaced) else None
+        freed = NEIGHBOURHOODS[kinds[rng.integers(len(kinds))]](instance, schedule, neighbourhood_size - (exam is not None), rng, exam)
+        if exam is not None and exam not in freed:
+            freed = np.append(freed, exam)
+        remaining = budget.remaining()
+        limit = NEIGHBOURHOOD_TIME_LIMIT if remaining is None else min(NEIGHBOURHOOD_TIME_LIMIT, remaining)
+        statistics["neighbourhoods"] += 1
+        return (freed.tolist(), schedule.exam_room.copy(), schedule.exam_slot.copy(), list(schedule.exam_invigilators), exam is not None, Budget(limit, memory_mb=budget.memory_mb), int(rng.integers(2**31)))
+
+    def progress(changes):
+        """Applies changes that fit and, for a complete schedule, improve it; True if they did."""
+        if changes is None or not schedule.fits(changes):
+            statistics["rejected"] += changes is not None
+            return False
+        if len(schedule.unplaced()):
+            before = len(schedule.unplaced())
+            schedule.apply(changes)
+            statistics["repairs"] += 1
+            if not len(schedule.unplaced()):
+                improved(schedule.to_result())
+            return len(schedule.unplaced()) < before
+        candidate = schedule.to_result(changes)
+        candidate.objective = objective_values(instance, candidate, weights)
+        if candidate.objective["total"] >= best.objective["total"]:
+            return False
+        schedule.apply(changes)
+        statistics["improvements"] += 1
+        improved(candidate)
+        return True
+
+    workers = workers or os.cpu_count() or 1
+    # Daemonic processes (the CLI and service workers) cannot start a pool of their own
+    parallel = workers > 1 and not multiprocessing.current_process().daemon
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(instance, weights)) if parallel else None
+    if pool is None:
+        _init_worker(instance, weights)
+    answers = queue.Queue()
+    in_flight = 0
+    stalled = 0
+    try:
+        while not budget.expired() and stalled < patience:
+            if pool is None:
+                changes = _solve_neighbourhood(next_task())
+            else:
+                while in_flight < workers:
+                    pool.apply_async(_solve_neighbourhood, (next_task(),), callback=answers.put, error_callback=answers.put)
+                    in_flight += 1
+                try:
+                    changes = answers.get(timeout=budget.remaining())
+                except queue.Empty:
+                    break
+                in_flight -= 1
+                if isinstance(changes, Exception):
+                    raise changes
+            stalled = 0 if progress(changes) else stalled + 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    end_search = timer()
+
+    result = best
+    if result is None:
+        unplaced = schedule.unplaced().tolist()
+        result = ScheduleResult(instance, "timeout" if budget.expired() else "unknown", {})
+        result.reason = f"{len(unplaced)} exams are still unplaced: {', '.join(map(str, unplaced[:10]))}{', ...' if len(unplaced) > 10 else ''}"
+    result.statistics = statistics
+    result.timings = {
+        "presolve": (start_heuristic - start_presolve) * 1000,
+        "heuristic": (start_search - start_heuristic) * 1000,
+        "check": (end_search - start_search) * 1000,
+    }
+    return result
@@ -1,283 +1,89 @@
-import threading
+import multiprocessing
+import os
+import queue
 import tkinter as tk
-from tkinter import filedialog, scrolledtext, messagebox
-import re
-from z3 import *
+from functools import partial
+from tkinter import filedialog, scrolledtext, messagebox, ttk
+from batch_worker import init_batch_worker, solve_file
+from budget import Budget
+from cache import default_cache
+from instance import Instance, instance_files
+from instrumentation import PROFILERS, phase
+from results import STATUS_LABELS, ScheduleResult, render_core, render_details, render_exam_table, render_invigilator_timetable, render_student_timetables, render_warning, write_text_report
 from pathlib import Path
-from timeit import default_timer as timer
-
-class Instance:
-    def __init__(self):
-        self.number_of_students = 0
-        self.number_of_exams = 0
-        self.number_of_slots = 0
-        self.number_of_rooms = 0
-        self.room_capacities = []
-        self.exams_to_students = []
-        self.student_exam_capacity = []
-
-# read file function 
-def read_file(filename):
-    instance = Instance()
-    with open(filename) as f:
-        def read_attribute(name):
-            line = f.readline()
-            match = re.match(f'{name}:\\s*(\\d+)$', line)
-            if match:
-                return int(match.group(1))
-            else:
-                raise ValueError(f"Could not parse line {line}; expected the {name} attribute")
-
-        instance.number_of_students = read_attribute("Number of students")
-        instance.number_of_exams = read_attribute("Number of exams")
-        instance.number_of_slots = read_attribute("Number of slots")
-        instance.number_of_rooms = read_attribute("Number of rooms")
 
-        for r in range(instance.number_of_rooms):
-            instance.room_capacities.append(read_attribute(f"Room {r} capacity"))
+class BatchRun:
+    """
+    Solves instance files in a pool of worker processes, one file per task.
 
+    Results are collected on a queue so the Tk main thread can drain them with poll()
+    from root.after; cancel() terminates any worker that is still solving. Every file is
+    solved under its own copy of budget (see budget.py); with diagnose, UNSAT results carry
+    an unsat core (see diagnose.py).
+    """
+    def __init__(self, files, encoding="ground", workers=None, cache=None, profile=None, budget=None, diagnose=False):
+        self.files = [str(file) for file in files]
+        self.pending = set(self.files)
+        workers = workers or min(len(self.files), os.cpu_count() or 1)
+
+        # Spawned workers do not inherit the parent's Tk state; they import batch_worker.py only
+        context = multiprocessing.get_context("spawn")
+        self.events = context.Queue()
+        self.results = queue.Queue()
+        self.pool = context.Pool(workers, initializer=init_batch_worker, initargs=(self.events,))
+        for file in self.files:
+            self.pool.apply_async(
+                solve_file, (file, encoding, cache, profile, budget, diagnose),
+                callback=self.results.put,
+                error_callback=partial(self._failed, file),
+            )
+        self.pool.close()
+
+    def _failed(self, file, error):
+        self.results.put((file, False, f"Error processing {file}: {error}"))
+
+    def poll(self):
+        """
+        Returns the ("started", file), ("progress", file, result), ("memout", file, message)
+        and ("done", file, ok, results) events received so far; a file ends with either of
+        the last two.
+        """
+        events = []
         while True:
-            line = f.readline()
-            if line == "":
+            try:
+                event = self.events.get_nowait()
+            except (queue.Empty, OSError, ValueError):
                 break
-            match = re.match('^\\s*(\\d+)\\s+(\\d+)\\s*$', line)
-            if match:
-                instance.exams_to_students.append((int(match.group(1)), int(match.group(2))))
-            else:
-                raise ValueError(f'Failed to parse this line: {line}')
-
-        instance.student_exam_capacity = [0] * instance.number_of_exams
-        for exam, student in instance.exams_to_students:
-            instance.student_exam_capacity[exam] += 1
-
-    return instance
-
-def solve(instance):
-    start_solve = timer()  # Timer for solving the instance
-
-    s = Solver()
-
-    # Variable Declarations
-    exam = Int('exam')
-    room = Int('room')
-    timeslot = Int('timeslot')
-    next_exam = Int('next_exam')
-    next_timeslot = Int('next_timeslot')
-    student = Int('student')
-
-    # Range Functions for Constraints
-    Student_Range = Function('Student_Range', IntSort(), BoolSort())
-    Exam_Range = Function('Exam_Range', IntSort(), BoolSort())
-    Room_Range = Function('Room_Range', IntSort(), BoolSort())
-    TimeSlot_Range = Function('TimeSlot_Range', IntSort(), BoolSort())
-    RoomCapacity = Function('RoomCapacity', IntSort(), IntSort())
-    StudentCount = Function('StudentCount', IntSort(), IntSort())
-    next_room = Int('next_room')
-
-    # Matrix to track which invigilators are assigned to each exam and timeslot
-    InvigilatorAssigned = [[[Bool(f"invig_{i}_exam_{e}_slot_{t}") for t in range(instance.number_of_slots)] for e in range(instance.number_of_exams)] for i in range(10)]
-
-    # Range Constraints
-    s.add(ForAll([student], Student_Range(student) == And(student >= 0, student < instance.number_of_students)))
-    s.add(ForAll([exam], Exam_Range(exam) == And(exam >= 0, exam < instance.number_of_exams)))
-    s.add(ForAll([timeslot], TimeSlot_Range(timeslot) == And(timeslot >= 0, timeslot < instance.number_of_slots)))
-    s.add(ForAll([room], Room_Range(room) == And(room >= 0, room < instance.number_of_rooms)))
-
-    # Functions for Exam Room, Time, and Students
-    ExamRoom = Function('ExamRoom', IntSort(), IntSort())      # Maps each exam to a room
-    ExamTime = Function('ExamTime', IntSort(), IntSort())      # Maps each exam to a timeslot
-    ExamStudent = Function('ExamStudent', IntSort(), IntSort(), BoolSort())  # Indicates if a student is taking an exam
-
-    # Add Students Taking Exams based on Input Data
-    for exam_id, student_id in instance.exams_to_students:
-        s.add(ExamStudent(exam_id, student_id))
-
-    # Constraint 1 and 2: Room and Time Assignments for Exams
-    s.add(
-        ForAll(
-            [exam],
-            Implies(
-                Exam_Range(exam),
-                Exists(
-                    [room, timeslot],
-                    And(
-                        Room_Range(room),
-                        TimeSlot_Range(timeslot),
-                        ExamTime(exam) == timeslot,
-                        ExamRoom(exam) == room,
-                        ForAll(
-                            [next_exam],
-                            Implies(
-                                Exam_Range(next_exam),
-                                Implies(
-                                    And(
-                                        ExamRoom(next_exam) == room,
-                                        ExamTime(next_exam) == timeslot
-                                    ),
-                                    exam == next_exam
-                                )
-                            )
-                        )
-                    )
-                )
-            )
-        )
-    )
-
-    # Constraint 3: Room Capacity
-    for ex in range(instance.number_of_exams):
-        for rm in range(instance.number_of_rooms):
-            s.add(Implies(ExamRoom(ex) == rm, instance.student_exam_capacity[ex] <= instance.room_capacities[rm]))
-
-    # Constraint 4: Non-overlapping Exams for Students
-    s.add(
-        ForAll([student, exam, next_exam, timeslot, next_timeslot],
-               Implies(
-                   And(
-                       Student_Range(student),
-                       Exam_Range(exam),
-                       Exam_Range(next_exam),
-                       TimeSlot_Range(timeslot),
-                       TimeSlot_Range(next_timeslot),
-                       exam != next_exam
-                   ),
-                   Implies(
-                       And(
-                           ExamTime(exam) == timeslot,
-                           ExamTime(next_exam) == next_timeslot,
-                           ExamStudent(exam, student),
-                           ExamStudent(next_exam, student)
-                       ),
-                       And(timeslot + 1 != next_timeslot, timeslot - 1 != next_timeslot, timeslot != next_timeslot)  # Ensure no adjacent time slots for same student
-                   )
-               )
-        )
-    )
-
-    # Constraint 5: Assign invigilators based on number of students and ensure no invigilator is invigilating for two consecutive time slots
-    for e in range(instance.number_of_exams):
-        students = instance.student_exam_capacity[e]
-        invigilators_needed = If(students <= 10, 1, If(students <= 20, 2, 3))
-        for t in range(instance.number_of_slots):
-            s.add(Sum([InvigilatorAssigned[i][e][t] for i in range(10)]) == If(ExamTime(e) == t, invigilators_needed, 0))
-
-    # Constraint 6:Total invigilators per time slot must not exceed 10
-    for t in range(instance.number_of_slots):
-        s.add(Sum([InvigilatorAssigned[i][e][t] for i in range(10) for e in range(instance.number_of_exams)]) <= 10)
-
-    # Constraint 7: Each invigilator can only invigilate at most 2 exams
-    for i in range(10):  # Loop over all invigilators
-        s.add(Sum([If(Or([InvigilatorAssigned[i][e][t] for t in range(instance.number_of_slots)]), 1, 0) for e in range(instance.number_of_exams)]) <= 2)
-
-    # Constraint 8: No invigilator can invigilate in consecutive time slots
-    for i in range(10):
-        for t1 in range(instance.number_of_slots - 1):
-            s.add(Sum([InvigilatorAssigned[i][e][t1] + InvigilatorAssigned[i][e][t1 + 1] for e in range(instance.number_of_exams)]) <= 1)
-
-    # Add mappings for room capacities and student counts using Z3 functions
-    for rm in range(instance.number_of_rooms):
-        s.add(RoomCapacity(rm) == instance.room_capacities[rm])
-    for ex in range(instance.number_of_exams):
-        s.add(StudentCount(ex) == instance.student_exam_capacity[ex])
-
-    # Sort exams by the number of students in ascending order
-    sorted_exams = sorted(range(instance.number_of_exams), key=lambda ex: instance.student_exam_capacity[ex])
-
-    # Constraint 9: Optimal Room Allocation with Prioritization of Smallest Fit
-    for ex in sorted_exams:
-        s.add(
-            Exists([room],
-                And(
-                    Room_Range(room),
-                    ExamRoom(ex) == room,
-                    RoomCapacity(room) >= StudentCount(ex),
-                    # Ensure that no smaller room can also fit the exam
-                    ForAll([next_room],
-                            Implies(
-                                And(
-                                    Room_Range(next_room),
-                                    next_room != room,
-                                    RoomCapacity(next_room) >= StudentCount(ex)
-                                ),
-                                RoomCapacity(room) <= RoomCapacity(next_room)
-                            )
-                    )
-                )
-            )
-        )
-
-    output = ""
-    if s.check() == sat:
-        students_with_many_exams = []
-        m = s.model()  # Only get the model when satisfiable
-        output += 'Satisfied\n'
-        output += "――――――――――――Exam Timetable――――――――――――--\n"
-        for ex in range(instance.number_of_exams):
-            room = m.eval(ExamRoom(ex))
-            slot = m.eval(ExamTime(ex))
-            students_count = instance.student_exam_capacity[ex]
-            invigilators = sum([1 for i in range(10) if any(is_true(m.eval(InvigilatorAssigned[i][ex][t])) for t in range(instance.number_of_slots))])
-            output += f"Exam: {ex} | Room: {room} | Slot: {slot} | Students: {students_count} | Invigilators: {invigilators}\n"
-        output += "――――――――――――――――――――――――----------------\n"
-        output += "Individual Timetables (Exam no, Slot, Room):\n"
-        for student_id in range(instance.number_of_students):
-            exams_for_student = [(exam, m.eval(ExamTime(exam)), m.eval(ExamRoom(exam))) for exam, stud in instance.exams_to_students if stud == student_id]
-            if exams_for_student:
-                exams_formatted = " | ".join(f"({ex}, {slot}, {room})" for ex, slot, room in exams_for_student)
-                output += f"Student {student_id}: {exams_formatted}\n"
-
-                # Track students with more than 3 exams
-                if len(exams_for_student) > 3:
-                     students_with_many_exams.append(student_id)
-                     
-            else:
-                output += f"Student {student_id}: Student is not scheduled for any exam, please check with the student office.\n"
-
-
-        if students_with_many_exams:
-                output += "\n――――――――――――Warning――――――――――――\n"
-                output += "Students with more than 3 exams: " + ", ".join(f"{id}" for id in students_with_many_exams) + ". " + "Please make sure they are not overwhelmed by the exams!" + "\n\n"
-
-        # Invigilator Timetable (Only list exams without detailed info)
-        output += "\nInvigilator Timetable:\n"
-        for i in range(10): 
-            assigned_exams = [e for e in range(instance.number_of_exams) if any(is_true(m.eval(InvigilatorAssigned[i][e][t])) for t in range(instance.number_of_slots))]
-            if assigned_exams:
-                output += f"Invigilator {i}: " + ", ".join(f"Exam {e}" for e in assigned_exams) + "\n"
-            else:
-                output += f"Invigilator {i}: No assigned exams.\n"
-    else:
-        output += 'Unsatisfied\n'
-        
-    end_solve = timer()  # Timer ends after solving the instance
-    output += f"Time taken to solve the instance: {((end_solve - start_solve) * 1000):.2f} ms\n"
-    return output
-
-class SolverThread(threading.Thread):
-    def __init__(self, files, callback):
-        super().__init__()
-        self.files = files
-        self.callback = callback
-
-    def run(self):
-        for file in self.files:
+            if event[0] == "memout":
+                self.pending.discard(event[1])
+            events.append(event)
+        while True:
             try:
-                instance = read_file(file)
-                results = solve(instance)
-                self.callback(f"Results for {file}:\n{results}\n")
-            except Exception as e:
-                self.callback(f"Error processing {file}: {str(e)}\n")
-
-def run_solver(files, callback):
-    thread = SolverThread(files, callback)
-    thread.start()
+                file, ok, results = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(file)
+            events.append(("done", file, ok, results))
+        return events
+
+    @property
+    def finished(self):
+        return not self.pending
+
+    def cancel(self):
+        """Terminates the workers; returns the files that never finished."""
+        self.pool.terminate()
+        self.events.close()
+        cancelled = [file for file in self.files if file in self.pending]
+        self.pending.clear()
+        return cancelled
 
 #function to generate txt files
-def generate_txt(output):
+def generate_txt(reports):
     """
     Save the combined output for all instances into a .txt file.
     """
-    if not output.strip():  # Check if output is empty
+    if not reports:  # Check if output is empty
         messagebox.showwarning("Warning", "No data to save!")
         return
 
@@ -291,9 +97,8 @@ def generate_txt(output):
         return
 
     try:
-        # Write the combined output text to the specified file
-        with open(file_path, 'w', encoding='utf-8') as txt_file:
-            txt_file.write(output)
+        # Render every (file, result) pair into the specified file
+        write_text_report(file_path, reports)
 
         # Display success message
         messagebox.showinfo("Success", "TXT file generated successfully!")
@@ -302,6 +107,9 @@ def generate_txt(output):
         messagebox.showerror("Error", f"Failed to generate TXT file: {str(e)}")
 
     
+# (file, result or error text) pairs of the last batch, saved by the "Generate TXT" button
+current_reports = []
+
 def clear_text(result_text_widget):
     """Clears the displayed text in the result_text widget."""
     result_text_widget.config(state='normal')
@@ -339,7 +147,7 @@ def create_gui():
     canvas.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    def add_output_section(filename, sat_status, time_taken, exam_output=None, student_output=None, invigilator_output=None, warning_output=None):
+    def add_output_section(filename, sat_status, time_taken, exam_output=None, student_output=None, invigilator_output=None, warning_output=None, core_output=None, details_output=None):
         # Section Frame
         section_frame = tk.Frame(scrollable_frame, pady=10, padx=10, relief=tk.RIDGE, bd=2)
         section_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -372,28 +180,20 @@ def create_gui():
                 exam_text.pack(fill=tk.BOTH, expand=True)
 
             # Student Timetable Section
-            if student_output:  # Ensure exam details are excluded from this section
+            if student_output:
                 student_frame = tk.LabelFrame(timetable_frame, text="Student Timetable (Exam, Slot, Room)", font=("Arial", 12, "bold"))
                 student_frame.grid(row=0, column=1, padx=5, pady=5, sticky="nsew")
                 student_text = scrolledtext.ScrolledText(student_frame, height=10, wrap=tk.WORD, state='normal', font=("Courier", 10))
-                # Filter out any lines that include "Exam:" (exam timetable details)
-                filtered_student_output = "\n".join(
-                    line for line in student_output.splitlines() if not line.startswith("Exam:")
-                )
-                student_text.insert(tk.END, filtered_student_output or "No data available")
+                student_text.insert(tk.END, student_output)
                 student_text.config(state='disabled')
                 student_text.pack(fill=tk.BOTH, expand=True)
 
             # Invigilator Timetable Section
-            if invigilator_output:  # Ensure exam details are excluded from this section
+            if invigilator_output:
                 invigilator_frame = tk.LabelFrame(timetable_frame, text="Invigilator Timetable", font=("Arial", 12, "bold"))
                 invigilator_frame.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
                 invigilator_text = scrolledtext.ScrolledText(invigilator_frame, height=10, wrap=tk.WORD, state='normal', font=("Courier", 10))
-                # Filter out any lines that include "Exam:" (exam timetable details)
-                filtered_invigilator_output = "\n".join(
-                    line for line in invigilator_output.splitlines() if not line.startswith("Exam:")
-                )
-                invigilator_text.insert(tk.END, filtered_invigilator_output or "No data available")
+                invigilator_text.insert(tk.END, invigilator_output)
                 invigilator_text.config(state='disabled')
                 invigilator_text.pack(fill=tk.BOTH, expand=True)
 
@@ -401,46 +201,174 @@ def create_gui():
             timetable_frame.grid_columnconfigure(0, weight=1)
             timetable_frame.grid_columnconfigure(1, weight=1)
 
-
-    # Function to handle results and add them to the GUI
-    def handle_results(filename, results):
-        # Parse the output into its components (SAT/UNSAT status, time, and timetables)
-        sat_status = "SAT" if "Satisfied" in results else "UNSAT"
-        time_taken_match = re.search(r"Time taken to solve the instance: (\d+\.\d+) ms", results) 
-        time_taken = f"{float(time_taken_match.group(1)):.2f} ms" if time_taken_match else "N/A"
-
-        # Only parse timetables if SAT
-        exam_output = "\n".join(line for line in results.splitlines() if "Exam:" in line) if sat_status == "SAT" else None
-        invigilator_output = "\n".join(line for line in results.splitlines() if "Invigilator" in line) if sat_status == "SAT" else None
-        # Extract the student timetable while excluding warning lines
-        student_output = "\n".join(
-            line for line in results.splitlines() 
-            if "Student" in line and not line.startswith("Students with more than")
-        ) if sat_status == "SAT" else None
-
-        # Extract warning messages separately
-        warning_output = next(
-            (line for line in results.splitlines() if "Students with more than" in line), 
-            None
+        # Conflicts Section: the unsat core of an UNSAT instance
+        if core_output:
+            core_frame = tk.LabelFrame(section_frame, text="Conflicting Constraints", font=("Arial", 12, "bold"))
+            core_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            core_text = scrolledtext.ScrolledText(core_frame, height=8, wrap=tk.WORD, state='normal', font=("Courier", 10))
+            core_text.insert(tk.END, core_output)
+            core_text.config(state='disabled')
+            core_text.pack(fill=tk.BOTH, expand=True)
+
+        # Details Section: phase timings, solver statistics and profile report
+        if details_output:
+            details_frame = tk.LabelFrame(section_frame, text="Details", font=("Arial", 12, "bold"))
+            details_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            details_text = scrolledtext.ScrolledText(details_frame, height=8, wrap=tk.NONE, state='normal', font=("Courier", 10))
+            details_text.insert(tk.END, details_output)
+            details_text.config(state='disabled')
+            details_text.pack(fill=tk.BOTH, expand=True)
+
+
+    # Function to render a result (or an error message) into a GUI section
+    def handle_results(filename, result):
+        if not isinstance(result, ScheduleResult):
+            add_output_section(filename, "ERROR", "N/A", warning_output=result)
+            return
+
+        time_taken = f"{result.total_time_ms:.2f} ms"
+        if not result.satisfied:
+            add_output_section(filename, result.status.upper(), time_taken, warning_output=result.reason, core_output="\n".join(render_core(result)), details_output="\n".join(render_details(result)))
+            return
+
+        with phase(result.timings, "render"):
+            exam_output = "\n".join(render_exam_table(result))
+            student_output = "\n".join(render_student_timetables(result))
+            invigilator_output = "\n".join(["Invigilator Timetable:"] + render_invigilator_timetable(result))
+            warning_output = render_warning(result)
+        add_output_section(
+            filename,
+            "SAT",
+            time_taken,
+            exam_output=exam_output,
+            student_output=student_output,
+            invigilator_output=invigilator_output,
+            warning_output=warning_output,
+            details_output="\n".join(render_details(result)),
         )
 
-
-        # Add output to the GUI
-        add_output_section(filename, sat_status, time_taken, exam_output, student_output, invigilator_output, warning_output)
-
-    def run_solver_instance(files):
-        global current_output  # Store the combined output for all instances
-        current_output = ""  # Reset current_output before solving all instances
-
+    # Batch Progress Section: overall progress bar and one status row per file
+    progress_frame = tk.Frame(header_frame)
+    progress_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
+    progress_label = tk.Label(progress_frame, text="Idle", font=("Arial", 12))
+    progress_label.pack(anchor="w")
+    progress_bar = ttk.Progressbar(progress_frame, mode="determinate")
+    progress_bar.pack(fill=tk.X)
+    file_status_list = tk.Listbox(progress_frame, height=5, font=("Courier", 10))
+    file_status_list.pack(fill=tk.X, pady=(5, 0))
+
+    batch = {"run": None, "rows": {}, "best": {}}
+
+    def set_file_status(file, status):
+        row = batch["rows"][file]
+        file_status_list.delete(row)
+        file_status_list.insert(row, f"{Path(file).name}: {status}")
+
+    def set_running(running):
+        for button in (run_all_button, open_file_button, cache_check, explain_check, optimize_check, time_limit_box):
+            button.config(state="disabled" if running else "normal")
+        profile_menu.config(state="disabled" if running else "readonly")
+        cancel_button.config(state="normal" if running else "disabled")
+
+    def show_batch_events(run):
+        for event in run.poll():
+            if event[0] == "started":
+                set_file_status(event[1], "solving...")
+                continue
+            if event[0] == "progress":
+                # Intermediate schedule from the optimizer; the search goes on
+                _, file, best = event
+                batch["best"][file] = best
+                set_file_status(file, f"best objective {best.objective['total']} after {best.timings['check'] / 1000:.1f} s, optimizing...")
+                continue
+            if event[0] == "memout":
+                # The worker exceeded the memory limit and exited; any best schedule is kept
+                _, file, message = event
+                best = batch["best"].pop(file, None)
+                current_reports.append((file, best or message))
+                set_file_status(file, "out of memory")
+                if best is None:
+                    add_output_section(file, "MEMOUT", "N/A", warning_output=message)
+                else:
+                    handle_results(file, best)
+                continue
+            _, file, ok, results = event
+            batch["best"].pop(file, None)
+            current_reports.append((file, results))  # Keep results for each instance
+            if not ok:
+                set_file_status(file, "error")
+            elif results.status in ("sat", "unsat"):
+                set_file_status(file, "cached" if results.cached else "done")
+            else:
+                set_file_status(file, STATUS_LABELS[results.status].lower())
+            handle_results(file, results)  # Display results in the GUI
+        # Set rather than stepped: a determinate bar wraps back to 0 when a step reaches its maximum
+        solved = len(run.files) - len(run.pending)
+        progress_bar["value"] = solved
+        progress_label.config(text=f"Solved {solved}/{len(run.files)} instances")
+
+    def poll_batch():
+        run = batch["run"]
+        if run is None:
+            return
+        show_batch_events(run)
+        if run.finished:
+            batch["run"] = None
+            set_running(False)
+        else:
+            root.after(100, poll_batch)
+
+    def run_solver_instance(files, encoding="ground"):
+        files = [str(file) for file in files if file]
+        if not files or batch["run"] is not None:
+            return
+        try:
+            seconds = time_limit.get()
+        except (tk.TclError, ValueError):
+            seconds = None
+        if seconds is None or seconds <= 0:
+            messagebox.showerror("Error", "The time limit must be a positive number of seconds.")
+            return
+        current_reports.clear()  # Reset the stored results before solving all instances
+
+        file_status_list.delete(0, tk.END)
+        batch["rows"] = {}
         for file in files:
-            try:
-                instance = read_file(file)
-                results = solve(instance)  # Get the output for the current instance
-                current_output += f"Results for {file}:\n{results}\n{'-' * 80}\n"  # Append results for each instance
-                handle_results(file, results)  # Display results in the GUI
-            except Exception as e:
-                current_output += f"Error processing {file}: {e}\n{'-' * 80}\n"
-                handle_results(file, f"Error processing {file}: {e}")
+            batch["rows"][file] = file_status_list.size()
+            file_status_list.insert(tk.END, f"{Path(file).name}: queued")
+        progress_bar.config(maximum=len(files), value=0)
+        progress_label.config(text=f"Solved 0/{len(files)} instances")
+
+        profile = profile_choice.get()
+        batch["best"] = {}
+        batch["run"] = BatchRun(
+            files, "optimize" if optimize_mode.get() else encoding,
+            cache=default_cache() if use_cache.get() else None,
+            profile=None if profile == "off" else profile,
+            budget=Budget(time_limit=seconds),
+            diagnose=explain_mode.get(),
+        )
+        set_running(True)
+        root.after(100, poll_batch)
+
+    def cancel_batch():
+        run = batch["run"]
+        if run is None:
+            return
+        batch["run"] = None
+        show_batch_events(run)  # Keep results that finished before the cancel
+        for file in run.cancel():
+            best = batch["best"].pop(file, None)
+            if best is None:
+                set_file_status(file, "cancelled")
+                continue
+            # Keep the best schedule the optimizer had found
+            current_reports.append((file, best))
+            set_file_status(file, f"cancelled, best objective {best.objective['total']}")
+            handle_results(file, best)
+        progress_label.config(text="Batch cancelled")
+        set_running(False)
 
     # Buttons Section
     button_frame = tk.Frame(root, pady=10)
@@ -462,7 +390,7 @@ def create_gui():
         font=("Arial", 14, "bold"),
         width=18,
         height=2,
-        command=lambda: run_solver_instance(list(Path("./test instances").glob("*.txt"))),
+        command=lambda: run_solver_instance(instance_files("./test instances")),
     )
     run_all_button.pack(side=tk.LEFT, padx=10)
 
@@ -492,14 +420,49 @@ def create_gui():
     font=("Arial", 14, "bold"),
     width=18,
     height=2,
-    command=lambda: generate_txt(current_output),  # Use the combined output
+    command=lambda: generate_txt(current_reports),  # Use the combined output
 )
     generate_txt_button.pack(side=tk.LEFT, padx=10)
 
+    cancel_button = tk.Button(
+        button_frame_top,
+        text="Cancel",
+        font=("Arial", 14, "bold"),
+        width=18,
+        height=2,
+        state="disabled",
+        command=cancel_batch,
+    )
+    cancel_button.pack(side=tk.LEFT, padx=10)
+
+    # Reuse results of identical instances solved before (see cache.py)
+    use_cache = tk.BooleanVar(value=True)
+    cache_check = tk.Checkbutton(button_frame_top, text="Use cache", font=("Arial", 12), variable=use_cache)
+    cache_check.pack(side=tk.LEFT, padx=10)
+
+    # Unsat cores for UNSAT instances presolve has no reason for (see diagnose.py); they can take a while
+    explain_mode = tk.BooleanVar(value=False)
+    explain_check = tk.Checkbutton(button_frame_top, text="Explain", font=("Arial", 12), variable=explain_mode)
+    explain_check.pack(side=tk.LEFT, padx=(0, 10))
+
+    # Optional per-run profiling, shown in each result's Details panel
+    tk.Label(button_frame_top, text="Profile:", font=("Arial", 12)).pack(side=tk.LEFT)
+    profile_choice = tk.StringVar(value="off")
+    profile_menu = ttk.Combobox(button_frame_top, textvariable=profile_choice, values=["off", *PROFILERS], state="readonly", width=12)
+    profile_menu.pack(side=tk.LEFT, padx=(0, 10))
+
+    # Optimization mode (see optimize.py): best schedules within the time limit, shown as they improve
+    optimize_mode = tk.BooleanVar(value=False)
+    optimize_check = tk.Checkbutton(button_frame_top, text="Optimize", font=("Arial", 12), variable=optimize_mode)
+    optimize_check.pack(side=tk.LEFT, padx=(10, 0))
+    # Per-instance time limit of every run; instances that reach it are reported as timed out
+    tk.Label(button_frame_top, text="Time limit (s):", font=("Arial", 12)).pack(side=tk.LEFT)
+    time_limit = tk.DoubleVar(value=30)
+    time_limit_box = tk.Spinbox(button_frame_top, from_=1, to=3600, increment=5, textvariable=time_limit, width=6)
+    time_limit_box.pack(side=tk.LEFT, padx=(0, 10))
+
     root.mainloop()
 
 
 if __name__ == "__main__":
     create_gui()
-
-
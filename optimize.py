@@ -0,0 +1,220 @@
+"""
+Optimization mode: exams may use any room that fits instead of only the smallest one
+(constraint 9 becomes soft) and a weighted sum of objectives is minimized:
+
+  room_slack        empty seats, summed over exams
+  spread            for exams that share students, how far they fall short of being
+                    SPREAD_WINDOW slots apart, times the number of students they share
+  invigilator_load  the most exams any one invigilator covers
+
+    result = optimize(read_file(path), time_limit=30, on_solution=show_progress)
+    result.objective  # {"room_slack": ..., "spread": ..., "invigilator_load": ..., "total": ...}
+
+The search is anytime: on_solution is called with every improving ScheduleResult while
+the search continues, and once time_limit seconds run out the best one found so far is
+returned with status "sat" (result.optimal tells whether it was proven optimal). Status
+"timeout" (or "memout") means the budget ran out before any schedule was found; time_limit
+is shorthand for budget=Budget(time_limit=...) (see budget.py). The schedule of the
+constructive heuristic (heuristic.py), when complete, is the first one reported and both
+backends start from it. Results are not cached, since they depend on the weights and the
+budget. Each backend's solver stack is imported by the function that runs it, so an
+optimization loads either Z3 or OR-Tools, not both (see backends.py).
+"""
+from timeit import default_timer as timer
+
+import numpy as np
+
+from budget import Budget, cp_sat_outcome, start_budget, z3_outcome
+from heuristic import construct
+from instrumentation import cp_sat_statistics, z3_statistics
+from presolve import fitting_rooms, infeasibility_reason
+from results import ScheduleResult
+
+# Default weight of each objective; weights are non-negative integers
+OBJECTIVE_WEIGHTS = {"room_slack": 1, "spread": 1, "invigilator_load": 1}
+
+# Exams sharing students are penalized for every slot they are closer than this
+SPREAD_WINDOW = 4
+
+def objective_values(instance, result, weights=None):
+    """The objective terms of a SAT result and their weighted total."""
+    weights = {**OBJECTIVE_WEIGHTS, **(weights or {})}
+    capacities = np.asarray(instance.room_capacities, dtype=np.int64)
+    pairs = np.array(instance.index.conflict_pairs, dtype=np.int64).reshape(-1, 2)
+    distance = np.abs(result.exam_slot[pairs[:, 0]].astype(np.int64) - result.exam_slot[pairs[:, 1]])
+    values = {
+        "room_slack": int((capacities[result.exam_room] - np.asarray(instance.student_exam_capacity, dtype=np.int64)).sum()),
+        "spread": int((instance.index.conflict_weights * np.maximum(SPREAD_WINDOW - distance, 0)).sum()),
+        "invigilator_load": max((len(exams) for exams in result.invigilator_exams()), default=0),
+    }
+    values["total"] = sum(weights[name] * values[name] for name in OBJECTIVE_WEIGHTS)
+    return values
+
+class _Progress:
+    """Keeps the best schedule found so far and reports each improvement to on_solution."""
+    def __init__(self, instance, weights, on_solution):
+        self.instance = instance
+        self.weights = weights
+        self.on_solution = on_solution
+        self.best = None
+        self.start = timer()
+
+    def found(self, result):
+        result.objective = objective_values(self.instance, result, self.weights)
+        result.timings = {"check": (timer() - self.start) * 1000}
+        if self.best is None or result.objective["total"] < self.best.objective["total"]:
+            self.best = result
+            if self.on_solution is not None:
+                self.on_solution(result)
+
+def _optimize_cp_sat(instance, weights, budget, progress, construction, parameters=None):
+    from ortools.sat.python import cp_model
+
+    from alternative_solution import add_hints, build_cp_model, extract_assignment as extract_cp_assignment
+
+    model, exam_room, exam_time, invigilator_assigned = build_cp_model(instance)
+    add_hints(model, exam_room, exam_time, invigilator_assigned, construction)
+
+    # Room slack: capacity of the chosen room minus the exam's students
+    slack = []
+    for e, room in enumerate(exam_room):
+        capacity = model.NewIntVar(0, max(instance.room_capacities, default=0), f'capacity_{e}')
+        model.AddElement(room, instance.room_capacities, capacity)
+        slack.append(capacity - instance.student_exam_capacity[e])
+
+    # Spread: shortfall below SPREAD_WINDOW slots, weighted by shared students
+    spread = []
+    for (e1, e2), shared in zip(instance.index.conflict_pairs, instance.index.conflict_weights.tolist()):
+        distance = model.NewIntVar(0, instance.number_of_slots, f'distance_{e1}_{e2}')
+        model.AddAbsEquality(distance, exam_time[e1] - exam_time[e2])
+        shortfall = model.NewIntVar(0, SPREAD_WINDOW, f'shortfall_{e1}_{e2}')
+        model.Add(shortfall >= SPREAD_WINDOW - distance)
+        spread.append(shared * shortfall)
+
+    # Invigilator load: the busiest invigilator's number of exams
+    load = model.NewIntVar(0, instance.number_of_exams, 'invigilator_load')
+    for row in invigilator_assigned:
+        model.Add(load >= sum(row))
+
+    terms = {"room_slack": sum(slack), "spread": sum(spread), "invigilator_load": load}
+    model.Minimize(sum(weights[name] * terms[name] for name in OBJECTIVE_WEIGHTS))
+
+    solver = cp_model.CpSolver()
+    parameters = budget.cp_sat_parameters(parameters)
+    for name, value in parameters.items():
+        setattr(solver.parameters, name, value)
+
+    class Callback(cp_model.CpSolverSolutionCallback):
+        def on_solution_callback(self):
+            progress.found(extract_cp_assignment(instance, self.Value, exam_room, exam_time, invigilator_assigned))
+
+    progress.start = timer()
+    status = solver.Solve(model, Callback())
+    outcome = ("unsat", None) if status == cp_model.INFEASIBLE else cp_sat_outcome(budget, parameters)
+    return outcome, status == cp_model.OPTIMAL, cp_sat_statistics(solver)
+
+def _optimize_z3(instance, weights, budget, progress, construction, parameters=None):
+    """
+    Linear search: each schedule found adds "objective < its value" to the same solver and
+    checks again, until UNSAT proves the last one optimal or the budget runs out.
+    """
+    import z3
+
+    from solver import build_ground_model, set_initial_values
+
+    s, exam_room, exam_time, InvigilatorAssigned = build_ground_model(instance, smallest_room=False)
+    set_initial_values(s, instance, exam_room, exam_time, InvigilatorAssigned, construction)
+
+    slack = [
+        z3.Sum([z3.If(exam_room[e] == rm, instance.room_capacities[rm], 0) for rm in domain]) - instance.student_exam_capacity[e]
+        for e, domain in enumerate(fitting_rooms(instance)) if domain
+    ]
+    spread = []
+    for (e1, e2), shared in zip(instance.index.conflict_pairs, instance.index.conflict_weights.tolist()):
+        distance = z3.If(exam_time[e1] >= exam_time[e2], exam_time[e1] - exam_time[e2], exam_time[e2] - exam_time[e1])
+        spread.append(shared * z3.If(distance < SPREAD_WINDOW, SPREAD_WINDOW - distance, 0))
+    load = z3.Int("invigilator_load")
+    for row in InvigilatorAssigned:
+        s.add(load >= z3.Sum([z3.If(cell, 1, 0) for cell in row]))
+
+    terms = {"room_slack": z3.Sum(slack) if slack else 0, "spread": z3.Sum(spread) if spread else 0, "invigilator_load": load}
+    objective = z3.Sum([weights[name] * terms[name] for name in OBJECTIVE_WEIGHTS])
+    z3.set_param("memory_max_size", budget.memory_mb or 0)
+
+    if progress.best is not None:
+        s.add(objective < progress.best.objective["total"])
+    progress.start = timer()
+    while True:
+        if budget.expired():
+            return z3_outcome(budget, "timeout"), False, z3_statistics(s)
+        # Each check gets what is left of the time limit
+        for name, value in budget.z3_params(parameters).items():
+            s.set(name, value)
+        status = s.check()
+        if status == z3.unknown:
+            return z3_outcome(budget, s.reason_unknown()), False, z3_statistics(s)
+        if status != z3.sat:
+            # UNSAT after a schedule was found means no better one exists
+            return ("unsat", None), True, z3_statistics(s)
+        result = _z3_result(instance, s.model(), exam_room, exam_time, InvigilatorAssigned)
+        progress.found(result)
+        s.add(objective < result.objective["total"])
+
+def _z3_result(instance, m, exam_room, exam_time, InvigilatorAssigned):
+    from solver import extract_assignment
+
+    result = ScheduleResult(instance, "sat", {})
+    result.exam_room, result.exam_slot, covers = extract_assignment(m, exam_room, exam_time, InvigilatorAssigned)
+    result.number_of_invigilators = len(InvigilatorAssigned)
+    result.exam_invigilators = [np.flatnonzero(column).tolist() for column in covers.T]
+    return result
+
+OPTIMIZERS = {
+    "cp-sat": _optimize_cp_sat,
+    "z3": _optimize_z3,
+}
+
+def optimize(instance, weights=None, time_limit=None, backend="cp-sat", on_solution=None, parameters=None, budget=None):
+    """
+    Minimizes the weighted objectives (OBJECTIVE_WEIGHTS, overridden by weights) with the
+    given backend ("cp-sat" or "z3") for at most time_limit seconds, calling on_solution
+    with each improving ScheduleResult. Returns the best result found; see the module
+    docstring for the statuses. parameters are passed on to the backend's solver. budget
+    (see budget.py) is used instead of time_limit when given.
+    """
+    if backend not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer backend {backend}; expected one of {', '.join(OPTIMIZERS)}")
+    weights = {**OBJECTIVE_WEIGHTS, **(weights or {})}
+    unknown = set(weights) - set(OBJECTIVE_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown objective {', '.join(sorted(unknown))}; expected one of {', '.join(OBJECTIVE_WEIGHTS)}")
+
+    budget = start_budget(budget or Budget(time_limit=time_limit))
+    start_presolve = timer()
+    reason = infeasibility_reason(instance, fitting_rooms(instance))
+    start_build = timer()
+    if reason is not None:
+        result = ScheduleResult(instance, "unsat", {"presolve": (start_build - start_presolve) * 1000})
+        result.reason = reason
+        return result
+
+    # The heuristic's schedule (smallest rooms) is the first one reported and seeds the search
+    progress = _Progress(instance, weights, on_solution)
+    construction = construct(instance)
+    if construction.complete:
+        progress.found(construction.to_result(instance, {}))
+    (status, reason), optimal, statistics = OPTIMIZERS[backend](instance, weights, budget, progress, construction, parameters)
+    end_search = timer()
+
+    result = progress.best
+    if result is None:
+        result = ScheduleResult(instance, status, {})
+        result.reason = reason
+    result.optimal = progress.best is not None and optimal
+    result.statistics = statistics
+    result.timings = {
+        "presolve": (start_build - start_presolve) * 1000,
+        "build": (progress.start - start_build) * 1000,
+        "check": (end_search - progress.start) * 1000,
+    }
+    return result
@@ -0,0 +1,167 @@
+"""
+Portfolio solving: several solver configurations race on one instance in separate
+processes and the first definitive (sat/unsat) answer wins; the others are terminated.
+
+CP-SAT runs with smallest_room=True so that every configuration decides the same
+problem as the Z3 encodings. The constructive heuristic (see heuristic.py) races as a
+configuration of its own, and the solver configurations run without it, so that a win is
+credited to whichever actually found the schedule. Each win is added to a small JSON statistics file so the
+default configurations can be tuned from real runs (see load_stats).
+
+Each worker imports only its own backend (see backends.py); with the fork start method
+the parent imports the raced backends once so that the workers inherit them. Every
+configuration runs under the same budget (see budget.py), including its memory ceiling.
+"""
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from multiprocessing.connection import wait
+from timeit import default_timer as timer
+
+from backends import load_backend
+from budget import MEMOUT_EXIT_CODE, Budget, MemoryWatchdog, memout_message, start_budget
+from cache import cached_solve
+from heuristic import construct
+from results import ScheduleResult
+
+# name -> (backend, options passed to the backend's solve function)
+PORTFOLIO = {
+    "heuristic": ("heuristic", {}),
+    "z3-ground": ("z3", {"encoding": "ground"}),
+    "z3-ground-random-phase": ("z3", {"encoding": "ground", "params": {"random_seed": 1, "smt.phase_selection": 5}}),
+    "cp-sat-parallel": ("ortools", {"parameters": {"num_search_workers": 8}}),
+    "cp-sat-seed-1": ("ortools", {"parameters": {"num_search_workers": 1, "random_seed": 1}}),
+}
+
+def _solve_heuristic(instance, budget):
+    start = timer()
+    construction = construct(instance)
+    timings = {"heuristic": (timer() - start) * 1000}
+    if construction.complete:
+        return construction.to_result(instance, timings)
+    # The heuristic cannot prove infeasibility, so an incomplete construction decides nothing
+    result = ScheduleResult(instance, "unknown", timings)
+    result.reason = construction.reason
+    return result
+
+def _solve_z3(instance, budget, encoding="ground", params=None):
+    return load_backend("z3")(instance, encoding, params=params, heuristic=False, budget=budget)
+
+def _solve_ortools(instance, budget, parameters=None):
+    return load_backend("ortools")(instance, parameters=parameters, smallest_room=True, heuristic=False, budget=budget)
+
+BACKENDS = {"heuristic": _solve_heuristic, "z3": _solve_z3, "ortools": _solve_ortools}
+
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "exam_scheduler_portfolio.json")
+
+def _worker(instance, backend, options, budget, connection):
+    MemoryWatchdog(budget.memory_mb)
+    try:
+        connection.send(BACKENDS[backend](instance, budget, **options))
+    except Exception as e:
+        connection.send(f"{type(e).__name__}: {e}")
+    connection.close()
+
+def load_stats(path=DEFAULT_STATS_PATH):
+    """{"configurations": {name: {"backend", "wins", "win_time_ms"}}, "backends": {backend: wins}}"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"configurations": {}, "backends": {}}
+
+def record_win(name, backend, elapsed_ms, path=DEFAULT_STATS_PATH):
+    stats = load_stats(path)
+    entry = stats["configurations"].setdefault(name, {"backend": backend, "wins": 0, "win_time_ms": 0.0})
+    entry["wins"] += 1
+    entry["win_time_ms"] += elapsed_ms
+    stats["backends"][backend] = stats["backends"].get(backend, 0) + 1
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    os.replace(temporary, path)
+
+def solve_portfolio(instance, configurations=None, timeout=None, cache=None, stats_path=DEFAULT_STATS_PATH, budget=None):
+    """
+    Races the named configurations (default: all of PORTFOLIO) and returns the winner's
+    ScheduleResult with solved_by set to its name. If none decides the instance within
+    timeout seconds the result has status "timeout" ("memout" when every configuration hit
+    the memory ceiling, "unknown" when they gave up). budget (see budget.py) is used
+    instead of timeout when given. stats_path=None skips the statistics.
+    """
+    configurations = configurations or list(PORTFOLIO)
+    for name in configurations:
+        if name not in PORTFOLIO:
+            raise ValueError(f"Unknown portfolio configuration {name}; expected one of {', '.join(PORTFOLIO)}")
+    budget = start_budget(budget or Budget(time_limit=timeout))
+    return cached_solve(cache, instance, "portfolio", "2", "smallest-room", lambda: _race(instance, configurations, budget, stats_path))
+
+def _race(instance, configurations, budget, stats_path):
+    if multiprocessing.get_start_method() == "fork":
+        for backend in {PORTFOLIO[name][0] for name in configurations} - {"heuristic"}:
+            load_backend(backend)
+    started = time.monotonic()
+    running = {}  # result connection -> (process, configuration name)
+    for name in configurations:
+        backend, options = PORTFOLIO[name]
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_worker, args=(instance, backend, options, budget, sender), daemon=True)
+        process.start()
+        sender.close()
+        running[receiver] = (process, name)
+
+    winner = None
+    failures = []
+    undecided = {}  # status -> reason, of the configurations that stopped without an answer
+    try:
+        while running and winner is None:
+            remaining = budget.remaining()
+            if remaining == 0:
+                undecided["timeout"] = f"Time limit of {budget.time_limit:g} s reached"
+                break
+            for receiver in wait(list(running), timeout=remaining):
+                process, name = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    if process.exitcode == MEMOUT_EXIT_CODE:
+                        result = undecided["memout"] = memout_message(budget.memory_mb)
+                    else:
+                        result = f"Worker exited with code {process.exitcode}"
+                receiver.close()
+                process.join()
+                if isinstance(result, ScheduleResult) and result.status in ("sat", "unsat"):
+                    winner = name, result
+                    break
+                if isinstance(result, str):
+                    failures.append(f"{name}: {result}")
+                else:
+                    undecided.setdefault(result.status, result.reason)
+    finally:
+        # Cancel the configurations that lost the race
+        for receiver, (process, _) in running.items():
+            process.terminate()
+            process.join()
+            receiver.close()
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    if winner is None:
+        if "memout" not in undecided and len(failures) == len(configurations):
+            raise RuntimeError("Every portfolio configuration failed: " + "; ".join(failures))
+        # Running out of time outranks running out of memory, which outranks giving up
+        status = next((status for status in ("timeout", "memout") if status in undecided), "unknown")
+        result = ScheduleResult(instance, status, {"portfolio": elapsed_ms})
+        result.reason = undecided.get(status)
+        return result
+
+    name, result = winner
+    result.solved_by = name
+    if stats_path is not None:
+        record_win(name, PORTFOLIO[name][0], elapsed_ms, stats_path)
+    return result
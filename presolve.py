@@ -0,0 +1,189 @@
+"""
+Presolve stage run between read_file and the encoders.
+
+It decides the obviously infeasible instances without a solver (each with a reason),
+prunes every exam's rooms to the smallest ones that fit (constraints 3 and 9) and splits
+the exam conflict graph into connected components.
+
+Components are not fully independent: rooms, slots and the invigilator pool are shared.
+Solving one component on its own is still a relaxation of the whole instance, so an
+UNSAT component proves the instance UNSAT. SAT components are merged with
+merge_components, which shifts components in time and reassigns rooms and invigilators
+across them; it returns None when the greedy merge fails and the full model has to be
+solved.
+"""
+import numpy as np
+
+from instance import Instance
+
+def invigilators_needed(students):
+    return 1 if students <= 10 else 2 if students <= 20 else 3
+
+def duty_capacity(pool, i, number_of_slots):
+    """The most exams invigilator i can cover: its limit, or fewer when its available slots run out."""
+    fits, last = 0, None
+    for slot in range(number_of_slots):
+        if pool.available(i, slot) and (last is None or slot - last > 1):
+            fits, last = fits + 1, slot
+    return min(pool.max_exams_of(i), fits)
+
+def fitting_rooms(instance):
+    """Exam -> every room that holds the exam (constraint 3 alone)."""
+    capacities = np.asarray(instance.room_capacities, dtype=np.int64)
+    return [np.flatnonzero(capacities >= students).tolist() for students in instance.student_exam_capacity]
+
+def room_domains(instance):
+    """Exam -> rooms of the smallest capacity that holds the exam (empty when none does)."""
+    capacities = np.asarray(instance.room_capacities, dtype=np.int64)
+    domains = []
+    for students in instance.student_exam_capacity:
+        fitting = capacities[capacities >= students]
+        domains.append(np.flatnonzero(capacities == fitting.min()).tolist() if len(fitting) else [])
+    return domains
+
+def room_symmetry_groups(domains):
+    """Groups of exams whose room domain (see room_domains) is the same two or more equal rooms, each in exam order."""
+    groups = {}
+    for exam, domain in enumerate(domains):
+        if len(domain) > 1:
+            groups.setdefault(tuple(domain), []).append(exam)
+    return [group for group in groups.values() if len(group) > 1]
+
+def conflict_components(instance):
+    """Connected components of the exam conflict graph as sorted exam arrays, ordered by first exam."""
+    labels = np.arange(instance.number_of_exams)
+    pairs = np.array(instance.index.conflict_pairs, dtype=np.int64).reshape(-1, 2)
+    first, second = pairs[:, 0], pairs[:, 1]
+    # Min-label propagation with pointer jumping until every edge joins equal labels
+    while len(pairs):
+        lowest = np.minimum(labels[first], labels[second])
+        np.minimum.at(labels, first, lowest)
+        np.minimum.at(labels, second, lowest)
+        labels = labels[labels]
+        if np.array_equal(labels[first], labels[second]):
+            break
+    order = np.argsort(labels, kind="stable")
+    splits = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, splits) if instance.number_of_exams else []
+
+def infeasibility_reason(instance, domains):
+    """A human-readable reason the instance is UNSAT, or None when the cheap checks pass."""
+    for exam, domain in enumerate(domains):
+        if not domain:
+            largest = max(instance.room_capacities, default=0)
+            return f"Exam {exam} has {instance.student_exam_capacity[exam]} students but the largest room holds {largest}"
+
+    cells = instance.number_of_rooms * instance.number_of_slots
+    if instance.number_of_exams > cells:
+        return f"{instance.number_of_exams} exams do not fit in {instance.number_of_rooms} rooms x {instance.number_of_slots} slots"
+
+    # A student's exams must be pairwise at least two slots apart, so k exams need 2k - 1 slots
+    keys = np.sort(instance.student_ids.astype(np.int64) * max(instance.number_of_exams, 1) + instance.exam_ids)
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+    exams_per_student = np.bincount(keys // max(instance.number_of_exams, 1), minlength=instance.number_of_students)
+    most = int(exams_per_student.max()) if len(exams_per_student) else 0
+    if 2 * most - 1 > instance.number_of_slots:
+        student = int(np.argmax(exams_per_student))
+        return f"Student {student} has {most} exams, which need {2 * most - 1} non-adjacent slots but only {instance.number_of_slots} exist"
+
+    pool = instance.invigilators
+    for exam, students in enumerate(instance.student_exam_capacity):
+        if invigilators_needed(students) > pool.size:
+            return f"Exam {exam} needs {invigilators_needed(students)} invigilators but the pool has {pool.size}"
+    needed = sum(invigilators_needed(students) for students in instance.student_exam_capacity)
+    available = sum(duty_capacity(pool, i, instance.number_of_slots) for i in range(pool.size))
+    if needed > available:
+        return f"The exams need {needed} invigilations but {pool.size} invigilators can cover at most {available}"
+    return None
+
+class Presolve:
+    """Outcome of the presolve stage; reason is None unless the instance is already UNSAT."""
+    def __init__(self, instance):
+        self.room_domains = room_domains(instance)
+        self.reason = infeasibility_reason(instance, self.room_domains)
+        self.components = conflict_components(instance) if self.reason is None else []
+
+    @property
+    def infeasible(self):
+        return self.reason is not None
+
+def sub_instance(instance, exams):
+    """The instance restricted to the given exams, renumbered 0..len(exams)-1 in order."""
+    renumber = np.full(instance.number_of_exams, -1, dtype=np.int32)
+    renumber[exams] = np.arange(len(exams), dtype=np.int32)
+    rows = renumber[instance.exam_ids] >= 0
+
+    sub = Instance()
+    sub.number_of_students = instance.number_of_students
+    sub.number_of_exams = len(exams)
+    sub.number_of_slots = instance.number_of_slots
+    sub.number_of_rooms = instance.number_of_rooms
+    sub.room_capacities = instance.room_capacities
+    sub.exam_ids = renumber[instance.exam_ids[rows]]
+    sub.student_ids = instance.student_ids[rows]
+    sub.student_exam_capacity = [instance.student_exam_capacity[e] for e in exams.tolist()]
+    sub.invigilators = instance.invigilators
+    return sub
+
+def merge_components(instance, domains, components, results):
+    """
+    Combines SAT component results. Each component's slots may be shifted as a block
+    (keeping its gaps) so that exams sharing a slot fit into distinct rooms; rooms and
+    invigilators are then reassigned greedily so that the shared constraints hold.
+    Returns (exam_room, exam_slot, exam_invigilators), or None if the greedy merge fails.
+    """
+    # Rooms: exams in one slot with the same domain need distinct rooms of that domain
+    exam_slot = np.zeros(instance.number_of_exams, dtype=np.int32)
+    used = {}  # (slot, domain) -> exams placed
+    for k in sorted(range(len(components)), key=lambda k: -len(components[k])):
+        exams, slots = components[k].tolist(), results[k].exam_slot
+        lowest, highest = int(slots.min()), int(slots.max())
+        offsets = sorted(range(-lowest, instance.number_of_slots - highest), key=abs)
+        for offset in offsets:
+            demand = {}
+            for exam, slot in zip(exams, slots.tolist()):
+                key = (slot + offset, tuple(domains[exam]))
+                demand[key] = demand.get(key, 0) + 1
+            if all(used.get(key, 0) + count <= len(key[1]) for key, count in demand.items()):
+                break
+        else:
+            return None
+        for key, count in demand.items():
+            used[key] = used.get(key, 0) + count
+        exam_slot[exams] = slots + offset
+
+    exam_room = np.zeros(instance.number_of_exams, dtype=np.int32)
+    taken = {}  # (slot, domain) -> rooms handed out
+    for exam in range(instance.number_of_exams):
+        key = (int(exam_slot[exam]), tuple(domains[exam]))
+        taken[key] = taken.get(key, 0) + 1
+        exam_room[exam] = domains[exam][taken[key] - 1]
+
+    exam_invigilators = assign_invigilators(instance, exam_slot)
+    if exam_invigilators is None:
+        return None
+    return exam_room, exam_slot, exam_invigilators
+
+def assign_invigilators(instance, exam_slot):
+    """
+    Greedy invigilator assignment for fixed exam slots: each invigilator covers at most its
+    own number of exams, only in slots it is available and never in the same or adjacent
+    slots. Returns exam -> invigilators, or None.
+    """
+    pool = instance.invigilators
+    duties = [[] for _ in range(pool.size)]
+    exam_invigilators = [[] for _ in range(instance.number_of_exams)]
+    for exam in np.argsort(exam_slot, kind="stable").tolist():
+        slot = int(exam_slot[exam])
+        free = [
+            i for i, slots in enumerate(duties)
+            if len(slots) < pool.max_exams_of(i) and pool.available(i, slot) and all(abs(slot - other) > 1 for other in slots)
+        ]
+        free.sort(key=lambda i: -len(duties[i]))  # Fill invigilators that already have a duty first
+        needed = invigilators_needed(instance.student_exam_capacity[exam])
+        if len(free) < needed:
+            return None
+        for i in sorted(free[:needed]):
+            duties[i].append(slot)
+            exam_invigilators[exam].append(i)
+    return exam_invigilators
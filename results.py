@@ -0,0 +1,194 @@
+import numpy as np
+
+# Phases recorded around the solver rather than by it; not part of the solve time
+OUTSIDE_SOLVE_PHASES = ("parse", "render", "core")
+
+# How each status is reported; all but "sat" come without a schedule. "timeout" and "memout"
+# mean a budget (see budget.py) ran out, "unknown" that the solver gave up for another reason
+STATUS_LABELS = {
+    "sat": "Satisfied",
+    "unsat": "Unsatisfied",
+    "timeout": "Timed out",
+    "memout": "Out of memory",
+    "unknown": "Unknown",
+}
+
+class ScheduleResult:
+    """
+    Outcome of one solve as flat arrays, so that reports never re-parse text.
+
+    status is a key of STATUS_LABELS; timings holds per-phase times in ms (parse,
+    render and core are added by the caller and excluded from total_time_ms). For SAT
+    results exam_room/exam_slot are int32 arrays indexed by exam and exam_invigilators
+    lists the invigilators of each exam. student_offsets/student_exams is the instance's
+    CSR student->exams adjacency (enrolment rows in file order). cached is True when the
+    result came from a ResultCache rather than a solver run; solved_by names the winning
+    configuration of a portfolio run and reason explains UNSAT answers found by presolve
+    and names the budget that ran out for "timeout" and "memout" results.
+    statistics holds the backend's solver statistics and profile the optional
+    instrumentation.profiled report. Results of optimize.optimize also carry the objective
+    values and whether the schedule was proven optimal. core lists the conflicting
+    constraints of an UNSAT result once diagnose.explain has run (core_minimal tells
+    whether every one of them was shown to be needed).
+    """
+    def __init__(self, instance, status, timings):
+        self.status = status
+        self.timings = timings
+        self.number_of_students = instance.number_of_students
+        self.number_of_exams = instance.number_of_exams
+        self.student_exam_capacity = instance.student_exam_capacity
+        self.student_offsets = instance.index.student_offsets
+        self.student_exams = instance.index.student_exams
+        self.exam_room = np.zeros(0, dtype=np.int32)
+        self.exam_slot = np.zeros(0, dtype=np.int32)
+        self.exam_invigilators = []
+        self.number_of_invigilators = 0
+        self.cached = False
+        self.solved_by = None
+        self.reason = None
+        self.statistics = {}
+        self.profile = None
+        self.objective = None
+        self.optimal = False
+        self.core = []
+        self.core_minimal = False
+
+    @property
+    def satisfied(self):
+        return self.status == "sat"
+
+    @property
+    def total_time_ms(self):
+        return sum(ms for phase, ms in self.timings.items() if phase not in OUTSIDE_SOLVE_PHASES)
+
+    def exams_of(self, student):
+        return self.student_exams[self.student_offsets[student]:self.student_offsets[student + 1]]
+
+    def invigilator_exams(self):
+        """Invigilator -> exams it is assigned to, in exam order."""
+        assigned = [[] for _ in range(self.number_of_invigilators)]
+        for exam, invigilators in enumerate(self.exam_invigilators):
+            for i in invigilators:
+                assigned[i].append(exam)
+        return assigned
+
+    def students_with_many_exams(self, limit=3):
+        counts = np.diff(self.student_offsets)
+        return np.flatnonzero(counts > limit).tolist()
+
+def render_exam_table(result):
+    return [
+        f"Exam: {ex} | Room: {result.exam_room[ex]} | Slot: {result.exam_slot[ex]} | Students: {result.student_exam_capacity[ex]} | Invigilators: {len(result.exam_invigilators[ex])}"
+        for ex in range(result.number_of_exams)
+    ]
+
+def render_student_timetables(result):
+    lines = []
+    for student_id in range(result.number_of_students):
+        exams = result.exams_of(student_id)
+        if len(exams):
+            lines.append(f"Student {student_id}: " + " | ".join(f"({ex}, {result.exam_slot[ex]}, {result.exam_room[ex]})" for ex in exams))
+        else:
+            lines.append(f"Student {student_id}: Student is not scheduled for any exam, please check with the student office.")
+    return lines
+
+def render_warning(result):
+    """The overloaded-students warning, or None when every student has at most 3 exams."""
+    many = result.students_with_many_exams()
+    if not many:
+        return None
+    return "Students with more than 3 exams: " + ", ".join(f"{id}" for id in many) + ". " + "Please make sure they are not overwhelmed by the exams!"
+
+def render_core(result):
+    """The conflicting constraints of an UNSAT result, one per line (empty without a core)."""
+    if not result.core:
+        return []
+    heading = "Conflicting constraints:" if result.core_minimal else "Conflicting constraints (may not be minimal):"
+    return [heading] + [f"  {item['description']}" for item in result.core]
+
+def render_invigilator_timetable(result):
+    return [
+        f"Invigilator {i}: " + ", ".join(f"Exam {e}" for e in exams) if exams else f"Invigilator {i}: No assigned exams."
+        for i, exams in enumerate(result.invigilator_exams())
+    ]
+
+def render_text(result):
+    """The classic text report: timetables for SAT results, then the time taken."""
+    parts = []
+    if result.satisfied:
+        parts.append(STATUS_LABELS["sat"])
+        if result.objective:
+            parts.append(f"Objective: {result.objective['total']} ({'optimal' if result.optimal else 'best found'})")
+        parts.append("――――――――――――Exam Timetable――――――――――――--")
+        parts.extend(render_exam_table(result))
+        parts.append("――――――――――――――――――――――――----------------")
+        parts.append("Individual Timetables (Exam no, Slot, Room):")
+        parts.extend(render_student_timetables(result))
+        warning = render_warning(result)
+        if warning:
+            parts.append("\n――――――――――――Warning――――――――――――")
+            parts.append(warning + "\n")
+        parts.append("\nInvigilator Timetable:")
+        parts.extend(render_invigilator_timetable(result))
+    else:
+        parts.append(STATUS_LABELS.get(result.status, result.status))
+        if result.reason:
+            parts.append(f"Reason: {result.reason}")
+        parts.extend(render_core(result))
+    parts.append(f"Time taken to solve the instance: {result.total_time_ms:.2f} ms")
+    return "\n".join(parts) + "\n"
+
+def render_details(result):
+    """Phase timings, solver statistics and any profile report, for the GUI details panel."""
+    lines = ["Phase timings:"]
+    lines.extend(f"  {phase}: {ms:.2f} ms" for phase, ms in result.timings.items())
+    if result.solved_by:
+        lines.append(f"Solved by: {result.solved_by}")
+    if result.objective:
+        lines.append(f"Objective ({'optimal' if result.optimal else 'best found'}):")
+        lines.extend(f"  {name}: {value}" for name, value in result.objective.items())
+    if result.statistics:
+        lines.append("Solver statistics:")
+        lines.extend(f"  {key}: {value}" for key, value in sorted(result.statistics.items()))
+    if result.profile:
+        if "tracemalloc" in result.profile:
+            traced = result.profile["tracemalloc"]
+            lines.append(f"Peak traced memory: {traced['peak_bytes'] / 1024:.1f} KiB")
+            lines.extend(f"  {line}" for line in traced["top"])
+        if "cprofile" in result.profile:
+            lines.append(result.profile["cprofile"])
+    return lines
+
+def result_to_dict(result):
+    """JSON-ready summary: status, timings and one entry per exam for SAT results."""
+    exams = []
+    if result.satisfied:
+        for ex in range(result.number_of_exams):
+            exams.append({
+                "exam": ex,
+                "room": int(result.exam_room[ex]),
+                "slot": int(result.exam_slot[ex]),
+                "students": result.student_exam_capacity[ex],
+                "invigilators": list(result.exam_invigilators[ex]),
+            })
+    return {
+        "status": result.status,
+        "cached": result.cached,
+        "solved_by": result.solved_by,
+        "reason": result.reason,
+        **{f"{phase}_time_ms": ms for phase, ms in result.timings.items()},
+        "statistics": result.statistics,
+        **({"profile": result.profile} if result.profile else {}),
+        **({"objective": result.objective, "optimal": result.optimal} if result.objective else {}),
+        **({"core": result.core, "core_minimal": result.core_minimal} if result.core else {}),
+        "exams": exams,
+    }
+
+def write_text_report(path, reports):
+    """Writes (file, result-or-error-text) pairs into one combined text file."""
+    with open(path, 'w', encoding='utf-8') as txt_file:
+        for file, report in reports:
+            if isinstance(report, ScheduleResult):
+                txt_file.write(f"Results for {file}:\n{render_text(report)}\n{'-' * 80}\n")
+            else:
+                txt_file.write(f"{report}\n{'-' * 80}\n")
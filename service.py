@@ -0,0 +1,506 @@
+"""
+Local solver service: a long-running asyncio HTTP server in front of a pool of warm worker
+processes. The workers import Z3 and OR-Tools once, at start, so a stream of small jobs
+costs their solve time rather than an interpreter start and both imports per job.
+
+    python service.py --port 8765 --workers 4
+    python service.py --unix /tmp/exam_scheduler.sock
+
+Endpoints, with JSON bodies:
+
+  POST   /jobs            {"instance": text format, or "instance_base64": either format,
+                           "backend": "ground", "priority": 0, "timeout": null,
+                           "rlimit": null, "memory_mb": null,
+                           "explain": false, "symmetry_breaking": false}
+                          Queues a job and returns it. A submission identical to a queued
+                          or running job (payload and options other than priority) returns
+                          that job instead, with "duplicate": true, raising its priority.
+  GET    /jobs/ID         The job, with its result once done.
+  GET    /jobs/ID/events  Streams the job's events as JSON lines until it is done: queued,
+                          running, progress (each improving schedule of "optimize"
+                          and "lns") and done.
+  DELETE /jobs/ID         Cancels a queued job, or stops a running one and replaces its worker.
+  GET    /status          Workers, queue length and jobs per state.
+
+Backends are the Z3 encodings ("ground", "quantified"), "ortools" (CP-SAT deciding the
+same problem, with smallest rooms), "optimize" (see optimize.py) and "lns" (see lns.py; a
+worker solves its neighbourhoods one at a time). Higher priorities run first, ties in
+submission order. Results are result_to_dict dicts. A job's timeout, rlimit
+and memory_mb form its budget (see budget.py), defaulting to the service's --timeout,
+--rlimit and --memory-mb and then to the environment. Solvers stop by themselves when the
+budget runs out and report status "timeout" or "memout"; as in cli.py, a job still running
+GRACE_SECONDS past its timeout has its worker terminated and replaced and gets status
+"timeout", and a worker that outgrows memory_mb exits and its job gets status "memout".
+
+    curl -s localhost:8765/jobs -d "{\"instance\": $(jq -Rs . < 'test instances/sat1.txt')}"
+    curl -sN localhost:8765/jobs/1/events
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import heapq
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from backends import ENCODINGS, load_backend
+from budget import MEMOUT_EXIT_CODE, Budget, MemoryWatchdog, memout_message, start_budget
+from cache import ResultCache, default_cache
+from instance import read_bytes
+from instrumentation import phase
+from results import result_to_dict
+
+SERVICE_BACKENDS = (*ENCODINGS, "ortools", "optimize", "lns")
+
+# Imported by every worker before it takes its first job
+WARM_MODULES = ("solver", "alternative_solution", "optimize", "lns", "diagnose")
+
+# Extra seconds a job gets past its timeout to stop by itself and report
+GRACE_SECONDS = 10
+
+# Finished jobs kept for GET /jobs/ID; older ones are forgotten first
+JOB_HISTORY = 1000
+
+MAX_REQUEST_BYTES = 256 * 1024 * 1024
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+def _solve_job(instance, options, cache, on_solution, budget):
+    backend = options["backend"]
+    if backend == "optimize":
+        return load_backend("optimize")(instance, on_solution=on_solution, budget=budget)
+    if backend == "lns":
+        return load_backend("lns")(instance, on_solution=on_solution, budget=budget)
+    if backend == "ortools":
+        return load_backend("ortools")(instance, cache, smallest_room=True, symmetry_breaking=options["symmetry_breaking"], budget=budget)
+    return load_backend("z3")(instance, backend, cache, symmetry_breaking=options["symmetry_breaking"], budget=budget)
+
+def _worker(connection, cache_dir, use_cache):
+    """Worker process: imports every backend, reports ready, then solves jobs until its pipe closes."""
+    try:
+        _serve_jobs(connection, cache_dir, use_cache)
+    except (BrokenPipeError, EOFError):
+        pass  # The service stopped
+
+def _serve_jobs(connection, cache_dir, use_cache):
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+    from diagnose import explain
+
+    cache = (ResultCache(cache_dir) if cache_dir else default_cache()) if use_cache else None
+    watchdog = MemoryWatchdog()
+    connection.send(("ready", None, None))
+    while True:
+        job_id, payload, options, budget = connection.recv()
+        watchdog.limit_mb = budget.memory_mb
+        try:
+            timings = {}
+            with phase(timings, "parse"):
+                instance = read_bytes(payload)
+            progress = lambda result: connection.send(("progress", job_id, result_to_dict(result)))
+            result = _solve_job(instance, options, cache, progress, budget)
+            # Optimize and LNS relax constraint 9, so the core of the ground model does not apply
+            if options["explain"] and options["backend"] not in ("optimize", "lns"):
+                explain(instance, result)
+            result.timings = {**timings, **result.timings}
+            message = result_to_dict(result)
+        except Exception as e:
+            message = {"status": "error", "error": str(e)}
+        watchdog.limit_mb = None
+        connection.send(("done", job_id, message))
+
+class Job:
+    """A submission and what happened to it; state goes queued -> running -> done."""
+    def __init__(self, id, key, payload, options, priority):
+        self.id = id
+        self.key = key
+        self.payload = payload
+        self.options = options
+        self.priority = priority
+        self.state = "queued"
+        self.result = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.subscribers = set()  # asyncio queues of streaming clients
+
+    def publish(self, event, **data):
+        event = {"event": event, "job": self.id, **data}
+        self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(event)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "backend": self.options["backend"],
+            "priority": self.priority,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+        }
+
+class Worker:
+    """A worker process, its pipe and the job it is solving."""
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.ready = False
+        self.job = None
+        self.budget = None  # The running job's started budget
+        self.deadline = None  # asyncio timer handle of the running job's timeout
+
+class SolverService:
+    """
+    The job queue and worker pool behind the HTTP server. All methods run on the event
+    loop; each worker's pipe is read by its own thread, which hands messages to the loop.
+    """
+    def __init__(self, workers=None, cache_dir=None, use_cache=True, budget=None):
+        self.number_of_workers = workers or os.cpu_count() or 1
+        self.budget = budget or Budget()  # Limits of jobs that do not set their own
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.context = multiprocessing.get_context("spawn")
+        self.loop = None
+        self.workers = []
+        self.jobs = {}  # id -> Job, in submission order
+        self.in_flight = {}  # key -> queued or running Job
+        self.queue = []  # heap of (-priority, sequence, job)
+        self.sequence = itertools.count()
+        self.ids = itertools.count(1)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        for _ in range(self.number_of_workers):
+            self._spawn()
+
+    def close(self):
+        for worker in self.workers:
+            worker.process.terminate()
+        for worker in self.workers:
+            worker.process.join()
+        self.workers = []
+
+    def _spawn(self):
+        receiver, sender = self.context.Pipe()
+        process = self.context.Process(target=_worker, args=(sender, self.cache_dir, self.use_cache), daemon=True)
+        process.start()
+        sender.close()
+        worker = Worker(process, receiver)
+        self.workers.append(worker)
+        threading.Thread(target=self._read, args=(worker,), daemon=True).start()
+
+    def _read(self, worker):
+        try:
+            while True:
+                try:
+                    message = worker.connection.recv()
+                except (EOFError, OSError):
+                    self.loop.call_soon_threadsafe(self._exited, worker)
+                    return
+                self.loop.call_soon_threadsafe(self._received, worker, *message)
+        except RuntimeError:
+            pass  # The event loop closed during shutdown
+
+    def _received(self, worker, kind, job_id, data):
+        if worker not in self.workers:
+            return
+        if kind == "ready":
+            worker.ready = True
+        elif worker.job is not None and worker.job.id == job_id:
+            if kind == "progress":
+                worker.job.publish("progress", result=data)
+            else:
+                self._finish(worker, data)
+        self._dispatch()
+
+    def _exited(self, worker):
+        """A worker died or was replaced; its job, if any, fails and a new worker takes its place."""
+        if worker not in self.workers:
+            return
+        if worker.job is not None:
+            worker.process.join()
+            if worker.process.exitcode == MEMOUT_EXIT_CODE:
+                self._finish(worker, {"status": "memout", "reason": memout_message(worker.budget.memory_mb)})
+            else:
+                self._finish(worker, {"status": "error", "error": f"Worker exited with code {worker.process.exitcode}"})
+        self._replace(worker)
+
+    def _replace(self, worker):
+        self.workers.remove(worker)
+        worker.process.terminate()
+        worker.process.join()
+        worker.connection.close()
+        self._spawn()
+
+    def _finish(self, worker, result):
+        job = worker.job
+        worker.job = None
+        if worker.deadline is not None:
+            worker.deadline.cancel()
+            worker.deadline = None
+        self._done(job, result)
+
+    def _done(self, job, result):
+        job.state = "done"
+        job.result = result
+        job.finished = time.time()
+        job.payload = None
+        if self.in_flight.get(job.key) is job:
+            del self.in_flight[job.key]
+        job.publish("done", result=result)
+        finished = [id for id, old in self.jobs.items() if old.state == "done"]
+        for id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[id]
+
+    def _timed_out(self, worker, job):
+        if worker.job is job:
+            worker.job = None
+            worker.deadline = None
+            self._replace(worker)
+            self._done(job, {"status": "timeout", "error": f"Exceeded the {worker.budget.time_limit:g}s time limit by {GRACE_SECONDS}s"})
+            self._dispatch()
+
+    def _budget(self, options):
+        """The job's started budget: its own limits, else the service's, else the environment's."""
+        limits = {"time_limit": options["timeout"], "rlimit": options["rlimit"], "memory_mb": options["memory_mb"]}
+        return start_budget(Budget(**{field: getattr(self.budget, field) if value is None else value for field, value in limits.items()}))
+
+    def submit(self, payload, options, priority=0):
+        """Queues a job; returns it and whether it is an identical in-flight job."""
+        key = hashlib.sha256(payload + json.dumps(options, sort_keys=True).encode()).hexdigest()
+        job = self.in_flight.get(key)
+        if job is not None:
+            if job.state == "queued" and priority > job.priority:
+                job.priority = priority
+                heapq.heappush(self.queue, (-priority, next(self.sequence), job))
+            return job, True
+
+        job = Job(str(next(self.ids)), key, payload, options, priority)
+        self.jobs[job.id] = job
+        self.in_flight[key] = job
+        heapq.heappush(self.queue, (-priority, next(self.sequence), job))
+        job.publish("queued", priority=priority)
+        self._dispatch()
+        return job, False
+
+    def cancel(self, job):
+        if job.state == "queued":
+            self._done(job, {"status": "cancelled"})
+        elif job.state == "running":
+            worker = next(worker for worker in self.workers if worker.job is job)
+            worker.job = None
+            if worker.deadline is not None:
+                worker.deadline.cancel()
+                worker.deadline = None
+            self._replace(worker)
+            self._done(job, {"status": "cancelled"})
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hands the highest-priority queued jobs to idle workers."""
+        idle = [worker for worker in self.workers if worker.ready and worker.job is None]
+        while idle and self.queue:
+            negative_priority, _, job = heapq.heappop(self.queue)
+            # Skip cancelled jobs and entries left behind by a priority raise
+            if job.state != "queued" or -negative_priority != job.priority:
+                continue
+            worker = idle.pop()
+            worker.job = job
+            job.state = "running"
+            job.started = time.time()
+            worker.budget = self._budget(job.options)
+            worker.connection.send((job.id, job.payload, job.options, worker.budget))
+            if worker.budget.time_limit is not None:
+                worker.deadline = self.loop.call_later(worker.budget.time_limit + GRACE_SECONDS, self._timed_out, worker, job)
+            job.publish("running")
+
+    def status(self):
+        states = {}
+        for job in self.jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "workers": len(self.workers),
+            "ready": sum(worker.ready for worker in self.workers),
+            "busy": sum(worker.job is not None for worker in self.workers),
+            "queued": states.get("queued", 0),
+            "jobs": states,
+        }
+
+def parse_submission(body):
+    """(payload bytes, options, priority) of a POST /jobs body; raises ValueError when it is invalid."""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError as e:
+        raise ValueError(f"The body is not JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("The body must be a JSON object")
+    if isinstance(data.get("instance"), str):
+        payload = data["instance"].encode()
+    elif isinstance(data.get("instance_base64"), str):
+        payload = base64.b64decode(data["instance_base64"], validate=True)
+    else:
+        raise ValueError('Expected the instance as "instance" (text format) or "instance_base64"')
+    options = {
+        "backend": data.get("backend", "ground"),
+        "timeout": data.get("timeout"),
+        "rlimit": data.get("rlimit"),
+        "memory_mb": data.get("memory_mb"),
+        "explain": bool(data.get("explain", False)),
+        "symmetry_breaking": bool(data.get("symmetry_breaking", False)),
+    }
+    if options["backend"] not in SERVICE_BACKENDS:
+        raise ValueError(f"Unknown backend {options['backend']}; expected one of {', '.join(SERVICE_BACKENDS)}")
+    timeout = options["timeout"]
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+        raise ValueError("timeout must be a positive number of seconds")
+    for name in ("rlimit", "memory_mb"):
+        value = options[name]
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+            raise ValueError(f"{name} must be a positive integer")
+    priority = data.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError("priority must be an integer")
+    return payload, options, priority
+
+async def _read_request(reader):
+    """(method, path, body) of one HTTP/1.1 request."""
+    method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_REQUEST_BYTES:
+        raise OverflowError(f"Requests are limited to {MAX_REQUEST_BYTES} bytes")
+    return method, urlsplit(target).path, await reader.readexactly(length)
+
+def _head(status, content_type="application/json", length=None):
+    head = f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\nConnection: close\r\n"
+    if length is not None:
+        head += f"Content-Length: {length}\r\n"
+    return (head + "\r\n").encode()
+
+async def _respond(writer, status, data):
+    body = json.dumps(data).encode()
+    writer.write(_head(status, length=len(body)) + body)
+    await writer.drain()
+
+async def _stream(writer, job):
+    """Writes the job's events so far, then each new one, as JSON lines until it is done."""
+    queue = asyncio.Queue()
+    job.subscribers.add(queue)
+    try:
+        writer.write(_head(200, "application/x-ndjson"))
+        for event in list(job.events):
+            queue.put_nowait(event)
+        while True:
+            event = await queue.get()
+            writer.write((json.dumps(event) + "\n").encode())
+            await writer.drain()
+            if event["event"] == "done":
+                return
+    finally:
+        job.subscribers.discard(queue)
+
+def make_handler(service):
+    async def handle(reader, writer):
+        try:
+            try:
+                method, path, body = await _read_request(reader)
+            except OverflowError as e:
+                return await _respond(writer, 413, {"error": str(e)})
+            except (ValueError, asyncio.IncompleteReadError):
+                return await _respond(writer, 400, {"error": "Malformed HTTP request"})
+
+            parts = [part for part in path.split("/") if part]
+            if parts == ["status"] and method == "GET":
+                return await _respond(writer, 200, service.status())
+            if parts == ["jobs"] and method == "POST":
+                try:
+                    payload, options, priority = parse_submission(body)
+                except ValueError as e:
+                    return await _respond(writer, 400, {"error": str(e)})
+                job, duplicate = service.submit(payload, options, priority)
+                return await _respond(writer, 202, {**job.to_dict(), "duplicate": duplicate})
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.jobs.get(parts[1])
+                if job is None:
+                    return await _respond(writer, 404, {"error": f"No job {parts[1]}"})
+                if parts[2:] == ["events"] and method == "GET":
+                    return await _stream(writer, job)
+                if len(parts) == 2 and method == "GET":
+                    return await _respond(writer, 200, job.to_dict())
+                if len(parts) == 2 and method == "DELETE":
+                    service.cancel(job)
+                    return await _respond(writer, 200, job.to_dict())
+                return await _respond(writer, 405, {"error": f"{method} is not supported on {path}"})
+            return await _respond(writer, 404, {"error": f"No endpoint {path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    return handle
+
+async def serve(host="127.0.0.1", port=8765, unix=None, workers=None, cache_dir=None, use_cache=True, ready=None, budget=None):
+    """
+    Runs the service until cancelled or sent SIGINT/SIGTERM; ready, if given, is called with
+    the server once it listens. budget holds the limits of jobs that do not set their own.
+    """
+    service = SolverService(workers, cache_dir, use_cache, budget)
+    service.start()
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            service.loop.add_signal_handler(signal_number, stopped.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not on Windows or outside the main thread; KeyboardInterrupt still stops asyncio.run
+    handler = make_handler(service)
+    server = await (asyncio.start_unix_server(handler, unix) if unix else asyncio.start_server(handler, host, port))
+    try:
+        async with server:
+            if ready is not None:
+                ready(server)
+            await stopped.wait()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve exam timetabling jobs from a pool of warm solver processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="solve every job even if a cached result exists")
+    parser.add_argument("--cache-dir", default=None, help="result cache directory (default: ~/.cache/exam_scheduler)")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="time limit of jobs without one, in seconds (default: $EXAM_SCHEDULER_TIME_LIMIT)")
+    parser.add_argument("--rlimit", type=int, default=None, help="Z3 resource limit of jobs without one (default: $EXAM_SCHEDULER_RLIMIT)")
+    parser.add_argument("--memory-mb", type=int, default=None, help="worker memory ceiling of jobs without one, in MB (default: $EXAM_SCHEDULER_MEMORY_MB)")
+    args = parser.parse_args(argv)
+
+    def ready(server):
+        host, port = server.sockets[0].getsockname()[:2] if not args.unix else (None, None)
+        print(f"Serving on {args.unix or f'http://{host}:{port}'}", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.cache_dir, not args.no_cache, ready, Budget(args.timeout, args.rlimit, args.memory_mb)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import numpy as np
+from z3 import *
+from timeit import default_timer as timer
+
+from budget import start_budget, z3_outcome
+from heuristic import construct
+from instrumentation import z3_statistics
+from results import ScheduleResult
+from solver import add_invigilator_constraints, add_symmetry_breaking, canonical_invigilators, extract_assignment, invigilators_needed
+
+# Z3's own defaults, restored before a check whose budget leaves a limit unset
+UNLIMITED = {"timeout": 4294967295, "rlimit": 0}
+
+class SchedulerSession:
+    """
+    Long-lived ground Z3 model that absorbs timetable edits and re-checks incrementally.
+
+    The parts of the ground encoding that never change (room/slot bounds and uniqueness,
+    constraints 6-8) are asserted once. Everything an edit can touch - an exam's room
+    domain and invigilators needed, student conflicts, blocked slots and pins - sits
+    behind an assumption literal. An edit retires the old literal (asserting its
+    negation) and guards the new constraint with a fresh one, so resolve() only pays for
+    the check itself.
+
+    Exams stay where they are unless an edit forces them to move: resolve() checks with a
+    "stay" literal per exam pinning its last room, slot and invigilators, drops the stays
+    in each unsat core and re-checks, so only the exams that cannot keep their place move
+    (result.statistics["relaxed"] counts the stays dropped). Before the first answer the
+    stays hold the heuristic's placement (see heuristic.py).
+
+        session = SchedulerSession(read_file(path))
+        result, changes = session.resolve()
+        session.add_enrolment(3, 41)
+        session.block_slot(5)
+        result, changes = session.resolve(Budget(time_limit=10))  # changes: only the exams that moved
+    """
+    def __init__(self, instance):
+        self.instance = instance
+        self.s = Solver()
+        self.result = None
+        self._last_sat = None  # most recent satisfying result, for warm starts and change tracking
+        self._literals = {}  # edit key -> assumption literal currently in force
+        self._next_literal = 0
+        self._exam_data = {}  # exam -> (room domain, invigilators needed) currently asserted
+        self._conflicts = set()
+        self._stays = {}  # (exam, room, slot) -> literal pinning the exam there
+
+        exams = range(instance.number_of_exams)
+        self.exam_room = [Int(f"room_{e}") for e in exams]
+        self.exam_time = [Int(f"slot_{e}") for e in exams]
+        self.needed = [Int(f"needed_{e}") for e in exams]
+
+        # Constraint 1 and 2: Room and Time Assignments for Exams (no two exams share a room and slot)
+        for e in exams:
+            self.s.add(self.exam_room[e] >= 0, self.exam_room[e] < instance.number_of_rooms)
+            self.s.add(self.exam_time[e] >= 0, self.exam_time[e] < instance.number_of_slots)
+        if instance.number_of_exams > 1:
+            self.s.add(Distinct([self.exam_room[e] * instance.number_of_slots + self.exam_time[e] for e in exams]))
+
+        self.InvigilatorAssigned = add_invigilator_constraints(self.s, instance, self.exam_time, self.needed)
+        # Only the invigilator ordering: the room groups change with capacities and enrolments,
+        # while the pool is fixed for the session
+        add_symmetry_breaking(self.s, instance, self.exam_room, self.exam_time, self.InvigilatorAssigned, smallest_room=False)
+
+        for e in exams:
+            self._sync_exam(e)
+        self._sync_conflicts()
+
+    def _guard(self, key, constraint):
+        """Asserts constraint behind a fresh literal that replaces any earlier one for key."""
+        self._retire(key)
+        self._next_literal += 1
+        literal = Bool(f"edit_{self._next_literal}")
+        self.s.add(Implies(literal, constraint))
+        self._literals[key] = literal
+
+    def _retire(self, key):
+        literal = self._literals.pop(key, None)
+        if literal is not None:
+            self.s.add(Not(literal))
+
+    def _sync_exam(self, e):
+        """Constraints 3, 9 and the invigilator count for one exam, re-guarded only when they change."""
+        students = self.instance.student_exam_capacity[e]
+        fitting = [cap for cap in self.instance.room_capacities if cap >= students]
+        domain = tuple(rm for rm, cap in enumerate(self.instance.room_capacities) if fitting and cap == min(fitting))
+        data = (domain, invigilators_needed(students))
+        if self._exam_data.get(e) == data:
+            return
+        self._exam_data[e] = data
+        in_domain = Or([self.exam_room[e] == rm for rm in domain]) if domain else BoolVal(False)
+        self._guard(("exam", e), And(in_domain, self.needed[e] == data[1]))
+
+    def _sync_conflicts(self):
+        """Constraint 4 for exactly the exam pairs that currently share a student."""
+        pairs = set(self.instance.index.conflict_pairs)
+        for e1, e2 in self._conflicts - pairs:
+            self._retire(("conflict", e1, e2))
+        for e1, e2 in pairs - self._conflicts:
+            self._guard(("conflict", e1, e2), Or(self.exam_time[e1] - self.exam_time[e2] > 1, self.exam_time[e2] - self.exam_time[e1] > 1))
+        self._conflicts = pairs
+
+    def add_enrolment(self, exam, student):
+        self.instance.add_enrolment(exam, student)
+        self._sync_exam(exam)
+        self._sync_conflicts()
+
+    def remove_enrolment(self, exam, student):
+        self.instance.remove_enrolment(exam, student)
+        self._sync_exam(exam)
+        self._sync_conflicts()
+
+    def set_room_capacity(self, room, capacity):
+        """Changes a room's capacity; a capacity of 0 effectively closes the room."""
+        capacities = list(self.instance.room_capacities)
+        capacities[room] = capacity
+        self.instance.room_capacities = capacities
+        for e in range(self.instance.number_of_exams):
+            self._sync_exam(e)
+
+    def block_slot(self, slot):
+        self._guard(("block", slot), And([t != slot for t in self.exam_time]))
+
+    def unblock_slot(self, slot):
+        self._retire(("block", slot))
+
+    def pin_exam(self, exam, slot=None, room=None):
+        """Fixes an exam's slot and/or room until unpin_exam is called."""
+        pinned = []
+        if slot is not None:
+            pinned.append(self.exam_time[exam] == slot)
+        if room is not None:
+            pinned.append(self.exam_room[exam] == room)
+        self._guard(("pin", exam), And(pinned))
+
+    def unpin_exam(self, exam):
+        self._retire(("pin", exam))
+
+    def _stay(self, e, room, slot, invigilators):
+        """The literal keeping exam e in its room and slot with its invigilators, asserted once per assignment."""
+        key = (e, room, slot, tuple(invigilators))
+        if key not in self._stays:
+            self._stays[key] = Bool(f"stay_{len(self._stays)}")
+            cover = [row[e] if i in invigilators else Not(row[e]) for i, row in enumerate(self.InvigilatorAssigned)]
+            self.s.add(Implies(self._stays[key], And(self.exam_room[e] == room, self.exam_time[e] == slot, *cover)))
+        return self._stays[key]
+
+    def resolve(self, budget=None):
+        """
+        Re-checks under the current edits. Returns the new ScheduleResult and a dict of
+        exam -> (room, slot, invigilators) holding only the exams whose assignment changed
+        relative to the last satisfying result (every exam when there is none yet).
+        budget (see budget.py) limits this check; when it runs out the result has status
+        "timeout" or "memout" and the session stays usable.
+        """
+        budget = start_budget(budget)
+        set_param("memory_max_size", budget.memory_mb or 0)
+        previous = self._last_sat
+        start_check = timer()
+        stays = {}  # literal id -> literal
+        if previous is not None:
+            exam_room, exam_slot, exam_invigilators = previous.exam_room, previous.exam_slot, previous.exam_invigilators
+        else:
+            # Nothing to keep yet: start from the heuristic's placement
+            start = construct(self.instance)
+            exam_room, exam_slot = start.exam_room, start.exam_slot
+            exam_invigilators = canonical_invigilators(self.instance, start.exam_invigilators)
+        for e in np.flatnonzero(exam_slot >= 0).tolist():
+            literal = self._stay(e, int(exam_room[e]), int(exam_slot[e]), exam_invigilators[e])
+            stays[literal.get_id()] = literal
+
+        # Relax the stays of each unsat core until the edits alone decide
+        relaxed = 0
+        while True:
+            for name, value in {**UNLIMITED, **budget.z3_params()}.items():
+                self.s.set(name, value)
+            status = self.s.check(*self._literals.values(), *stays.values())
+            if status != unsat:
+                break
+            core = [literal.get_id() for literal in self.s.unsat_core() if literal.get_id() in stays]
+            if not core:
+                break
+            for literal in core:
+                del stays[literal]
+            relaxed += len(core)
+        start_extract = timer()
+
+        result = ScheduleResult(self.instance, str(status), {})
+        changes = {}
+        if status == unknown:
+            result.status, result.reason = z3_outcome(budget, self.s.reason_unknown())
+        if status == sat:
+            result.exam_room, result.exam_slot, covers = extract_assignment(self.s.model(), self.exam_room, self.exam_time, self.InvigilatorAssigned)
+            result.number_of_invigilators = len(self.InvigilatorAssigned)
+            result.exam_invigilators = [np.flatnonzero(column).tolist() for column in covers.T]
+            for e in range(self.instance.number_of_exams):
+                assignment = (int(result.exam_room[e]), int(result.exam_slot[e]), result.exam_invigilators[e])
+                if previous is None or assignment != (int(previous.exam_room[e]), int(previous.exam_slot[e]), previous.exam_invigilators[e]):
+                    changes[e] = assignment
+        end_extract = timer()
+
+        result.statistics = {**z3_statistics(self.s), "relaxed": relaxed}
+        result.timings = {
+            "check": (start_extract - start_check) * 1000,
+            "extract": (end_extract - start_extract) * 1000,
+        }
+        self.result = result
+        if result.satisfied:
+            self._last_sat = result
+        return result, changes
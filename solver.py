@@ -0,0 +1,429 @@
+import multiprocessing
+import os
+import numpy as np
+from z3 import *
+from timeit import default_timer as timer
+
+from budget import start_budget, z3_outcome
+from cache import cached_solve
+from heuristic import construct
+from instrumentation import combine_statistics, profiled, z3_statistics
+from presolve import Presolve, fitting_rooms, invigilators_needed, merge_components, room_domains, room_symmetry_groups, sub_instance
+from results import ScheduleResult
+
+def add_invigilator_constraints(s, instance, exam_time, needed=None, guards=None):
+    """
+    Adds constraints 5-8 over the exam time terms for the instance's invigilator pool and
+    returns the (invigilator, exam) cover matrix. `needed` optionally gives a per-exam
+    term for the number of invigilators required; by default it is fixed from the exam's
+    student count. `guards` optionally gives each invigilator a literal that its covers
+    are tied to its duties under, so that dropping the literal lifts all of its rules
+    (see diagnose.py).
+
+    The model grows with invigilators x exams rather than invigilators x exams x slots:
+    invigilator i has one duty per exam it may cover, each duty holds at most one exam and
+    takes that exam's slot, and the rules between an invigilator's exams are stated on its
+    few duties.
+    """
+    pool = instance.invigilators
+    exams = range(instance.number_of_exams)
+    cover = [[Bool(f"invig_{i}_exam_{e}") for e in exams] for i in range(pool.size)]
+
+    for i in range(pool.size):
+        duties = range(pool.max_exams_of(i))
+        duty_exam = [[Bool(f"invig_{i}_duty_{k}_exam_{e}") for e in exams] for k in duties]
+        duty_slot = [Int(f"invig_{i}_duty_{k}_slot") for k in duties]
+        used = [Or(duty_exam[k]) for k in duties]
+        for k in duties:
+            s.add(AtMost(*duty_exam[k], 1))
+            s.add(duty_slot[k] >= 0, duty_slot[k] < instance.number_of_slots)
+            for e in exams:
+                s.add(Implies(duty_exam[k][e], duty_slot[k] == exam_time[e]))
+            # Availability: no duty in a slot the invigilator cannot work
+            for t in pool.unavailable_slots(i):
+                s.add(Implies(used[k], duty_slot[k] != t))
+        for e in exams:
+            link = cover[i][e] == Or([duty_exam[k][e] for k in duties])
+            s.add(link if guards is None else Implies(guards[i], link))
+
+        # Constraint 7: Each invigilator covers at most its own number of exams, one per duty
+        # Constraint 8: No invigilator can invigilate in the same or consecutive time slots
+        for k1 in duties:
+            for k2 in range(k1 + 1, len(duties)):
+                s.add(Implies(And(used[k1], used[k2]), Or(duty_slot[k1] - duty_slot[k2] > 1, duty_slot[k2] - duty_slot[k1] > 1)))
+
+    # Constraint 5: Assign invigilators based on number of students
+    for e in exams:
+        exam_needed = invigilators_needed(instance.student_exam_capacity[e]) if needed is None else needed[e]
+        s.add(Sum([If(cover[i][e], 1, 0) for i in range(pool.size)]) == exam_needed)
+
+    # Constraint 6: Total invigilators per time slot must not exceed the pool; implied by
+    # constraint 8, since an invigilator has at most one exam in any slot
+
+    return cover
+
+def add_symmetry_breaking(s, instance, exam_room, exam_time, InvigilatorAssigned, smallest_room=True):
+    """
+    Adds constraints that keep one of each set of equivalent schedules:
+    - interchangeable invigilators (same limit and availability) have cover rows in
+      non-increasing lexicographic order over the exams
+    - with smallest_room, exams that share a slot and a domain of equal rooms take those
+      rooms in exam order
+    """
+    for group in instance.invigilators.interchangeable():
+        for i1, i2 in zip(group, group[1:]):
+            # equal: the rows agree on every earlier exam
+            equal = BoolVal(True)
+            for e, (x, y) in enumerate(zip(InvigilatorAssigned[i1], InvigilatorAssigned[i2])):
+                s.add(Implies(And(equal, y), x))
+                if e + 1 < len(exam_time):
+                    next_equal = Bool(f"invig_{i1}_equals_{i2}_before_{e + 1}")
+                    s.add(Implies(And(equal, x == y), next_equal))
+                    equal = next_equal
+
+    if smallest_room:
+        conflicts = set(instance.index.conflict_pairs)
+        for group in room_symmetry_groups(room_domains(instance)):
+            for k, e1 in enumerate(group):
+                for e2 in group[k + 1:]:
+                    if (e1, e2) not in conflicts:  # Conflicting exams never share a slot
+                        s.add(Implies(exam_time[e1] == exam_time[e2], exam_room[e1] < exam_room[e2]))
+
+def build_quantified_model(instance, symmetry_breaking=False):
+    """Original encoding over uninterpreted functions and quantified Int variables."""
+    s = Solver()
+
+    # Variable Declarations
+    exam = Int('exam')
+    room = Int('room')
+    timeslot = Int('timeslot')
+    next_exam = Int('next_exam')
+    next_timeslot = Int('next_timeslot')
+    student = Int('student')
+
+    # Range Functions for Constraints
+    Student_Range = Function('Student_Range', IntSort(), BoolSort())
+    Exam_Range = Function('Exam_Range', IntSort(), BoolSort())
+    Room_Range = Function('Room_Range', IntSort(), BoolSort())
+    TimeSlot_Range = Function('TimeSlot_Range', IntSort(), BoolSort())
+    RoomCapacity = Function('RoomCapacity', IntSort(), IntSort())
+    StudentCount = Function('StudentCount', IntSort(), IntSort())
+    next_room = Int('next_room')
+
+    # Range Constraints
+    s.add(ForAll([student], Student_Range(student) == And(student >= 0, student < instance.number_of_students)))
+    s.add(ForAll([exam], Exam_Range(exam) == And(exam >= 0, exam < instance.number_of_exams)))
+    s.add(ForAll([timeslot], TimeSlot_Range(timeslot) == And(timeslot >= 0, timeslot < instance.number_of_slots)))
+    s.add(ForAll([room], Room_Range(room) == And(room >= 0, room < instance.number_of_rooms)))
+
+    # Functions for Exam Room, Time, and Students
+    ExamRoom = Function('ExamRoom', IntSort(), IntSort())      # Maps each exam to a room
+    ExamTime = Function('ExamTime', IntSort(), IntSort())      # Maps each exam to a timeslot
+    ExamStudent = Function('ExamStudent', IntSort(), IntSort(), BoolSort())  # Indicates if a student is taking an exam
+
+    # Add Students Taking Exams based on Input Data
+    for exam_id, student_id in instance.exams_to_students:
+        s.add(ExamStudent(exam_id, student_id))
+
+    # Constraint 1 and 2: Room and Time Assignments for Exams
+    s.add(
+        ForAll(
+            [exam],
+            Implies(
+                Exam_Range(exam),
+                Exists(
+                    [room, timeslot],
+                    And(
+                        Room_Range(room),
+                        TimeSlot_Range(timeslot),
+                        ExamTime(exam) == timeslot,
+                        ExamRoom(exam) == room,
+                        ForAll(
+                            [next_exam],
+                            Implies(
+                                Exam_Range(next_exam),
+                                Implies(
+                                    And(
+                                        ExamRoom(next_exam) == room,
+                                        ExamTime(next_exam) == timeslot
+                                    ),
+                                    exam == next_exam
+                                )
+                            )
+                        )
+                    )
+                )
+            )
+        )
+    )
+
+    # Constraint 3: Room Capacity
+    for ex in range(instance.number_of_exams):
+        for rm in range(instance.number_of_rooms):
+            s.add(Implies(ExamRoom(ex) == rm, instance.student_exam_capacity[ex] <= instance.room_capacities[rm]))
+
+    # Constraint 4: Non-overlapping Exams for Students
+    s.add(
+        ForAll([student, exam, next_exam, timeslot, next_timeslot],
+               Implies(
+                   And(
+                       Student_Range(student),
+                       Exam_Range(exam),
+                       Exam_Range(next_exam),
+                       TimeSlot_Range(timeslot),
+                       TimeSlot_Range(next_timeslot),
+                       exam != next_exam
+                   ),
+                   Implies(
+                       And(
+                           ExamTime(exam) == timeslot,
+                           ExamTime(next_exam) == next_timeslot,
+                           ExamStudent(exam, student),
+                           ExamStudent(next_exam, student)
+                       ),
+                       And(timeslot + 1 != next_timeslot, timeslot - 1 != next_timeslot, timeslot != next_timeslot)  # Ensure no adjacent time slots for same student
+                   )
+               )
+        )
+    )
+
+    exam_room = [ExamRoom(ex) for ex in range(instance.number_of_exams)]
+    exam_time = [ExamTime(ex) for ex in range(instance.number_of_exams)]
+    InvigilatorAssigned = add_invigilator_constraints(s, instance, exam_time)
+
+    # Add mappings for room capacities and student counts using Z3 functions
+    for rm in range(instance.number_of_rooms):
+        s.add(RoomCapacity(rm) == instance.room_capacities[rm])
+    for ex in range(instance.number_of_exams):
+        s.add(StudentCount(ex) == instance.student_exam_capacity[ex])
+
+    # Sort exams by the number of students in ascending order
+    sorted_exams = sorted(range(instance.number_of_exams), key=lambda ex: instance.student_exam_capacity[ex])
+
+    # Constraint 9: Optimal Room Allocation with Prioritization of Smallest Fit
+    for ex in sorted_exams:
+        s.add(
+            Exists([room],
+                And(
+                    Room_Range(room),
+                    ExamRoom(ex) == room,
+                    RoomCapacity(room) >= StudentCount(ex),
+                    # Ensure that no smaller room can also fit the exam
+                    ForAll([next_room],
+                            Implies(
+                                And(
+                                    Room_Range(next_room),
+                                    next_room != room,
+                                    RoomCapacity(next_room) >= StudentCount(ex)
+                                ),
+                                RoomCapacity(room) <= RoomCapacity(next_room)
+                            )
+                    )
+                )
+            )
+        )
+
+    if symmetry_breaking:
+        add_symmetry_breaking(s, instance, exam_room, exam_time, InvigilatorAssigned)
+
+    return s, exam_room, exam_time, InvigilatorAssigned
+
+def build_ground_model(instance, smallest_room=True, s=None, symmetry_breaking=False):
+    """
+    Quantifier-free encoding grounded over the finite exam, room and slot domains. With
+    smallest_room=False constraint 9 is left out and any room that fits is allowed;
+    s may be an Optimize to add the constraints to instead of a fresh Solver.
+    symmetry_breaking adds add_symmetry_breaking.
+    """
+    s = Solver() if s is None else s
+
+    # Bounded Int variables for the room and slot of every exam
+    exam_room = [Int(f"room_{e}") for e in range(instance.number_of_exams)]
+    exam_time = [Int(f"slot_{e}") for e in range(instance.number_of_exams)]
+
+    # Constraint 1 and 2: Room and Time Assignments for Exams (no two exams share a room and slot)
+    for e in range(instance.number_of_exams):
+        s.add(exam_room[e] >= 0, exam_room[e] < instance.number_of_rooms)
+        s.add(exam_time[e] >= 0, exam_time[e] < instance.number_of_slots)
+    if instance.number_of_exams > 1:
+        s.add(Distinct([exam_room[e] * instance.number_of_slots + exam_time[e] for e in range(instance.number_of_exams)]))
+
+    # Constraint 3 and 9: Room Capacity with Prioritization of Smallest Fit (domains pruned by presolve)
+    for e, domain in enumerate(room_domains(instance) if smallest_room else fitting_rooms(instance)):
+        s.add(Or([exam_room[e] == rm for rm in domain]) if domain else BoolVal(False))
+
+    # Constraint 4: Non-overlapping and non-adjacent slots, only for exams that share a student
+    for e1, e2 in instance.index.conflict_pairs:
+        s.add(Or(exam_time[e1] - exam_time[e2] > 1, exam_time[e2] - exam_time[e1] > 1))
+
+    InvigilatorAssigned = add_invigilator_constraints(s, instance, exam_time)
+
+    if symmetry_breaking:
+        add_symmetry_breaking(s, instance, exam_room, exam_time, InvigilatorAssigned, smallest_room)
+
+    return s, exam_room, exam_time, InvigilatorAssigned
+
+ENCODINGS = {
+    "ground": build_ground_model,
+    "quantified": build_quantified_model,
+}
+
+def extract_assignment(m, exam_room, exam_time, InvigilatorAssigned):
+    """
+    Reads the model once into flat arrays: exam -> room, exam -> slot and the boolean
+    (invigilator, exam) cover matrix. Each term is evaluated exactly once.
+    """
+    rooms = np.array([m.eval(room, model_completion=True).as_long() for room in exam_room], dtype=np.int32)
+    slots = np.array([m.eval(slot, model_completion=True).as_long() for slot in exam_time], dtype=np.int32)
+    covers = np.array(
+        [[is_true(m.eval(cell, model_completion=True)) for cell in row] for row in InvigilatorAssigned],
+        dtype=bool,
+    ).reshape(len(InvigilatorAssigned), len(exam_room))
+    return rooms, slots, covers
+
+def canonical_invigilators(instance, exam_invigilators):
+    """
+    Renames interchangeable invigilators in a list of each exam's invigilators so that
+    their cover rows are in the order add_symmetry_breaking keeps.
+    """
+    covers = np.zeros((instance.invigilators.size, len(exam_invigilators)), dtype=bool)
+    for e, invigilators in enumerate(exam_invigilators):
+        covers[list(invigilators), e] = True
+    for group in instance.invigilators.interchangeable():
+        covers[group] = sorted((covers[i].tolist() for i in group), reverse=True)
+    return [np.flatnonzero(column).tolist() for column in covers.T]
+
+def set_initial_values(s, instance, exam_room, exam_time, InvigilatorAssigned, construction):
+    """
+    Seeds the solver's phases with the exams a heuristic.Construction placed, its
+    invigilators renamed as by canonical_invigilators (the symmetry breaking would
+    otherwise contradict them).
+    """
+    exam_invigilators = canonical_invigilators(instance, construction.exam_invigilators)
+    for e in construction.placed().tolist():
+        s.set_initial_value(exam_room[e], int(construction.exam_room[e]))
+        s.set_initial_value(exam_time[e], int(construction.exam_slot[e]))
+        for i, row in enumerate(InvigilatorAssigned):
+            s.set_initial_value(row[e], i in exam_invigilators[e])
+
+def solve(instance, encoding="ground", cache=None, params=None, decompose=True, profile=None, heuristic=True, symmetry_breaking=False, budget=None):
+    """
+    Presolves, builds and checks the model, returning a ScheduleResult (see results.render_text
+    for the report). With a cache.ResultCache, a previously solved identical instance is
+    returned without solving. params are Z3 solver parameters such as {"random_seed": 1}.
+    With decompose, instances whose conflict graph splits into components are solved per
+    component first (see presolve.py) and the full model only when the merge fails.
+    With heuristic, the constructive heuristic runs first: a complete schedule is returned
+    as is, and a partial one seeds the solver's initial values (see heuristic.py).
+    symmetry_breaking adds add_symmetry_breaking to the model, which mostly helps UNSAT proofs.
+    profile ("cprofile" or "tracemalloc") attaches an instrumentation.profiled report.
+    budget, a budget.Budget, limits the solve (by default to the environment's limits); when
+    it runs out the result has status "timeout" or "memout".
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding}; expected one of {', '.join(ENCODINGS)}")
+    budget = start_budget(budget)
+    with profiled(profile) as report:
+        result = cached_solve(cache, instance, "z3", get_full_version(), encoding, lambda: _presolve_and_solve(instance, encoding, params, decompose, heuristic, symmetry_breaking, budget))
+    result.profile = report or None
+    return result
+
+def _solve_component(args):
+    instance, encoding, params, heuristic, symmetry_breaking, budget = args
+    return _presolve_and_solve(instance, encoding, params, False, heuristic, symmetry_breaking, budget)
+
+def _solve_components(instances, encoding, params, heuristic, symmetry_breaking, budget):
+    """Solves the component instances, in a process pool when allowed; stops at the first UNSAT one."""
+    workers = min(len(instances), os.cpu_count() or 1)
+    tasks = [(sub, encoding, params, heuristic, symmetry_breaking, budget) for sub in instances]
+    # Daemonic workers (the CLI and GUI batch pools) cannot start processes of their own
+    if workers < 2 or multiprocessing.current_process().daemon:
+        results = []
+        for task in tasks:
+            results.append(_solve_component(task))
+            if results[-1].status != "sat":
+                break
+        return results
+    with multiprocessing.Pool(workers) as pool:
+        results = []
+        for result in pool.imap(_solve_component, tasks):
+            results.append(result)
+            if result.status != "sat":
+                break
+        return results
+
+def _presolve_and_solve(instance, encoding, params=None, decompose=True, heuristic=True, symmetry_breaking=False, budget=None):
+    start_presolve = timer()
+    presolved = Presolve(instance)
+    timings = {"presolve": (timer() - start_presolve) * 1000}
+    if presolved.infeasible:
+        result = ScheduleResult(instance, "unsat", timings)
+        result.reason = presolved.reason
+        return result
+
+    construction = None
+    if heuristic:
+        start_heuristic = timer()
+        construction = construct(instance, presolved.room_domains)
+        timings["heuristic"] = (timer() - start_heuristic) * 1000
+        if construction.complete:
+            return construction.to_result(instance, timings)
+
+    if decompose and len(presolved.components) > 1:
+        start_components = timer()
+        results = _solve_components([sub_instance(instance, exams) for exams in presolved.components], encoding, params, heuristic, symmetry_breaking, budget)
+        timings["components"] = (timer() - start_components) * 1000
+        if results[-1].status != "sat":
+            # Each component alone is a relaxation of the instance
+            result = ScheduleResult(instance, results[-1].status, timings)
+            result.statistics = results[-1].statistics
+            result.reason = results[-1].reason
+            if results[-1].status == "unsat":
+                exams = presolved.components[len(results) - 1].tolist()
+                result.reason = results[-1].reason or f"Exams {', '.join(map(str, exams))} cannot be scheduled even on their own"
+            return result
+
+        start_merge = timer()
+        merged = merge_components(instance, presolved.room_domains, presolved.components, results)
+        timings["merge"] = (timer() - start_merge) * 1000
+        if merged is not None:
+            result = ScheduleResult(instance, "sat", timings)
+            result.exam_room, result.exam_slot, result.exam_invigilators = merged
+            result.number_of_invigilators = results[0].number_of_invigilators
+            result.statistics = combine_statistics(component.statistics for component in results)
+            return result
+
+    result = _solve(instance, encoding, params, construction, symmetry_breaking, budget)
+    result.timings = {**timings, **result.timings}
+    return result
+
+def _solve(instance, encoding, params=None, construction=None, symmetry_breaking=False, budget=None):
+    budget = start_budget(budget)
+    start_build = timer()
+    s, exam_room, exam_time, InvigilatorAssigned = ENCODINGS[encoding](instance, symmetry_breaking=symmetry_breaking)
+    for name, value in budget.z3_params(params).items():
+        s.set(name, value)
+    set_param("memory_max_size", budget.memory_mb or 0)
+    if construction is not None:
+        set_initial_values(s, instance, exam_room, exam_time, InvigilatorAssigned, construction)
+    start_check = timer()
+    status = s.check()
+    start_extract = timer()
+
+    result = ScheduleResult(instance, str(status), {})
+    if status == unknown:
+        result.status, result.reason = z3_outcome(budget, s.reason_unknown())
+    if status == sat:
+        m = s.model()  # Only get the model when satisfiable
+        result.exam_room, result.exam_slot, covers = extract_assignment(m, exam_room, exam_time, InvigilatorAssigned)
+        result.number_of_invigilators = len(InvigilatorAssigned)
+        result.exam_invigilators = [np.flatnonzero(column).tolist() for column in covers.T]
+    end_extract = timer()
+
+    result.statistics = z3_statistics(s)
+    result.timings = {
+        "build": (start_check - start_build) * 1000,
+        "check": (start_extract - start_check) * 1000,
+        "extract": (end_extract - start_extract) * 1000,
+    }
+    return result
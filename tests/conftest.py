@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from budget import ENVIRONMENT
+
+@pytest.fixture(autouse=True)
+def isolated_environment(monkeypatch, tmp_path):
+    """No budgets from the environment, and a throwaway cache for anything that uses the default one."""
+    for variable, _ in ENVIRONMENT.values():
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setenv("EXAM_SCHEDULER_CACHE_DIR", str(tmp_path / "cache"))
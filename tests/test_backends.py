@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from alternative_solution import solve_with_or_tools
+from instance import read_file
+from solver import solve
+from verify import verify
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+NAMES = sorted(os.path.splitext(name)[0] for name in os.listdir(FIXTURES) if name.endswith(".txt"))
+
+# sat7 only has schedules that leave an exam out of its smallest fitting room (constraint 9)
+EXPECTED = {name: "unsat" if name.startswith("unsat") or name == "sat7" else "sat" for name in NAMES}
+
+def _check(instance, result, name):
+    assert result.status == EXPECTED[name]
+    if result.satisfied:
+        assert verify(instance, result) == []
+
+@pytest.mark.parametrize("heuristic", [True, False])
+@pytest.mark.parametrize("name", NAMES)
+def test_z3_ground(name, heuristic):
+    instance = read_file(os.path.join(FIXTURES, f"{name}.txt"))
+    _check(instance, solve(instance, heuristic=heuristic), name)
+
+@pytest.mark.parametrize("name", NAMES)
+def test_z3_quantified(name):
+    instance = read_file(os.path.join(FIXTURES, f"{name}.txt"))
+    _check(instance, solve(instance, "quantified", heuristic=False), name)
+
+@pytest.mark.parametrize("heuristic", [True, False])
+@pytest.mark.parametrize("name", NAMES)
+def test_ortools_smallest_room(name, heuristic):
+    instance = read_file(os.path.join(FIXTURES, f"{name}.txt"))
+    _check(instance, solve_with_or_tools(instance, smallest_room=True, heuristic=heuristic), name)
+
+def test_ortools_without_smallest_room_schedules_sat7():
+    instance = read_file(os.path.join(FIXTURES, "sat7.txt"))
+    result = solve_with_or_tools(instance, heuristic=False)
+    assert result.status == "sat"
+    assert verify(instance, result, smallest_room=False) == []
+    assert any(violation["constraint"] == "smallest-room" for violation in verify(instance, result))
+
+@pytest.mark.parametrize("symmetry_breaking", [True, False])
+def test_decomposed_solve_matches_whole_model(symmetry_breaking):
+    from generator import generate
+    instance = generate(students=12, exams=10, slots=6, rooms=3, density=0.1, mode="sat", seed=3)
+    whole = solve(instance, decompose=False, heuristic=False, symmetry_breaking=symmetry_breaking)
+    merged = solve(instance, heuristic=False, symmetry_breaking=symmetry_breaking)
+    assert whole.status == merged.status == "sat"
+    assert verify(instance, merged) == []
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import cache
+from cache import ResultCache, cached_solve
+from generator import generate
+from results import ScheduleResult
+from solver import solve
+
+@pytest.fixture
+def instance():
+    return generate(students=10, exams=5, slots=8, rooms=2, mode="sat", seed=4)
+
+def _solve_counting(instance, calls):
+    def solve_function():
+        calls.append(1)
+        return solve(instance, heuristic=False)
+    return solve_function
+
+def test_hit_after_miss(instance, tmp_path):
+    results, calls = ResultCache(str(tmp_path)), []
+    first = cached_solve(results, instance, "z3", "test", "ground", _solve_counting(instance, calls))
+    second = cached_solve(results, instance, "z3", "test", "ground", _solve_counting(instance, calls))
+    assert len(calls) == 1
+    assert not first.cached and second.cached
+    assert list(second.timings) == ["lookup"]
+    assert second.status == first.status == "sat"
+    assert np.array_equal(second.exam_slot, first.exam_slot)
+    assert second.exam_invigilators == first.exam_invigilators
+
+def test_changed_constraint_config_misses(instance, tmp_path, monkeypatch):
+    results, calls = ResultCache(str(tmp_path)), []
+    key = results.key(instance, "z3", "test", "ground")
+    cached_solve(results, instance, "z3", "test", "ground", _solve_counting(instance, calls))
+    monkeypatch.setattr(cache, "CONSTRAINT_CONFIG", {**cache.CONSTRAINT_CONFIG, "slot_gap": 2})
+    assert results.key(instance, "z3", "test", "ground") != key
+    cached_solve(results, instance, "z3", "test", "ground", _solve_counting(instance, calls))
+    assert len(calls) == 2
+
+def test_key_depends_on_backend_and_encoding_but_not_row_order(instance, tmp_path):
+    results = ResultCache(str(tmp_path))
+    key = results.key(instance, "z3", "test", "ground")
+    assert key != results.key(instance, "z3", "test", "quantified")
+    assert key != results.key(instance, "ortools", "test", "ground")
+    order = np.arange(len(instance.exam_ids))[::-1]
+    instance.exam_ids, instance.student_ids = instance.exam_ids[order], instance.student_ids[order]
+    assert results.key(instance, "z3", "test", "ground") == key
+
+def test_undecided_results_are_not_stored(instance, tmp_path):
+    results = ResultCache(str(tmp_path))
+    key = results.key(instance, "z3", "test", "ground")
+    results.put(key, ScheduleResult(instance, "timeout", {}))
+    assert results.get(key, instance) is None
+
+def test_eviction_keeps_the_cache_under_max_bytes(instance, tmp_path):
+    results = ResultCache(str(tmp_path), max_bytes=1)
+    result = solve(instance, heuristic=False)
+    for encoding in ("ground", "quantified"):
+        results.put(results.key(instance, "z3", "test", encoding), result)
+    assert not list(tmp_path.glob("*.json"))
@@ -0,0 +1,42 @@
+import os
+import time
+
+from diagnose import explain, unsat_core
+from generator import generate
+from instance import InvigilatorPool, read_file
+from solver import solve
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+
+def test_core_of_sat7_is_minimal():
+    instance = read_file(os.path.join(FIXTURES, "sat7.txt"))
+    result = explain(instance, solve(instance))
+    assert result.status == "unsat" and result.core_minimal
+    families = {item["constraint"] for item in result.core}
+    assert {"room", "student"} <= families
+    assert all(item["description"] for item in result.core)
+
+def test_invigilator_shortage_is_named():
+    # Two exams in slots far apart, but a single invigilator that may only cover one exam
+    instance = generate(students=2, exams=2, slots=5, rooms=2, density=0.0, seed=0, pool=InvigilatorPool(size=1, max_exams=1))
+    result = solve(instance, heuristic=False)
+    assert result.status == "unsat"
+    core, minimal = unsat_core(instance)
+    assert minimal
+    assert {item["constraint"] for item in core} >= {"invigilator"}
+
+def test_presolve_reasons_are_not_rediagnosed():
+    instance = generate(students=200, exams=100, slots=50, rooms=3, mode="unsat", seed=1)
+    result = solve(instance)
+    assert result.status == "unsat" and result.reason
+    start = time.monotonic()
+    explain(instance, result)
+    assert time.monotonic() - start < 0.1
+    assert not result.core and "core" not in result.timings
+
+def test_core_search_keeps_to_its_time_limit():
+    instance = generate(students=30, exams=30, slots=3, rooms=14, mode="pigeonhole")
+    start = time.monotonic()
+    core, minimal = unsat_core(instance, time_limit=1.0)
+    assert time.monotonic() - start < 3.0
+    assert not minimal or core
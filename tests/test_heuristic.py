@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from generator import generate
+from heuristic import construct
+from instance import InvigilatorPool
+from presolve import Presolve
+from verify import verify
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+
+@pytest.mark.parametrize("seed", range(5))
+def test_complete_construction_is_valid(seed):
+    instance = generate(students=40, exams=20, slots=30, rooms=4, density=0.1, mode="sat", seed=seed, pool=InvigilatorPool(size=40))
+    construction = construct(instance)
+    assert construction.complete and construction.reason is None
+    assert verify(instance, construction.to_result(instance, {})) == []
+
+def test_incomplete_construction_explains_itself():
+    instance = generate(students=30, exams=30, slots=3, rooms=14, mode="pigeonhole")
+    construction = construct(instance)
+    assert not construction.complete
+    assert construction.reason.startswith(f"Exam {construction.stuck[0][0]}:")
+    assert len(construction.placed()) + len(construction.stuck) == instance.number_of_exams
+
+def test_presolve_rejects_an_exam_too_large_for_every_room():
+    from instance import read_file
+    presolved = Presolve(read_file(os.path.join(FIXTURES, "unsat1.txt")))
+    assert presolved.infeasible
+    assert "largest room" in presolved.reason
+    assert presolved.components == []
+
+def test_presolve_splits_independent_exams():
+    instance = generate(students=12, exams=10, slots=6, rooms=3, density=0.1, mode="sat", seed=3)
+    components = Presolve(instance).components
+    assert len(components) > 1
+    assert sorted(e for component in components for e in component) == list(range(instance.number_of_exams))
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from generator import generate
+from instance import InvigilatorPool, _parse_enrolments, is_binary, read_bytes, read_file, write_file
+
+def _fields(instance):
+    return {
+        "header": (instance.number_of_students, instance.number_of_exams, instance.number_of_slots, instance.number_of_rooms),
+        "rooms": list(instance.room_capacities),
+        "pool": instance.invigilators.to_dict(),
+        "enrolments": sorted(zip(instance.exam_ids.tolist(), instance.student_ids.tolist())),
+        "sizes": list(instance.student_exam_capacity),
+    }
+
+@pytest.fixture
+def instance():
+    pool = InvigilatorPool(size=6, max_exams=3, limits={2: 1}, unavailable={4: [0, 2]})
+    return generate(students=15, exams=7, slots=9, rooms=3, mode="sat", seed=2, pool=pool)
+
+def test_text_round_trip(instance, tmp_path):
+    path = str(tmp_path / "instance.txt")
+    write_file(instance, path)
+    assert not is_binary(path)
+    assert _fields(read_file(path)) == _fields(instance)
+
+def test_binary_round_trip(instance, tmp_path):
+    binary = str(tmp_path / "instance.bin")
+    write_file(instance, binary)
+    assert is_binary(binary)
+    loaded = read_file(binary)
+    assert _fields(loaded) == _fields(instance)
+    assert loaded.index.conflict_pairs == instance.index.conflict_pairs
+
+    # And back to text, through the binary copy
+    text = str(tmp_path / "again.txt")
+    write_file(loaded, text)
+    assert _fields(read_file(text)) == _fields(instance)
+
+def test_read_bytes_matches_read_file(instance, tmp_path):
+    for name in ("instance.txt", "instance.bin"):
+        path = tmp_path / name
+        write_file(instance, str(path))
+        assert _fields(read_bytes(path.read_bytes())) == _fields(instance)
+
+def test_read_bytes_checks_binary_ids(instance, tmp_path):
+    path = tmp_path / "instance.bin"
+    write_file(instance, str(path))
+    corrupt = bytearray(path.read_bytes())
+    corrupt[-4:] = (10**6).to_bytes(4, "little", signed=True)  # The last student id
+    with pytest.raises(ValueError, match="Student ids"):
+        read_bytes(bytes(corrupt))
+    with pytest.raises(ValueError, match="truncated"):
+        read_bytes(bytes(corrupt[:-4]))
+
+def test_read_file_checks_binary_ids(instance, tmp_path):
+    path = tmp_path / "instance.bin"
+    write_file(instance, str(path))
+    corrupt = bytearray(path.read_bytes())
+    first = len(corrupt) - 8 * len(instance.exam_ids)
+    corrupt[first:first + 4] = (-1).to_bytes(4, "little", signed=True)  # The first exam id
+    path.write_bytes(bytes(corrupt))
+    with pytest.raises(ValueError, match="Exam ids"):
+        read_file(str(path))
+
+def test_parse_enrolments():
+    exams, students = _parse_enrolments(b"0 1\n  2\t3 \r\n4 5")
+    assert exams.tolist() == [0, 2, 4]
+    assert students.tolist() == [1, 3, 5]
+
+def test_parse_empty_body():
+    exams, students = _parse_enrolments(b"")
+    assert len(exams) == len(students) == 0
+
+@pytest.mark.parametrize("body, line", [
+    (b"0 1\n2\n3 4\n", "2"),
+    (b"0 1\n2 3 4\n", "2 3 4"),
+    (b"0 x\n", "0 x"),
+    (b"0 1\n-1 2\n", "-1 2"),
+    (b"0 1\n\n2 3\n", ""),
+    (b"0 1.5\n", "0 1.5"),
+])
+def test_parse_enrolments_rejects_malformed_lines(body, line):
+    with pytest.raises(ValueError, match="Failed to parse this line") as error:
+        _parse_enrolments(body)
+    assert str(error.value).rstrip("\n").endswith(line)
+
+def test_read_file_rejects_out_of_range_ids(tmp_path):
+    path = tmp_path / "instance.txt"
+    header = "Number of students: 2\nNumber of exams: 1\nNumber of slots: 1\nNumber of rooms: 1\nRoom 0 capacity: 2\n"
+    path.write_text(header + "1 0\n")
+    with pytest.raises(ValueError, match="Exam 1 is out of range"):
+        read_file(str(path))
+    path.write_text(header + "0 2\n")
+    with pytest.raises(ValueError, match="Student 2 is out of range"):
+        read_file(str(path))
+
+def test_read_file_rejects_a_bad_header(tmp_path):
+    path = tmp_path / "instance.txt"
+    path.write_text("Number of students: 2\nNumber of exams: many\n")
+    with pytest.raises(ValueError, match="Number of exams"):
+        read_file(str(path))
+
+def test_enrolment_edits_update_the_index():
+    instance = generate(students=6, exams=3, slots=5, rooms=2, density=0.0, seed=0)
+    instance.add_enrolment(0, 5)
+    instance.add_enrolment(1, 5)
+    assert (0, 1) in instance.index.conflict_pairs
+    instance.remove_enrolment(1, 5)
+    assert (0, 1) not in instance.index.conflict_pairs
+    with pytest.raises(ValueError):
+        instance.remove_enrolment(1, 5)
@@ -0,0 +1,21 @@
+from generator import generate
+from heuristic import construct
+from instance import InvigilatorPool
+from lns import lns
+from optimize import objective_values
+from verify import verify
+
+def test_search_improves_on_the_heuristic():
+    instance = generate(students=60, exams=30, slots=12, rooms=6, density=0.05, mode="sat", seed=3, pool=InvigilatorPool(40, 2))
+    start = construct(instance).to_result(instance, {})
+    result = lns(instance, time_limit=3, workers=1, patience=10)
+    assert result.status == "sat" and not result.optimal
+    assert verify(instance, result, smallest_room=False) == []
+    assert result.objective == objective_values(instance, result)
+    assert result.objective["total"] <= objective_values(instance, start)["total"]
+
+def test_an_incomplete_schedule_names_its_unplaced_exams():
+    instance = generate(students=30, exams=30, slots=3, rooms=14, mode="pigeonhole")
+    result = lns(instance, time_limit=10, workers=1, patience=5)
+    assert result.status == "unknown" and result.statistics["improvements"] == 0
+    assert "exams are still unplaced" in result.reason
@@ -0,0 +1,31 @@
+import os
+
+from generator import generate
+from instance import read_file
+from optimize import objective_values, optimize
+from solver import solve
+from verify import verify
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+
+def test_soft_smallest_room_makes_sat7_feasible():
+    instance = read_file(os.path.join(FIXTURES, "sat7.txt"))
+    assert solve(instance).status == "unsat"
+    result = optimize(instance, time_limit=30)
+    assert result.status == "sat"
+    assert verify(instance, result, smallest_room=False) == []
+    assert result.objective == objective_values(instance, result)
+
+def test_backends_agree_on_the_optimum():
+    instance = generate(students=10, exams=5, slots=8, rooms=3, density=0.3, mode="sat", seed=2)
+    results = {backend: optimize(instance, time_limit=60, backend=backend) for backend in ("cp-sat", "z3")}
+    assert all(result.status == "sat" and result.optimal for result in results.values())
+    assert results["cp-sat"].objective["total"] == results["z3"].objective["total"]
+    for result in results.values():
+        assert verify(instance, result, smallest_room=False) == []
+
+def test_improving_schedules_are_reported_in_order():
+    instance = generate(students=10, exams=5, slots=8, rooms=3, density=0.3, mode="sat", seed=2)
+    totals = []
+    optimize(instance, time_limit=30, on_solution=lambda result: totals.append(result.objective["total"]))
+    assert totals and totals == sorted(totals, reverse=True) and len(set(totals)) == len(totals)
@@ -0,0 +1,103 @@
+import asyncio
+import base64
+import json
+import os
+
+import pytest
+
+from service import SolverService, parse_submission, serve
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+
+def _sat1():
+    with open(os.path.join(FIXTURES, "sat1.txt"), encoding="utf-8") as f:
+        return f.read()
+
+def _run_with_service(tmp_path, scenario):
+    """Runs scenario(request) against a one-worker service on a Unix socket; request returns (status, body)."""
+    socket = str(tmp_path / "service.sock")
+
+    async def request(method, path, data=None):
+        reader, writer = await asyncio.open_unix_connection(socket)
+        body = b"" if data is None else data if isinstance(data, bytes) else json.dumps(data).encode()
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, content = response.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        lines = [json.loads(line) for line in content.splitlines() if line]
+        return status, lines[0] if len(lines) == 1 else lines
+
+    async def main():
+        ready = asyncio.Event()
+        server = asyncio.create_task(serve(unix=socket, workers=1, use_cache=False, ready=lambda _: ready.set()))
+        await asyncio.wait_for(ready.wait(), 30)
+        try:
+            return await scenario(request)
+        finally:
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    return asyncio.run(main())
+
+def test_identical_submissions_share_a_job(tmp_path):
+    async def scenario(request):
+        status, first = await request("POST", "/jobs", {"instance": _sat1()})
+        assert status == 202 and first["duplicate"] is False
+        status, second = await request("POST", "/jobs", {"instance": _sat1(), "priority": 5})
+        assert status == 202 and second["duplicate"] is True and second["id"] == first["id"]
+        status, other = await request("POST", "/jobs", {"instance": _sat1(), "backend": "ortools"})
+        assert other["duplicate"] is False and other["id"] != first["id"]
+
+        status, events = await asyncio.wait_for(request("GET", f"/jobs/{first['id']}/events"), 60)
+        assert events[0]["event"] == "queued" and events[-1]["event"] == "done"
+        assert events[-1]["result"]["status"] == "sat"
+        status, job = await request("GET", f"/jobs/{first['id']}")
+        assert status == 200 and job["state"] == "done"
+
+        # Once done, the same submission is a new job
+        status, again = await request("POST", "/jobs", {"instance": _sat1()})
+        assert again["duplicate"] is False and again["id"] != first["id"]
+
+    _run_with_service(tmp_path, scenario)
+
+def test_invalid_requests_are_rejected(tmp_path):
+    async def scenario(request):
+        for body in (
+            {"instance": _sat1(), "backend": "simplex"},
+            {"instance": _sat1(), "timeout": -1},
+            {"instance": _sat1(), "timeout": True},
+            {"instance": _sat1(), "rlimit": "many"},
+            {"instance": _sat1(), "memory_mb": 1.5},
+            {"instance": _sat1(), "priority": "high"},
+            {"backend": "ground"},
+            b"not json",
+        ):
+            status, response = await request("POST", "/jobs", body)
+            assert status == 400 and response["error"]
+        assert (await request("GET", "/jobs/42"))[0] == 404
+        assert (await request("GET", "/nowhere"))[0] == 404
+        status, job = await request("POST", "/jobs", {"instance": "not an instance"})
+        assert (await request("PUT", f"/jobs/{job['id']}"))[0] == 405
+        status, events = await asyncio.wait_for(request("GET", f"/jobs/{job['id']}/events"), 60)
+        assert events[-1]["result"]["status"] == "error"
+        status, service = await request("GET", "/status")
+        assert status == 200 and service["workers"] == 1
+
+    _run_with_service(tmp_path, scenario)
+
+def test_a_duplicate_raises_the_priority_of_the_queued_job():
+    service = SolverService(workers=1)  # Not started: jobs stay queued
+    payload, options, _ = parse_submission(json.dumps({"instance": _sat1()}).encode())
+    job, duplicate = service.submit(payload, options, 0)
+    same, duplicate = service.submit(payload, options, 3)
+    assert same is job and duplicate and job.priority == 3
+    lower, duplicate = service.submit(payload, options, 1)
+    assert lower is job and duplicate and job.priority == 3
+
+def test_parse_submission_reads_base64_instances():
+    payload, options, priority = parse_submission(json.dumps({"instance_base64": base64.b64encode(b"data").decode(), "priority": 2}).encode())
+    assert payload == b"data" and priority == 2 and options["backend"] == "ground"
+    with pytest.raises(ValueError):
+        parse_submission(b'{"instance_base64": "***"}')
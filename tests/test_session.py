@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+from budget import Budget
+from generator import generate
+from instance import InvigilatorPool, read_file
+from session import SchedulerSession
+from verify import verify
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test instances")
+
+def test_edits_are_resolved_incrementally():
+    instance = generate(students=20, exams=8, slots=12, rooms=3, density=0.3, mode="sat", seed=1)
+    session = SchedulerSession(instance)
+    result, changes = session.resolve()
+    assert result.status == "sat" and len(changes) == instance.number_of_exams
+    assert verify(instance, result) == []
+
+    slot = int(result.exam_slot[0])
+    session.block_slot(slot)
+    result, changes = session.resolve()
+    assert result.status == "sat"
+    assert slot not in result.exam_slot.tolist()
+    assert all(exam_slot != slot for _, exam_slot, _ in changes.values())
+
+    session.unblock_slot(slot)
+    session.pin_exam(0, slot=slot)
+    result, _ = session.resolve()
+    assert result.status == "sat" and int(result.exam_slot[0]) == slot
+    assert verify(instance, result) == []
+
+def test_an_edit_can_make_the_session_unsat_and_back():
+    session = SchedulerSession(read_file(os.path.join(FIXTURES, "sat1.txt")))
+    assert session.resolve()[0].status == "sat"
+    session.block_slot(0)
+    assert session.resolve()[0].status == "unsat"
+    session.unblock_slot(0)
+    assert session.resolve()[0].status == "sat"
+
+def test_resolve_stops_at_its_budget():
+    session = SchedulerSession(generate(students=30, exams=30, slots=3, rooms=14, mode="pigeonhole"))
+    result, changes = session.resolve(Budget(rlimit=100000))
+    assert result.status == "timeout" and changes == {}
+    assert "Resource limit" in result.reason
+
+def test_edits_only_move_the_exams_they_force_to():
+    instance = generate(students=60, exams=30, slots=12, rooms=6, density=0.05, mode="sat", seed=3, pool=InvigilatorPool(40, 2))
+    session = SchedulerSession(instance)
+    first, _ = session.resolve(Budget(time_limit=60))
+    assert first.status == "sat"
+
+    slot = int(first.exam_slot[0])
+    in_slot = set(np.flatnonzero(first.exam_slot == slot).tolist())
+    session.block_slot(slot)
+    result, changes = session.resolve(Budget(time_limit=60))
+    assert result.status == "sat" and verify(instance, result) == []
+    assert in_slot <= set(changes) and len(changes) <= 2 * len(in_slot)
+    assert result.statistics["relaxed"] <= 2 * len(in_slot)
+
+    # Nothing forces a move back, so the unblocked slot stays empty
+    session.unblock_slot(slot)
+    result, changes = session.resolve(Budget(time_limit=60))
+    assert result.status == "sat" and changes == {}
+
+    # Pinning an exam to where it already is changes nothing
+    session.pin_exam(1, slot=int(result.exam_slot[1]))
+    assert session.resolve(Budget(time_limit=60))[1] == {}
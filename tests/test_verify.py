@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from generator import generate
+from results import ScheduleResult
+from solver import solve
+from verify import verify
+
+@pytest.fixture(scope="module")
+def solved():
+    instance = generate(students=20, exams=8, slots=12, rooms=3, density=0.3, mode="sat", seed=1)
+    result = solve(instance, heuristic=False)
+    assert result.status == "sat"
+    return instance, result
+
+def _constraints(instance, result):
+    return {violation["constraint"] for violation in verify(instance, result)}
+
+def _copy(instance, result):
+    copy = ScheduleResult(instance, "sat", {})
+    copy.exam_room = result.exam_room.copy()
+    copy.exam_slot = result.exam_slot.copy()
+    copy.exam_invigilators = [list(invigilators) for invigilators in result.exam_invigilators]
+    copy.number_of_invigilators = result.number_of_invigilators
+    return copy
+
+def test_accepts_solver_output(solved):
+    assert verify(*solved) == []
+
+def test_rejects_shared_room_and_slot(solved):
+    instance, result = solved
+    mutated = _copy(instance, result)
+    e2 = next(e for e in range(1, instance.number_of_exams) if (0, e) not in set(instance.index.conflict_pairs))
+    mutated.exam_room[e2], mutated.exam_slot[e2] = mutated.exam_room[0], mutated.exam_slot[0]
+    assert "room-slot" in _constraints(instance, mutated)
+
+def test_rejects_conflicting_exams_in_adjacent_slots(solved):
+    instance, result = solved
+    mutated = _copy(instance, result)
+    e1, e2 = instance.index.conflict_pairs[0]
+    mutated.exam_slot[e2] = mutated.exam_slot[e1] + (1 if mutated.exam_slot[e1] + 1 < instance.number_of_slots else -1)
+    assert "student-gap" in _constraints(instance, mutated)
+
+def test_rejects_missing_invigilator(solved):
+    instance, result = solved
+    mutated = _copy(instance, result)
+    mutated.exam_invigilators[0] = mutated.exam_invigilators[0][1:]
+    assert "invigilator-count" in _constraints(instance, mutated)
+
+def test_rejects_unplaced_exam(solved):
+    instance, result = solved
+    mutated = _copy(instance, result)
+    mutated.exam_slot[0] = -1
+    assert "assignment" in _constraints(instance, mutated)
+
+def test_only_verifies_sat_results(solved):
+    instance, _ = solved
+    with pytest.raises(ValueError):
+        verify(instance, ScheduleResult(instance, "unsat", {}))
@@ -0,0 +1,215 @@
+"""
+Independent checker for reported timetables, and a differential tester for the backends.
+
+verify re-checks a SAT result against constraints 1-9 with array operations only, in
+O(enrolments + exams x slots) time apart from sorting, and never looks at a solver model:
+
+    violations = verify(instance, result)
+    for violation in violations:
+        print(violation["description"])
+
+Each violation is a dict with "constraint" (a key of CONSTRAINTS), "entity" (exam,
+student, invigilator or slot), "id" and "description"; an empty list means the schedule
+is valid. Pass smallest_room=False for optimize.optimize results, which may use any
+room that fits.
+
+The differential tester solves generated instances with every backend of BACKENDS,
+verifies every SAT answer and flags instances where the backends disagree:
+
+    python verify.py --exams 4,6,8 --modes random,sat,unsat --seeds 20
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from backends import load_backend
+from budget import Budget
+from generator import GENERATOR_MODES, generate
+
+CONSTRAINTS = {
+    "assignment": "Constraint 1: every exam has a room and a slot",
+    "room-slot": "Constraint 2: no two exams share a room and slot",
+    "capacity": "Constraint 3: the room holds the exam's students",
+    "student-gap": "Constraint 4: a student's exams are at least two slots apart",
+    "invigilator-count": "Constraint 5: the exam has as many invigilators as its size needs",
+    "invigilator-slot": "Constraint 6: no invigilator has two exams in a slot and no slot needs more than the pool",
+    "invigilator-limit": "Constraint 7: no invigilator covers more than its limit",
+    "invigilator-gap": "Constraint 8: no invigilator covers consecutive slots",
+    "availability": "No invigilator covers a slot it is unavailable in",
+    "smallest-room": "Constraint 9: the exam uses the smallest room that fits",
+}
+
+# Cold solves, so that both backends really search; CP-SAT decides the same problem as Z3.
+# Loaded on first use (see backends.py), so that verify itself needs neither solver
+BACKENDS = {
+    "z3": lambda instance, timeout: load_backend("z3")(instance, heuristic=False, budget=Budget(time_limit=timeout)),
+    "ortools": lambda instance, timeout: load_backend("ortools")(instance, smallest_room=True, heuristic=False, budget=Budget(time_limit=timeout)),
+}
+
+def _violation(constraint, entity, id, description):
+    return {"constraint": constraint, "entity": entity, "id": id, "description": description}
+
+def _adjacent_pairs(groups, slots, items):
+    """Sorted by group then slot: (group, item, next item, slot gap) for neighbours in the same group."""
+    order = np.lexsort((slots, groups))
+    groups, slots, items = groups[order], slots[order], items[order]
+    same = groups[1:] == groups[:-1]
+    return groups[1:][same], items[:-1][same], items[1:][same], (slots[1:] - slots[:-1])[same]
+
+def verify(instance, result, smallest_room=True):
+    """The violations of constraints 1-9 (see CONSTRAINTS) by a SAT result; empty when it is valid."""
+    if result.status != "sat":
+        raise ValueError(f"Only SAT results can be verified, not {result.status}")
+    violations = []
+    exams = instance.number_of_exams
+    slots = instance.number_of_slots
+    capacities = np.asarray(instance.room_capacities, dtype=np.int64)
+    students = np.asarray(instance.student_exam_capacity, dtype=np.int64)
+    exam_room = np.asarray(result.exam_room, dtype=np.int64)
+    exam_slot = np.asarray(result.exam_slot, dtype=np.int64)
+
+    # Constraint 1
+    if len(exam_room) != exams or len(exam_slot) != exams or len(result.exam_invigilators) != exams:
+        return [_violation("assignment", "exam", None, f"The result assigns {len(exam_slot)} exams but the instance has {exams}")]
+    unassigned = (exam_room < 0) | (exam_room >= instance.number_of_rooms) | (exam_slot < 0) | (exam_slot >= slots)
+    for e in np.flatnonzero(unassigned).tolist():
+        violations.append(_violation("assignment", "exam", e, f"Exam {e} has room {exam_room[e]} and slot {exam_slot[e]}, outside the instance"))
+    if unassigned.any():
+        return violations
+
+    # Constraint 2
+    cells = exam_room * slots + exam_slot
+    order = np.argsort(cells, kind="stable")
+    shared = cells[order[1:]] == cells[order[:-1]]
+    for first, second in zip(order[:-1][shared].tolist(), order[1:][shared].tolist()):
+        violations.append(_violation("room-slot", "exam", second, f"Exams {first} and {second} share room {exam_room[first]} in slot {exam_slot[first]}"))
+
+    # Constraint 3 and 9
+    held = capacities[exam_room]
+    for e in np.flatnonzero(held < students).tolist():
+        violations.append(_violation("capacity", "exam", e, f"Exam {e} has {students[e]} students but room {exam_room[e]} holds {held[e]}"))
+    if smallest_room:
+        ascending = np.sort(capacities)
+        fits = np.searchsorted(ascending, students)  # Index of the smallest capacity >= students
+        smallest = ascending[np.minimum(fits, len(ascending) - 1)]
+        for e in np.flatnonzero((fits < len(ascending)) & (held > smallest)).tolist():
+            violations.append(_violation("smallest-room", "exam", e, f"Exam {e} uses room {exam_room[e]} of capacity {held[e]} but one of {smallest[e]} fits"))
+
+    # Constraint 4, on distinct (student, exam) enrolments
+    keys = np.unique(instance.student_ids.astype(np.int64) * max(exams, 1) + instance.exam_ids)
+    enrolled_student, enrolled_exam = np.divmod(keys, max(exams, 1))
+    for student, e1, e2, gap in zip(*(column.tolist() for column in _adjacent_pairs(enrolled_student, exam_slot[enrolled_exam], enrolled_exam))):
+        if gap <= 1:
+            violations.append(_violation("student-gap", "student", student, f"Student {student} has exams {e1} and {e2} in slots {exam_slot[e1]} and {exam_slot[e2]}"))
+
+    # Constraint 5
+    pool = instance.invigilators
+    lengths = np.array([len(invigilators) for invigilators in result.exam_invigilators], dtype=np.int64)
+    duty_invigilator = np.array([i for invigilators in result.exam_invigilators for i in invigilators], dtype=np.int64)
+    duty_exam = np.repeat(np.arange(exams), lengths)
+    needed = np.where(students <= 10, 1, np.where(students <= 20, 2, 3))
+    outside = (duty_invigilator < 0) | (duty_invigilator >= pool.size)
+    for e, i in zip(duty_exam[outside].tolist(), duty_invigilator[outside].tolist()):
+        violations.append(_violation("invigilator-count", "exam", e, f"Exam {e} has invigilator {i}, outside the pool of {pool.size}"))
+    # An invigilator listed twice for one exam counts once here and in the checks below
+    duty_exam, duty_invigilator = np.divmod(np.unique(duty_exam[~outside] * max(pool.size, 1) + duty_invigilator[~outside]), max(pool.size, 1))
+    distinct = np.bincount(duty_exam, minlength=exams)
+    for e in np.flatnonzero((distinct != needed) | (lengths != distinct)).tolist():
+        violations.append(_violation("invigilator-count", "exam", e, f"Exam {e} needs {needed[e]} invigilators but has {result.exam_invigilators[e]}"))
+    duty_slot = exam_slot[duty_exam]
+
+    # Constraint 6
+    for slot in np.flatnonzero(np.bincount(duty_slot, minlength=slots) > pool.size).tolist():
+        violations.append(_violation("invigilator-slot", "slot", slot, f"Slot {slot} needs more invigilators than the pool of {pool.size}"))
+
+    # Constraint 7
+    limits = np.array([pool.max_exams_of(i) for i in range(pool.size)], dtype=np.int64)
+    load = np.bincount(duty_invigilator, minlength=pool.size)
+    for i in np.flatnonzero(load > limits).tolist():
+        violations.append(_violation("invigilator-limit", "invigilator", i, f"Invigilator {i} covers {load[i]} exams but may cover {limits[i]}"))
+
+    # Constraint 6 and 8 per invigilator: neighbouring duties in slot order are at least two apart
+    for i, e1, e2, gap in zip(*(column.tolist() for column in _adjacent_pairs(duty_invigilator, duty_slot, duty_exam))):
+        if gap == 0:
+            violations.append(_violation("invigilator-slot", "invigilator", i, f"Invigilator {i} covers exams {e1} and {e2} in slot {exam_slot[e1]}"))
+        elif gap == 1:
+            violations.append(_violation("invigilator-gap", "invigilator", i, f"Invigilator {i} covers exams {e1} and {e2} in consecutive slots {exam_slot[e1]} and {exam_slot[e2]}"))
+
+    # Availability
+    unavailable = np.zeros((pool.size, slots), dtype=bool)
+    for i in range(pool.size):
+        unavailable[i, [t for t in pool.unavailable_slots(i) if t < slots]] = True
+    blocked = unavailable[duty_invigilator, duty_slot]
+    for i, e in zip(duty_invigilator[blocked].tolist(), duty_exam[blocked].tolist()):
+        violations.append(_violation("availability", "invigilator", i, f"Invigilator {i} covers exam {e} in slot {exam_slot[e]}, when it is unavailable"))
+    return violations
+
+def differential(cases, backends=None, timeout=None):
+    """
+    Solves each generated case (see benchmark.sweep) with every backend and yields one record
+    per case: the statuses, the violations of each SAT result and whether anything is wrong.
+    Backends disagree when one says sat and another unsat, or either contradicts the
+    expected status; answers other than sat and unsat (a budget ran out) are not compared.
+    """
+    backends = backends or list(BACKENDS)
+    for case in cases:
+        try:
+            instance = generate(**case["params"])
+        except ValueError as e:
+            yield {"name": case["name"], "skipped": str(e), "flagged": False}
+            continue
+        instance.build_index()
+        record = {"name": case["name"], "expected": case["expected"], "statuses": {}, "violations": {}}
+        for backend in backends:
+            result = BACKENDS[backend](instance, timeout)
+            record["statuses"][backend] = result.status
+            if result.satisfied:
+                record["violations"][backend] = verify(instance, result)
+        # The sat and unsat generator modes know the answer up front
+        decided = {status for status in record["statuses"].values() if status in ("sat", "unsat")}
+        if case["expected"] is not None:
+            decided.add(case["expected"])
+        record["flagged"] = len(decided) > 1 or any(record["violations"].values())
+        yield record
+
+def _format(record):
+    if "skipped" in record:
+        return f"{record['name']:<20} skipped: {record['skipped']}"
+    statuses = " ".join(f"{backend}={status}" for backend, status in record["statuses"].items())
+    line = f"{record['name']:<20} {statuses}{'  DISAGREEMENT' if record['flagged'] else ''}"
+    for backend, violations in record["violations"].items():
+        line += "".join(f"\n  {backend}: {violation['description']}" for violation in violations)
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every backend over generated instances, verify the schedules and flag disagreements.")
+    parser.add_argument("--exams", default="4,6,8", help="comma-separated exam counts")
+    parser.add_argument("--modes", default="random,sat,unsat", help=f"comma-separated generator modes ({', '.join(GENERATOR_MODES)})")
+    parser.add_argument("--seeds", type=int, default=10, help="instances per size and mode")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--tightness", type=float, default=0.8)
+    parser.add_argument("-t", "--timeout", type=float, default=60, help="per-solve time limit in seconds")
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(",")
+    backends = args.backends.split(",")
+    for name, chosen, allowed in (("mode", modes, GENERATOR_MODES), ("backend", backends, BACKENDS)):
+        unknown = [value for value in chosen if value not in allowed]
+        if unknown:
+            parser.error(f"Unknown {name} {', '.join(unknown)}")
+
+    # benchmark.py imports both solvers at the top
+    from benchmark import sweep
+    cases = sweep([int(exams) for exams in args.exams.split(",")], modes, args.seeds, rooms=args.rooms, density=args.density, tightness=args.tightness)
+    flagged = 0
+    for record in differential(cases, backends, args.timeout):
+        print(_format(record), flush=True)
+        flagged += record["flagged"]
+    print(f"{flagged} of {len(cases)} instances flagged")
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())